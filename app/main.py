@@ -6,19 +6,65 @@ import random
 
 import bottle
 
+from battlesnake import codec
+from battlesnake import metrics
+from battlesnake.session import SESSIONS, game_id
+
 # use old snake
 if os.environ.get('SNAKE_OLD', ''):
     from . import snake2 as snake
+# look ahead with a time-limited search
+elif os.environ.get('SNAKE_SEARCH', ''):
+    from . import search as snake
+# Monte Carlo tree search
+elif os.environ.get('SNAKE_MCTS', ''):
+    from . import mcts as snake
 else:
     from . import snake
 
 
 LOG = logging.getLogger(__name__)
+# the snake modules leave logging alone, so it's only set up here
+logging.basicConfig(level=os.environ.get('SNAKE_LOG_LEVEL', 'WARNING').upper())
 
 SNAKE_NAME = os.environ.get('SNAKE_NAME', 'Shnözz')
 SNAKE_TAUNT = "The sweet smell of victory"
 SNAKE_COLOR = os.environ.get('SNAKE_COLOR', "#%0x" % random.randint(0, 0xffffff))
 # '#%06x' % random.randint(0, 0xffffff)
+# send each move's phase timings back in a Server-Timing header, if
+# metrics are on (SNAKE_METRICS)
+SNAKE_TIMING_HEADER = os.environ.get('SNAKE_TIMING_HEADER', '')
+
+# keep a sample of the last few boards I moved on, and log the ones
+# from a game when I lose it, see battlesnake.ringlog
+BOARD_LOG = None
+if os.environ.get('SNAKE_BOARD_LOG', ''):
+    from battlesnake.ringlog import RingLog
+    from . import snake as greedy
+    DUMP_REQUEST = getattr(snake, 'dump_request', greedy.dump_request)
+
+    def format_move(record):
+        data, next_move = record
+        return {
+            'game': data.get('game'),
+            'turn': data.get('turn'),
+            'move': next_move,
+            'board': DUMP_REQUEST(data, SNAKE_NAME),
+        }
+
+    BOARD_LOG = RingLog(logging.getLogger('app.boards'), format_move,
+                        capacity=int(os.environ.get('SNAKE_BOARD_LOG_SIZE', '256')),
+                        rate=float(os.environ.get('SNAKE_BOARD_LOG_RATE', '1.0')))
+
+
+def lost(data):
+    """whether an /end request shows I'm dead: it lists the snakes
+    left, and I'm not one of them.  A request that doesn't say isn't
+    a loss"""
+    snakes = data.get('snakes')
+    if not isinstance(snakes, list):
+        return False
+    return SNAKE_NAME not in [snake_data.get('name') for snake_data in snakes]
 
 @bottle.route('/static/<path:path>')
 def static(path):
@@ -50,7 +96,10 @@ def index():
 
 @bottle.post('/start')
 def start():
-    _data = bottle.request.json
+    data = codec.read_json(bottle.request.environ) or {}
+    # remember things about the game between moves
+    if game_id(data) is not None:
+        SESSIONS.session(game_id(data), SNAKE_NAME)
 
     return {
         'name': SNAKE_NAME,
@@ -62,9 +111,17 @@ def start():
 
 @bottle.post('/move')
 def move():
-    data = bottle.request.json
+    # only what the snake needs, and not the board
+    data = codec.read_move(bottle.request.environ)
 
+    timer = metrics.start()
     next_move = snake.battlesnake_move(data, SNAKE_NAME)
+    if timer:
+        metrics.finish(timer)
+        if SNAKE_TIMING_HEADER:
+            bottle.response.set_header('Server-Timing', timer.server_timing())
+    if BOARD_LOG is not None:
+        BOARD_LOG.record(data.get('game'), (data, next_move))
 
     return {
         'move': next_move,
@@ -74,14 +131,34 @@ def move():
 
 @bottle.post('/end')
 def end():
-    _data = bottle.request.json
+    data = codec.read_json(bottle.request.environ) or {}
+    if BOARD_LOG is not None and lost(data):
+        BOARD_LOG.flush(data.get('game'))
+    SESSIONS.end(game_id(data), SNAKE_NAME)
 
     return {
         'taunt': SNAKE_TAUNT,
     }
 
 
+@bottle.get('/metrics')
+def get_metrics():
+    bottle.response.content_type = 'text/plain; version=0.0.4'
+    return metrics.exposition()
+
+
 # Expose WSGI app (so gunicorn can find it)
 application = bottle.default_app()
+# and encode responses with the same JSON library
+application.uninstall(bottle.JSONPlugin)
+application.install(bottle.JSONPlugin(json_dumps=codec.dumps))
+
+# record a sample of requests as a benchmark corpus, see battlesnake.capture
+if os.environ.get('SNAKE_CAPTURE', ''):
+    from battlesnake.capture import capture_middleware
+    application = capture_middleware(
+        application, os.environ['SNAKE_CAPTURE'],
+        rate=float(os.environ.get('SNAKE_CAPTURE_RATE', '1.0')),
+        max_bytes=int(os.environ.get('SNAKE_CAPTURE_MAX_BYTES', 64 << 20)))
 if __name__ == '__main__':
     bottle.run(application, host=os.getenv('IP', '0.0.0.0'), port=os.getenv('PORT', '8080'))
@@ -0,0 +1,149 @@
+"""Monte Carlo tree search for the next move.
+
+Decoupled UCT over simultaneous moves: at each node of the tree every
+snake picks its own move by UCB1 on its own statistics, and the joint
+move leads to the child.  New children are scored by a fast random
+rollout where every snake plays snake.bitboard_rollout_move() for a
+few turns on a battlesnake.bitboard state.  Simulations run until a
+wall-clock deadline, then I take the move I tried most often.
+"""
+import logging
+import math
+import random
+import time
+
+from . import snake
+from .search import request_state
+
+LOG = logging.getLogger(__name__)
+
+MCTS_EXPLORATION = 1.4
+MCTS_ROLLOUT_TURNS = 10
+
+MOVE_NAMES = [move.name for move in snake.MOVES]
+
+
+class Node(object):
+    """a state in the tree, and each snake's statistics for its moves"""
+    __slots__ = ('state', 'names', 'moves', 'visits', 'rewards', 'children', 'count')
+
+    def __init__(self, state):
+        self.state = state
+        self.names = [player.name for player in state.snakes]
+        occupied = state.occupied()
+        self.moves = [snake.bitboard_safe_moves(state, player, occupied) or MOVE_NAMES[:1]
+                      for player in state.snakes]
+        self.visits = [[0] * len(moves) for moves in self.moves]
+        self.rewards = [[0.0] * len(moves) for moves in self.moves]
+        self.children = {}
+        self.count = 0
+
+    def select(self, exploration):
+        """each snake's choice of move, as indexes into self.moves"""
+        log_count = math.log(self.count + 1)
+        choice = []
+        for visits, totals in zip(self.visits, self.rewards):
+            best = 0
+            best_value = -1.0
+            for i, n in enumerate(visits):
+                if n == 0:
+                    best = i
+                    break
+                value = totals[i] / n + exploration * math.sqrt(log_count / n)
+                if value > best_value:
+                    best = i
+                    best_value = value
+            choice.append(best)
+        return tuple(choice)
+
+    def update(self, choice, result):
+        self.count += 1
+        for snake_no, (move_no, name) in enumerate(zip(choice, self.names)):
+            self.visits[snake_no][move_no] += 1
+            self.rewards[snake_no][move_no] += result.get(name, 0.0)
+
+
+def rewards(state, names):
+    """1 for the last snake standing, 0.5 for the others still alive, 0
+    for the dead"""
+    alive = set(player.name for player in state.snakes)
+    if len(alive) == 1:
+        return dict((name, 1.0 if name in alive else 0.0) for name in names)
+    return dict((name, 0.5 if name in alive else 0.0) for name in names)
+
+
+class MCTS(object):
+    def __init__(self, deadline, rnd=None, clock=time.time,
+                 exploration=MCTS_EXPLORATION, rollout_turns=MCTS_ROLLOUT_TURNS):
+        self.deadline = deadline
+        self.random = rnd or random.Random()
+        self.clock = clock
+        self.exploration = exploration
+        self.rollout_turns = rollout_turns
+        self.simulations = 0
+
+    def rollout(self, state):
+        """play state out in place for a few turns with the cheap policy"""
+        rnd = self.random
+        deltas = state.board.deltas
+        for _ in range(self.rollout_turns):
+            if len(state.snakes) <= 1:
+                break
+            occupied = state.occupied()
+            state.step([deltas[snake.bitboard_rollout_move(state, player, occupied, rnd)]
+                        for player in state.snakes])
+        return state
+
+    def simulate(self, root):
+        """one pass down the tree, a rollout, and back up"""
+        path = []
+        node = root
+        while True:
+            if len(node.state.snakes) <= 1:
+                result = rewards(node.state, root.names)
+                break
+            choice = node.select(self.exploration)
+            path.append((node, choice))
+            child = node.children.get(choice)
+            if child is None:
+                state = node.state.copy()
+                state.turn([moves[i] for moves, i in zip(node.moves, choice)])
+                child = node.children[choice] = Node(state)
+                result = rewards(self.rollout(state.copy()), root.names)
+                break
+            node = child
+
+        for node, choice in path:
+            node.update(choice, result)
+        self.simulations += 1
+
+    def run(self, state, name, max_simulations=None):
+        """simulate until the deadline.  Returns my most visited move"""
+        root = Node(state)
+        if name not in root.names:
+            return MOVE_NAMES[0]
+        me = root.names.index(name)
+        if len(state.snakes) <= 1:
+            # nobody to play against, so no statistics to gather
+            return snake.bitboard_move(state, state.snakes[me])
+        while self.clock() < self.deadline:
+            self.simulate(root)
+            if max_simulations is not None and self.simulations >= max_simulations:
+                break
+        visits = root.visits[me]
+        return root.moves[me][visits.index(max(visits))]
+
+
+def mcts_move(state, name, deadline, rnd=None):
+    mcts = MCTS(deadline, rnd)
+    best_move = mcts.run(state, name)
+    LOG.debug("mcts best_move=%s simulations=%s", best_move, mcts.simulations)
+    return best_move
+
+
+def battlesnake_move(data, snake_name):
+    deadline = time.time() + snake.move_budget(data)
+    state, me = request_state(data, snake_name)
+    if me is None:
+        return snake.battlesnake_move(data, snake_name)
+    return mcts_move(state, snake_name, deadline)
@@ -0,0 +1,325 @@
+"""Lookahead search for the next move.
+
+An iterative-deepening paranoid alpha-beta search over
+battlesnake.bitboard states: I pick a move, then every nearby enemy
+picks the moves that are worst for me, and the game rules in
+BitState.turn() play them out.  Each depth is searched in turn until
+a wall-clock deadline, and the best move from the deepest completed
+depth wins, so the depth reached scales with the time left in the
+request.
+"""
+import itertools
+import logging
+import os
+import time
+
+from battlesnake.bitboard import BitBoard, BitSnake, BitState, popcount
+from battlesnake.board import request_size
+from battlesnake.session import SESSIONS
+from battlesnake.zobrist import Zobrist, TranspositionTable, EXACT, LOWER, UPPER
+
+from . import snake
+
+LOG = logging.getLogger(__name__)
+
+SEARCH_MAX_DEPTH = 32
+
+# enemies further than this from my head only get one move each
+SEARCH_RADIUS = 4
+
+# score leaves by the cells I get to before any other snake, see
+# battlesnake.territory, instead of all the cells I can reach
+SEARCH_TERRITORY = bool(os.environ.get('SNAKE_SEARCH_TERRITORY', ''))
+
+WIN = 1000000.0
+LOSS = -WIN
+# scores at least this close to WIN or LOSS are wins or losses some
+# plies away, rather than evaluations
+MATE = WIN - 1000.0
+LENGTH_WEIGHT = 10.0
+
+MOVE_NAMES = [move.name for move in snake.MOVES]
+
+# transposition tables are kept in each game's session, so work from
+# one move carries over to the next.  Each has SEARCH_TABLE_SIZE
+# buckets.
+SEARCH_TABLE_SIZE = 1 << 15
+ZOBRIST = Zobrist()
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+def game_table(game_id, snake_name=None):
+    """the transposition table for snake_name's game, made if it's new"""
+    session = SESSIONS.session(game_id, snake_name)
+    if session.table is None:
+        session.table = TranspositionTable(SEARCH_TABLE_SIZE)
+    return session.table
+
+
+def request_state(data, snake_name):
+    """make a BitState from a /move request.  Returns (state, me)
+    where me is my BitSnake, or None if I'm not in the game."""
+    xmax, ymax = request_size(data)
+    board = BitBoard(xmax, ymax)
+
+    def bit_index(coord):
+        x, y = coord
+        return y * board.stride + x
+
+    state = BitState(board, max_health=snake.STARVATION_TURNS)
+    for x, y in data['food']:
+        state.food |= 1 << bit_index((x, y))
+
+    me = None
+    for snake_data in data['snakes']:
+        player = BitSnake()
+        player.name = snake_data['name']
+        # the Zobrist slot, so it must be the same every turn
+        player.cell_type = snake_data.get('id', player.name)
+        player.body = [bit_index(coord) for coord in snake_data['coords']]
+        player.mask = 0
+        for idx in player.body:
+            player.mask |= 1 << idx
+        player.length = len(player.body)
+        try:
+            player.health = snake.STARVATION_TURNS - (data['turn'] - snake_data['last_eaten'])
+        except KeyError:
+            player.health = snake.STARVATION_TURNS
+        player.killed = None
+        state.snakes.append(player)
+        if player.name == snake_name:
+            me = player
+    state.turn_count = data.get('turn', 0)
+    return state, me
+
+
+def table_value(value, ply):
+    """value, found ply plies from the root, as it's stored in a
+    transposition table: wins and losses count plies from this node,
+    not the root, so they're right whatever ply they're found at"""
+    if value >= MATE:
+        return value + ply
+    if value <= -MATE:
+        return value - ply
+    return value
+
+
+def tree_value(value, ply):
+    """a value from a transposition table, used ply plies from the
+    root.  The inverse of table_value()"""
+    if value >= MATE:
+        return value - ply
+    if value <= -MATE:
+        return value + ply
+    return value
+
+
+def find_snake(state, name):
+    for player in state.snakes:
+        if player.name == name:
+            return player
+    return None
+
+
+class Search(object):
+    """one search for the best move for the snake called name"""
+
+    def __init__(self, name, deadline, table=None, clock=time.time, territory=SEARCH_TERRITORY):
+        self.name = name
+        self.deadline = deadline
+        self.table = table
+        self.clock = clock
+        self.territory = territory
+        self.nodes = 0
+
+    def tick(self):
+        self.nodes += 1
+        if self.clock() > self.deadline:
+            raise SearchTimeout()
+
+    def my_moves(self, state, me):
+        """my moves, best first by the greedy snake's heuristics"""
+        moves = [move_name for _score, move_name in snake.bitboard_scores(state, me)]
+        return moves or MOVE_NAMES[:1]
+
+    def enemy_moves(self, state, me):
+        """the moves to try for each snake, in state.snakes order.
+        Nearby enemies try every safe move, closest to my head first;
+        the rest just take their first safe move."""
+        board = state.board
+        occupied = state.occupied()
+        my_x, my_y = divmod(me.body[0], board.stride)[::-1]
+        choices = []
+        for player in state.snakes:
+            if player is me:
+                choices.append(None)
+                continue
+            moves = snake.bitboard_safe_moves(state, player, occupied) or MOVE_NAMES[:1]
+            x, y = divmod(player.body[0], board.stride)[::-1]
+            if abs(x - my_x) + abs(y - my_y) > SEARCH_RADIUS:
+                moves = moves[:1]
+            else:
+                def closeness(move_name, head=player.body[0]):
+                    idx = head + board.deltas[move_name]
+                    x1, y1 = divmod(idx, board.stride)[::-1]
+                    return abs(x1 - my_x) + abs(y1 - my_y)
+                moves.sort(key=closeness)
+            choices.append(moves)
+        return choices
+
+    def territory_space(self, state, me):
+        """the number of cells I can get to before any other snake.
+        Cells we tie for are nobody's, whatever our lengths, since
+        BitState.turn() kills both snakes in a head to head"""
+        board = state.board
+        heads = [me.body[0]]
+        lengths = [me.length]
+        for player in state.snakes:
+            if player is not me:
+                heads.append(player.body[0])
+                lengths.append(player.length)
+        owned, _contested = board.territory(heads, board.inside & ~state.occupied(), lengths,
+                                            longer_wins=False)
+        return popcount(owned[0]) - 1
+
+    def evaluate(self, state, me):
+        """how good state is for me, from my space, length and health"""
+        if self.territory:
+            space = self.territory_space(state, me)
+        else:
+            board = state.board
+            passable = board.inside & ~state.occupied()
+            head = 1 << me.body[0]
+            space = popcount(board.flood(head, passable | head)) - 1
+        longest = max([0] + [player.length for player in state.snakes if player is not me])
+        return (space
+                + LENGTH_WEIGHT * (me.length - longest)
+                + float(me.health) / state.max_health)
+
+    def max_value(self, state, depth, ply, alpha, beta):
+        self.tick()
+        me = find_snake(state, self.name)
+        if me is None:
+            # lose later rather than sooner
+            return LOSS + ply
+        if len(state.snakes) == 1:
+            return WIN - ply
+        if depth == 0:
+            return self.evaluate(state, me)
+
+        table = self.table
+        alpha_start = alpha
+        entry_move = None
+        if table is not None:
+            entry = table.lookup(state.key)
+            if entry is not None:
+                entry_depth, value, flag, entry_move = entry
+                value = tree_value(value, ply)
+                if entry_depth >= depth:
+                    if flag == EXACT:
+                        return value
+                    elif flag == LOWER:
+                        alpha = max(alpha, value)
+                    elif flag == UPPER:
+                        beta = min(beta, value)
+                    if alpha >= beta:
+                        return value
+
+        moves = self.my_moves(state, me)
+        # try the best move from last time first
+        if entry_move in moves:
+            moves.remove(entry_move)
+            moves.insert(0, entry_move)
+
+        best = LOSS
+        best_move = moves[0]
+        for move_name in moves:
+            value = self.min_value(state, me, move_name, depth, ply, alpha, beta)
+            if value > best:
+                best = value
+                best_move = move_name
+            alpha = max(alpha, value)
+            if alpha >= beta:
+                break
+
+        if table is not None:
+            if best <= alpha_start:
+                flag = UPPER
+            elif best >= beta:
+                flag = LOWER
+            else:
+                flag = EXACT
+            table.store(state.key, depth, table_value(best, ply), flag, best_move)
+        return best
+
+    def min_value(self, state, me, move_name, depth, ply, alpha, beta):
+        choices = self.enemy_moves(state, me)
+        choices = [[move_name] if moves is None else moves for moves in choices]
+        worst = WIN
+        for moves in itertools.product(*choices):
+            child = state.copy()
+            child.turn(moves)
+            value = self.max_value(child, depth - 1, ply + 1, alpha, beta)
+            worst = min(worst, value)
+            beta = min(beta, value)
+            if alpha >= beta:
+                break
+        return worst
+
+    def root(self, state, depth, first=None):
+        """search to depth.  Returns (best_move, value)"""
+        me = find_snake(state, self.name)
+        moves = self.my_moves(state, me)
+        if first in moves:
+            moves.remove(first)
+            moves.insert(0, first)
+
+        best_move = moves[0]
+        alpha = LOSS - 1
+        for move_name in moves:
+            value = self.min_value(state, me, move_name, depth, 0, alpha, WIN + 1)
+            if value > alpha:
+                best_move = move_name
+                alpha = value
+        return best_move, alpha
+
+    def run(self, state, max_depth=SEARCH_MAX_DEPTH):
+        """iterative deepening until the deadline.  Returns (best_move,
+        value, depth) from the deepest search that finished."""
+        me = find_snake(state, self.name)
+        if self.table is not None and state.zobrist is None:
+            state.hash_with(ZOBRIST)
+        best_move = self.my_moves(state, me)[0]
+        value = None
+        depth = 0
+        for next_depth in range(1, max_depth + 1):
+            try:
+                best_move, value = self.root(state, next_depth, best_move)
+            except SearchTimeout:
+                break
+            depth = next_depth
+            if value >= WIN - SEARCH_MAX_DEPTH or value <= LOSS + SEARCH_MAX_DEPTH:
+                # the game is decided, searching deeper won't change it
+                break
+        return best_move, value, depth
+
+
+def search_move(state, name, deadline, table=None, max_depth=SEARCH_MAX_DEPTH):
+    """the best move for the snake called name that I can find before
+    deadline (a time.time())"""
+    search = Search(name, deadline, table)
+    best_move, value, depth = search.run(state, max_depth)
+    LOG.debug("search best_move=%s value=%s depth=%s nodes=%s",
+              best_move, value, depth, search.nodes)
+    return best_move
+
+
+def battlesnake_move(data, snake_name):
+    deadline = time.time() + snake.move_budget(data)
+    state, me = request_state(data, snake_name)
+    if me is None:
+        return snake.battlesnake_move(data, snake_name)
+    return search_move(state, snake_name, deadline, game_table(data.get('game'), snake_name))
@@ -1,24 +1,53 @@
-from collections import namedtuple, deque
+from collections import namedtuple
+import os
 import string
 import logging
+import time
+
+from battlesnake import chamber
+from battlesnake import field
+from battlesnake import metrics
+from battlesnake import npfield
+from battlesnake.bitboard import popcount
+from battlesnake.npfield import numpy
+from battlesnake.board import neighbour_table, paint_request, request_indices, request_size, vacate_turns
+from battlesnake.pool import BufferPool
+from battlesnake.session import SESSIONS
+from battlesnake.territory import TERRITORY_POOL
 
 LOG = logging.getLogger(__name__)
-logging.basicConfig(level=logging.DEBUG)
 
 Cell = namedtuple('Cell', ['index', 'value'])
 
 Move = namedtuple('Move', ['dx', 'dy', 'name'])
-MOVES = [
+MOVES = (
     Move(-1,  0, 'left'),
     Move( 0, -1, 'up'),
     Move( 1,  0, 'right'),
     Move( 0,  1, 'down'),
-    ]
+    )
 INF = float('inf')
 
 STARVATION_TURNS = 100
+
+# seconds I have to move when the request doesn't say, and to leave
+# for the network and the server on every move
+MOVE_TIMEOUT = float(os.environ.get('SNAKE_MOVE_TIMEOUT', '0.2'))
+MOVE_MARGIN = float(os.environ.get('SNAKE_MOVE_MARGIN', '0.05'))
+# spend any time left after the smells searching ahead with app.search
+MOVE_SEARCH = bool(os.environ.get('SNAKE_MOVE_SEARCH', ''))
+# distance fields are repaired from the turn before's unless more than
+# this fraction of the board changed
+REPAIR_MAX_CHANGED = float(os.environ.get('SNAKE_REPAIR_MAX_CHANGED', '0.1'))
+# score space by the room behind each move, allowing for chokepoints,
+# see battlesnake.chamber, instead of the cells each move gets to first
+SPACE_CHAMBERS = bool(os.environ.get('SNAKE_SPACE_CHAMBERS', ''))
+# flood fill space through the cells snakes will have moved off by the
+# time I get there, see field.timed_field, instead of only empty cells
+SPACE_TIMED = bool(os.environ.get('SNAKE_SPACE_TIMED', ''))
 CELL_TYPE_SELF = 'A'
 CELL_TYPE_ENEMY = set(string.ascii_uppercase) - set(CELL_TYPE_SELF)
+ENEMY_IDS = sorted(CELL_TYPE_ENEMY)
 CELL_TYPE_SPACE = ' '
 CELL_TYPE_FOOD = '*'
 
@@ -36,6 +65,16 @@ CellTypeSelf  = CellType(CELL_TYPE_SELF)
 CellTypeEnemy = CellType(CELL_TYPE_ENEMY)
 CellTypeFood  = CellType(CELL_TYPE_FOOD)
 
+# the fields move() scores with.  food, enemy and dist are field
+# distance arrays, space labels each cell with the first move that
+# reaches it, see Board.space_field
+Smells = namedtuple('Smells', [
+    'food', 'food_max',
+    'enemy', 'enemy_max',
+    'dist', 'dist_max',
+    'space', 'space_by_move', 'space_max',
+    ])
+
 class Board(list):
     """A board is a 2-d array of values"""
 
@@ -45,23 +84,44 @@ class Board(list):
         self.xmax = xmax
         self.ymax = ymax
         if not callable(val):
-            f = lambda x, y: val
+            self.extend([val] * (xmax * ymax))
         else:
-            f = val
-
-        for y in range(ymax):
-            for x in range(xmax):
-                self.append(f(x, y))
+            for y in range(ymax):
+                for x in range(xmax):
+                    self.append(val(x, y))
 
         self.ttl = 10
+        # pooled distance fields I'm using, see new_field()
+        self.fields = []
+        # whether I came from BOARD_POOL, and go back to it
+        self.pooled = False
+        # my NeighbourTable, see neighbour_table()
+        self.table = None
+        # the board of the turn before, and the cells that changed
+        # since, if I know
+        self.previous = None
+        self.changed = None
+        # fields the next turn can repair, by name, see repair_smell()
+        self.smelled = {}
+        # moves until each cell is free, if I know, see
+        # board.vacate_turns()
+        self.vacate = None
 
     @classmethod
     def load_strs(cls, *strs):
         ymax = len(strs)
         xmax = len(strs[0])
         vals = iter("".join(strs))
-        return Board(xmax, ymax, lambda x, y: next(vals))
+        return cls(xmax, ymax, lambda x, y: next(vals))
 
+    @classmethod
+    def from_values(cls, xmax, ymax, values):
+        """make a board from a flat list of values without a per-cell callback"""
+        board = cls(0, 0)
+        board.xmax = xmax
+        board.ymax = ymax
+        board.extend(values)
+        return board
 
     def index(self, x, y):
         """convert (x,y) coordinates to an integer index in my array"""
@@ -83,52 +143,95 @@ class Board(list):
             yield Cell(index, self[index])
 
     def head(self):
-        for cell in self:
-            if CellTypeSelf.is_member(cell.value):
-                return cell
+        try:
+            index = list.index(self, CELL_TYPE_SELF)
+        except ValueError:
+            return None
+        return Cell(index, self[index])
+
+    def neighbour_table(self):
+        """the neighbour tables for my size, looked up once and kept"""
+        table = self.table
+        if table is None or table.width != self.xmax or table.height != self.ymax:
+            table = self.table = neighbour_table(self.xmax, self.ymax, MOVES)
+        return table
 
     def neighbours(self, index):
         """return all (index, move_name) adjacent to index"""
-        x, y = self.coords(index)
-        for move in MOVES:
-            x1 = x + move.dx
-            y1 = y + move.dy
-            if x1 >= 0 and x1 < self.xmax and y1 >= 0 and y1 < self.ymax:
-                yield Cell(self.index(x1, y1), move.name)
+        for neighbour in self.neighbour_table().by_name[index]:
+            yield Cell(*neighbour)
 
     def board(self, value=None):
         """make a new board with my dimensions"""
         return Board(self.xmax, self.ymax, value)
 
+    def values(self):
+        """my cell values as a plain list, without the Cell wrapper of __iter__"""
+        return list(list.__iter__(self))
+
+    def adjacency(self):
+        """a table of neighbouring cell indexes for every cell index"""
+        return self.neighbour_table().adjacency
+
+    def new_field(self):
+        """a blank distance field from the pool, given back by the next
+        smell pass or release()"""
+        dist = field.FIELD_POOL.acquire(self.xmax * self.ymax)
+        self.fields.append(dist)
+        return dist
+
+    def release_fields(self):
+        """give my distance fields back to their pool.  Every smell pass
+        starts with this, so only the last pass's smells can be used"""
+        for dist in self.fields:
+            field.FIELD_POOL.release(len(dist), dist)
+        self.fields = []
+        self.smelled = {}
+
+    def release(self):
+        """give me and my distance fields back to their pools, if I came
+        from one.  Nothing from me, including my smells, can be used
+        after this."""
+        self.release_fields()
+        self.previous = None
+        if self.pooled:
+            BOARD_POOL.release((self.__class__, self.xmax, self.ymax), self)
+
+    def smell_field(self, cell_type):
+        """like smell, but returns an integer distance array where
+        unreachable cells are field.UNREACHED"""
+        values = self.values()
+        seeds = [index for index, val in enumerate(values) if cell_type.is_member(val)]
+        passable = field.passable_mask(values, lambda val: not cell_type.is_opaque(val))
+        return field.distance_field(self.adjacency(), seeds, passable)
+
+    def repair_smell(self, name, seeds, passable, deadline=None, clock=time.time):
+        """like field.distance_field(), into a field from new_field()
+        that's kept as name for the next turn.  If the board of the turn
+        before kept one called name, that's repaired for the cells that
+        changed since, instead of searching the whole board again.  A
+        field abandoned at deadline isn't kept"""
+        adjacency = self.adjacency()
+        dist = self.new_field()
+        old = None
+        if self.previous is not None and self.changed is not None:
+            old = self.previous.smelled.get(name)
+        if old is None or len(self.changed) > len(dist) * REPAIR_MAX_CHANGED:
+            smelled = field.distance_field(adjacency, seeds, passable, dist,
+                                           deadline=deadline, clock=clock)
+        else:
+            dist[:] = old
+            smelled = field.repair_field(adjacency, dist, seeds, passable, self.changed)
+        self.smelled[name] = dist
+        return smelled
+
     def smell(self, cell_type):
         """make a board where the values are the number of moves from
         each cell to the nearest cell_type"""
-
-        # by default, everything is infinite moves away
-        smell = self.board(INF)
-
-        # start with all cells in cell_type
-        todo = deque()
-        for cell in self:
-            if cell_type.is_member(cell.value):
-                todo.append((cell, 0.0))
-
-        # keep adding neighbours at increasing distance
-        max_dist = 0
-        while todo:
-            cell, dist = todo.popleft()
-
-            # stop if this cell is already hit or is opaque
-            if smell[cell.index] != INF or cell_type.is_opaque(self[cell.index]):
-                continue
-
-            smell[cell.index] = dist
-            if dist > max_dist:
-                max_dist = dist
-            for cell in self.neighbours(cell.index):
-                todo.append((cell, dist+1))
-
-        return smell, max_dist
+        dist, max_dist = self.smell_field(cell_type)
+        smell = self.from_values(self.xmax, self.ymax,
+                                 [INF if d == field.UNREACHED else float(d) for d in dist])
+        return smell, float(max_dist)
 
     def smell_food(self):
         return self.smell(CellTypeFood)
@@ -139,72 +242,236 @@ class Board(list):
     def smell_self(self):
         return self.smell(CellTypeSelf)
 
-    def smell_space(self):
-        """see which move next to my head leads to the most open space"""
-        todo = deque()
-        space_map = self.board()
+    def space_field(self, passable, dist=None, deadline=None, clock=time.time):
+        """flood fill out from my head, labelling each cell with the
+        first move that reaches it.  Returns (dist, labels) where
+        labels[i] is 1 + the index in MOVES of the first move, or 0 if
+        cell i can't be reached.  If I know when cells are vacated,
+        the fill goes through bodies that will have moved on by the
+        time it gets there.  Raises field.FieldTimeout if deadline
+        passes first"""
+        adjacency = self.adjacency()
+        if dist is None:
+            dist = self.new_field()
+        labels = bytearray(len(adjacency))
 
         head = self.head()
-        todo.append((Cell(head.index, None), 0))
-
-        while todo:
-            prev_cell, dist = todo.popleft()
-            for next_cell in self.neighbours(prev_cell.index):
-                if space_map[next_cell.index] is not None or CellTypeSelf.is_opaque(self[next_cell.index]):
-                    continue
+        if head is None:
+            return dist, labels
+        dist[head.index] = 0
+        vacate = self.vacate
+
+        # the first moves are the seeds, labelled by move
+        x, y = self.coords(head.index)
+        seeds = []
+        for move_no, move in enumerate(MOVES):
+            x1 = x + move.dx
+            y1 = y + move.dy
+            if x1 >= 0 and x1 < self.xmax and y1 >= 0 and y1 < self.ymax:
+                index = self.index(x1, y1)
+                if passable[index] or vacate is not None and 0 < vacate[index] <= 1:
+                    labels[index] = move_no + 1
+                    seeds.append(index)
+        if vacate is None:
+            field.distance_field(adjacency, seeds, passable, dist, labels, 1, deadline, clock)
+        else:
+            field.timed_field(adjacency, seeds, passable, vacate, dist, labels, 1, deadline, clock)
 
-                move_name = prev_cell.value
-                if not move_name:
-                    move_name = next_cell.value
-                space_map[next_cell.index] = move_name
+        # my head is reachable again through my first move
+        if seeds:
+            labels[head.index] = labels[seeds[0]]
 
-                todo.append((Cell(next_cell.index, move_name), dist+1))
+        return dist, labels
 
-        # count spaces from space_map
+    def space_by_move(self, labels):
+        """count the cells reached by each first move in labels"""
         space_by_move = {}
         space_max = self.xmax * self.ymax
-        for cell in space_map:
-            # 1 point per cell, minus the likelihood that I'll meet an enemy there
-            if not cell.value:
-                continue
-            if cell.value not in space_by_move:
-                space_by_move[cell.value] = 0.0
-            space_by_move[cell.value] += 1.0 # - 1.0 / (max(enemy[cell.index], 1.0) * max(dist[cell.index], 1.0))
+        for move_no, move in enumerate(MOVES):
+            count = labels.count(bytearray((move_no + 1,)))
+            if count:
+                space_by_move[move.name] = float(count)
         if space_by_move:
             space_max = max(space_by_move.values())
+        return space_by_move, space_max
+
+    def chamber_space(self, passable):
+        """the room after each move from my head, from one pass of
+        battlesnake.chamber: a move into a chokepoint only gets the
+        biggest chamber past it.  Returns (space_by_move, space_max)
+        like space_by_move().  Only empty cells count, even if I know
+        when bodies move on"""
+        space_by_move = {}
+        space_max = self.xmax * self.ymax
+        head = self.head()
+        if head is None:
+            return space_by_move, space_max
+        moves = [move for move in self.neighbours(head.index) if passable[move.index]]
+        # my head is behind me once I move, not a way between my moves
+        passable = bytearray(passable)
+        passable[head.index] = 0
+        chambers = chamber.analyse(self.adjacency(), passable, [move.index for move in moves])
+        for move in moves:
+            space_by_move[move.value] = float(chambers.room(move.index))
+        if space_by_move:
+            space_max = max(space_by_move.values())
+        return space_by_move, space_max
 
-        return space_by_move, space_max, space_map
-
-    def move(self):
-        food, food_max = self.smell_food()
-        enemy, enemy_max = self.smell_enemy()
-        dist, _dist_max = self.smell_self()
-        space_by_move, space_max, space_map = self.smell_space()
+    def smell_space(self):
+        """see which move next to my head leads to the most open space"""
+        self.release_fields()
+        passable = field.passable_mask(self.values(), lambda val: not CellTypeSelf.is_opaque(val))
+        _dist, labels = self.space_field(passable)
 
-        head = self.head()
+        space_by_move, space_max = self.space_by_move(labels)
+        space_map = self.from_values(self.xmax, self.ymax,
+                                     [MOVES[label-1].name if label else None for label in labels])
+        return space_by_move, space_max, space_map
 
-        # make sure the closest food isn't too far away to eat
-        closest_food = 1 + min([INF] + [food[move.index] for move in self.neighbours(head.index)])
+    def smell_territory(self, longer_wins=True):
+        """which snake gets to each cell first, see battlesnake.territory.
+        Returns (owners, dist, counts): owners[i] is the head letter of
+        the snake that gets to cell i first, or None, dist[i] is when it
+        gets there, and counts[letter] is how many cells it gets"""
+        self.release_fields()
+        values = self.values()
+        passable = field.passable_mask(values, lambda val: not CellTypeSelf.is_opaque(val))
+        lengths = {}
+        heads = []
+        for index, val in enumerate(values):
+            if val.isalpha():
+                letter = val.upper()
+                lengths[letter] = lengths.get(letter, 0) + 1
+                if val == letter:
+                    heads.append((letter, index))
+        # me first
+        heads.sort(key=lambda head: (head[0] != CELL_TYPE_SELF, head[0]))
+        letters = [None] + [letter for letter, _index in heads]
+
+        adjacency = self.adjacency()
+        territory = TERRITORY_POOL.acquire(adjacency, longer_wins)
+        try:
+            counts = territory.run([index for _letter, index in heads], passable,
+                                   [lengths[letter] for letter, _index in heads])
+            owners = [letters[who] if who < len(letters) else None for who in territory.owner]
+            dist = self.new_field()
+            dist[:] = territory.dist
+            counts = dict((letter, counts[who]) for who, letter in enumerate(letters) if who)
+        finally:
+            TERRITORY_POOL.release(adjacency, territory)
+        return owners, dist, counts
+
+    def smell_stages(self, deadline=None, clock=time.time):
+        """compute the fields move() needs in stages, cheapest and most
+        urgent first: enemy, then food, then space.  Yields Smells after
+        each stage, with the fields not computed yet as None.  Every
+        smell shares the same passable mask, since the cells that block
+        food, enemies and me are the same, apart from the seeds
+        themselves.  If deadline, a clock() time, passes in the middle
+        of a stage, the stage is abandoned with field.FieldTimeout"""
+        self.release_fields()
+        timer = metrics.current()
+        values = self.values()
+        adjacency = self.adjacency()
+        passable = field.passable_mask(values, lambda val: not CellTypeSelf.is_opaque(val))
+
+        food_seeds = []
+        enemy_seeds = []
+        self_seeds = []
+        for index, val in enumerate(values):
+            if val == CELL_TYPE_SPACE:
+                continue
+            if CellTypeFood.is_member(val):
+                food_seeds.append(index)
+            elif CellTypeEnemy.is_member(val):
+                enemy_seeds.append(index)
+            elif CellTypeSelf.is_member(val):
+                self_seeds.append(index)
+        if timer:
+            timer.mark('smell_seeds')
+
+        smells = Smells(*[None] * len(Smells._fields))
+        # enemies are smelt from their heads, which all move every turn,
+        # so most of the field changes and repairing it is slower than
+        # starting again
+        enemy, enemy_max = field.distance_field(adjacency, enemy_seeds, passable, self.new_field(),
+                                                deadline=deadline, clock=clock)
+        smells = smells._replace(enemy=enemy, enemy_max=enemy_max)
+        if timer:
+            timer.mark('smell_enemy')
+        yield smells
+
+        food, food_max = self.repair_smell('food', food_seeds, passable, deadline, clock)
+        smells = smells._replace(food=food, food_max=food_max)
+        if timer:
+            timer.mark('smell_food')
+        yield smells
+
+        # the flood fill from my head doubles as my own distance field,
+        # unless it went through bodies, which the other fields don't
+        space_dist, space = self.space_field(passable, deadline=deadline, clock=clock)
+        if len(self_seeds) == 1 and self.vacate is None:
+            dist, dist_max = space_dist, max(space_dist)
+        else:
+            dist, dist_max = field.distance_field(adjacency, self_seeds, passable, self.new_field(),
+                                                  deadline=deadline, clock=clock)
+        if SPACE_CHAMBERS:
+            field.check_deadline(deadline, clock)
+            space_by_move, space_max = self.chamber_space(passable)
+        else:
+            space_by_move, space_max = self.space_by_move(space)
+        smells = smells._replace(dist=dist, dist_max=dist_max, space=space,
+                                 space_by_move=space_by_move, space_max=space_max)
+        if timer:
+            timer.mark('smell_space')
+        yield smells
+
+    def smells(self):
+        """all the fields move() needs, see smell_stages()"""
+        smells = None
+        for smells in self.smell_stages():
+            pass
+        return smells
+
+    def safe_moves(self, head):
+        """the moves from head that don't hit a wall or a body"""
+        return [move for move in self.neighbours(head.index)
+                if not CellTypeSelf.is_opaque(self[move.index])]
+
+    def score(self, smells, head, safe):
+        """the best of the safe moves from head, scored by as much of
+        smells as has been computed"""
+        food = smells.food
+        enemy = smells.enemy
+        enemy_max = smells.enemy_max
+        space_by_move = smells.space_by_move
+        space_max = smells.space_max
+
+        if food is not None:
+            food_max = float(smells.food_max)
+            # make sure the closest food isn't too far away to eat
+            closest_food = 1 + min([INF] + [food[move.index] for move in self.neighbours(head.index)
+                                            if food[move.index] != field.UNREACHED])
 
         # now find the best move
+        debug = LOG.isEnabledFor(logging.DEBUG)
         best_move = MOVES[0].name
         best_score = -INF
-        for move in self.neighbours(head.index):
-            if CellTypeSelf.is_opaque(self[move.index]):
-                continue
-
+        for move in safe:
             score = 0.0
 
             score_enemy = 0
-            if enemy[move.index] <= 1:
+            if enemy is None or enemy[move.index] == field.UNREACHED:
+                pass
+            elif enemy[move.index] <= 1:
                 # bad!  Do not go where an enemy could move next
                 score_enemy = -10
-            elif enemy[move.index] != INF:
+            else:
                 score_enemy = float(enemy[move.index]) / enemy_max
             score += score_enemy
 
             score_food = 0
-            if food[move.index] != INF:
+            if food is not None and food[move.index] != field.UNREACHED:
                 score_food = (1.0 - food[move.index] / food_max)
                 if self.ttl < max(2 * closest_food, STARVATION_TURNS / 25):
                     # I'm hungry, get food!
@@ -212,17 +479,51 @@ class Board(list):
             score += score_food
 
             # prefer open space
-            score_space = float(space_by_move.get(move.value, 0.0)) / space_max
+            score_space = 0
+            if space_by_move is not None:
+                score_space = float(space_by_move.get(move.value, 0.0)) / space_max
             score += score_space
 
-            # debug
-            LOG.debug("move=%s score=%s ttl=%s closest_food=%s score_enemy=%s score_food=%s score_space=%s",
-                      move.value, score, self.ttl, closest_food, score_enemy, score_food, score_space)
+            if debug:
+                LOG.debug("move=%s score=%s ttl=%s score_enemy=%s score_food=%s score_space=%s",
+                          move.value, score, self.ttl, score_enemy, score_food, score_space)
 
             if score > best_score:
                 best_move = move.value
                 best_score = score
 
+        return best_move
+
+    def moves(self, deadline=None, clock=time.time):
+        """yield better and better moves: first any safe move, then the
+        best move after each stage of smell_stages(), until deadline
+        cuts a stage short"""
+        head = self.head()
+        if head is None:
+            yield MOVES[0].name
+            return
+        safe = self.safe_moves(head)
+        yield safe[0].value if safe else MOVES[0].name
+
+        timer = metrics.current()
+        try:
+            for smells in self.smell_stages(deadline, clock):
+                best_move = self.score(smells, head, safe)
+                if timer:
+                    timer.mark('score')
+                yield best_move
+        except field.FieldTimeout:
+            LOG.debug("out of time in smell_stages")
+
+    def move(self, deadline=None, clock=time.time):
+        """the best move I can find before deadline, a clock() time.
+        With no deadline, the best move there is"""
+        best_move = MOVES[0].name
+        for best_move in self.moves(deadline, clock):
+            if deadline is not None and clock() >= deadline:
+                LOG.debug("out of time best_move=%s", best_move)
+                break
+
         # debug
         LOG.debug("best_move=%s", best_move)
 
@@ -241,36 +542,339 @@ class Board(list):
                 s += "|\n"
         return s
 
-def battlesnake_move(data, snake_name):
-    ymax = len(data['board'])
-    xmax = len(data['board'][0])
+class NumpyBoard(Board):
+    """A Board that computes its smells with NumPy.  Cells are still
+    one-character strings, but smells() works on a uint8 grid of their
+    character codes, one vectorized pass per BFS level.  Only worth it
+    on big boards, see board_class()."""
 
-    board = Board(xmax, ymax, CELL_TYPE_SPACE)
+    _code_tables = None
 
-    debug_data = data.copy()
-    del debug_data['board']
-    LOG.debug("battlesnake_board snake_name=%s data=%s", snake_name, debug_data)
-
-    for x, y in data['food']:
-        board.put(x, y, CELL_TYPE_FOOD)
+    @classmethod
+    def code_tables(cls):
+        """boolean lookup tables from character code to cell type"""
+        if cls._code_tables is None:
+            def table(test):
+                return numpy.array([bool(test(chr(code))) for code in range(256)])
+            cls._code_tables = (
+                table(lambda val: not CellTypeSelf.is_opaque(val)),
+                table(CellTypeFood.is_member),
+                table(CellTypeEnemy.is_member),
+                table(CellTypeSelf.is_member),
+                )
+        return cls._code_tables
+
+    def grid(self):
+        """my cells as a (ymax, xmax) uint8 grid of character codes, or
+        None if my cells aren't all single characters"""
+        try:
+            codes = "".join(self.values())
+            if not isinstance(codes, bytes):
+                codes = codes.encode('ascii')
+        except (TypeError, UnicodeError):
+            return None
+        if len(codes) != self.xmax * self.ymax:
+            return None
+        return numpy.frombuffer(codes, dtype=numpy.uint8).reshape(self.ymax, self.xmax)
+
+    def smell_stages(self, deadline=None, clock=time.time):
+        # the grid fills don't know when cells are vacated
+        grid = self.grid() if self.vacate is None else None
+        if grid is None:
+            for smells in super(NumpyBoard, self).smell_stages(deadline, clock):
+                yield smells
+            return
+
+        self.release_fields()
+        timer = metrics.current()
+        passable_table, food_table, enemy_table, self_table = self.code_tables()
+        passable = passable_table[grid]
+        if timer:
+            timer.mark('smell_seeds')
+
+        smells = Smells(*[None] * len(Smells._fields))
+        enemy, enemy_max = npfield.distance_grid(enemy_table[grid], passable, deadline, clock)
+        smells = smells._replace(enemy=enemy.ravel(), enemy_max=enemy_max)
+        if timer:
+            timer.mark('smell_enemy')
+        yield smells
+
+        food, food_max = npfield.distance_grid(food_table[grid], passable, deadline, clock)
+        smells = smells._replace(food=food.ravel(), food_max=food_max)
+        if timer:
+            timer.mark('smell_food')
+        yield smells
+
+        # label the first moves from my head, then flood fill them
+        space = numpy.zeros(grid.shape, dtype=numpy.uint8)
+        space_dist = numpy.full(grid.shape, field.UNREACHED, dtype=numpy.int32)
+        head = self.head()
+        first_label = 0
+        if head is not None:
+            x, y = self.coords(head.index)
+            space_dist[y, x] = 0
+            for move_no, move in enumerate(MOVES):
+                x1 = x + move.dx
+                y1 = y + move.dy
+                if x1 >= 0 and x1 < self.xmax and y1 >= 0 and y1 < self.ymax and passable[y1, x1]:
+                    space[y1, x1] = move_no + 1
+                    space_dist[y1, x1] = 1
+                    first_label = first_label or move_no + 1
+            space, space_dist = npfield.label_grid(space, passable, space_dist, deadline, clock)
+            # my head is reachable again through my first move
+            space[y, x] = first_label
+
+        self_seeds = self_table[grid]
+        if head is not None and numpy.count_nonzero(self_seeds) == 1:
+            dist, dist_max = space_dist, int(space_dist.max())
+        else:
+            dist, dist_max = npfield.distance_grid(self_seeds, passable, deadline, clock)
 
-    # make a board with all snakes as Aaaa Bbbbb Cccc.... where Aaaaa is me
-    my_id = CELL_TYPE_SELF
-    enemy_ids = iter(CELL_TYPE_ENEMY)
-    for snake in data['snakes']:
-        if snake['name'] == snake_name:
-            snake_id = my_id
-            try:
-                board.ttl = STARVATION_TURNS - (data['turn'] - snake['last_eaten'])
-            except KeyError:
-                board.ttl = 0
+        space = space.ravel()
+        if SPACE_CHAMBERS:
+            field.check_deadline(deadline, clock)
+            space_by_move, space_max = self.chamber_space(bytearray(passable.ravel().tobytes()))
         else:
-            snake_id = next(enemy_ids)
+            counts = numpy.bincount(space, minlength=len(MOVES) + 1)
+            space_by_move = dict((move.name, float(counts[move_no + 1]))
+                                 for move_no, move in enumerate(MOVES) if counts[move_no + 1])
+            space_max = max(space_by_move.values()) if space_by_move else self.xmax * self.ymax
+        smells = smells._replace(dist=dist.ravel(), dist_max=dist_max, space=space,
+                                 space_by_move=space_by_move, space_max=space_max)
+        if timer:
+            timer.mark('smell_space')
+        yield smells
+
+# boards with at least this many cells use NumpyBoard, if NumPy is installed
+NUMPY_MIN_CELLS = 50 * 50
+
+def board_class(xmax, ymax):
+    """the Board class to use for a board this size"""
+    if npfield.AVAILABLE and xmax * ymax >= NUMPY_MIN_CELLS:
+        return NumpyBoard
+    return Board
+
+def bitboard_distances(bitboard, seeds, passable, targets):
+    """distance from seeds to each target bit index, moving through
+    passable cells.  Returns ({target: dist}, max_dist)"""
+    dist = {}
+    level = -1
+    for level, layer in enumerate(bitboard.layers(seeds, passable | seeds)):
+        for target in targets:
+            if target not in dist and (layer >> target) & 1:
+                dist[target] = level
+    return dist, max(level, 0)
+
+def bitboard_safe_moves(state, player, occupied):
+    """the names of the moves for the BitSnake player that don't run
+    straight into a wall or a body in occupied"""
+    bitboard = state.board
+    head = player.body[0]
+    passable = bitboard.inside & ~occupied
+    moves = []
+    for move in MOVES:
+        index = head + bitboard.deltas[move.name]
+        if index >= 0 and (passable >> index) & 1:
+            moves.append(move.name)
+    return moves
+
+def bitboard_rollout_move(state, player, occupied, rnd):
+    """a cheap greedy move for rollouts: eat food next to my head,
+    otherwise keep away from enemy heads, otherwise move at random"""
+    moves = bitboard_safe_moves(state, player, occupied)
+    if not moves:
+        return MOVES[0].name
+    bitboard = state.board
+    head = player.body[0]
+    deltas = bitboard.deltas
+
+    for move_name in moves:
+        if (state.food >> (head + deltas[move_name])) & 1:
+            return move_name
+
+    enemy_heads = 0
+    for snake in state.snakes:
+        if snake is not player:
+            enemy_heads |= 1 << snake.body[0]
+    danger = bitboard.spread(enemy_heads)
+    safer = [move_name for move_name in moves if not (danger >> (head + deltas[move_name])) & 1]
+    return rnd.choice(safer or moves)
+
+def bitboard_scores(state, me):
+    """score the moves for the BitSnake me in a bitboard.BitState the
+    way Board.move() does.  Returns [(score, move_name)] for every
+    move that doesn't run into a wall or a body, best first"""
+    bitboard = state.board
+    passable = bitboard.inside & ~state.occupied()
+    head = me.body[0]
+    enemy_heads = 0
+    for snake in state.snakes:
+        if snake is not me:
+            enemy_heads |= 1 << snake.body[0]
+
+    # moves that don't run into a wall or a body
+    candidates = []
+    for move in MOVES:
+        index = head + bitboard.deltas[move.name]
+        if bitboard.on_board(index) and (passable >> index) & 1:
+            candidates.append((move.name, index))
+    if not candidates:
+        return []
+    targets = [index for _move_name, index in candidates]
+
+    food, food_max = bitboard_distances(bitboard, state.food, passable, targets)
+    enemy, enemy_max = bitboard_distances(bitboard, enemy_heads, passable, targets)
+    closest_food = 1 + min([INF] + list(food.values()))
+
+    scores = []
+    for move_name, index in candidates:
+        score_enemy = 0
+        if index in enemy:
+            if enemy[index] <= 1:
+                # bad!  Do not go where an enemy could move next
+                score_enemy = -10
+            else:
+                score_enemy = float(enemy[index]) / enemy_max
+
+        score_food = 0
+        if index in food and food_max:
+            score_food = 1.0 - float(food[index]) / food_max
+            if me.health < max(2 * closest_food, STARVATION_TURNS / 25):
+                # I'm hungry, get food!
+                score_food = score_food * 8
+
+        # prefer open space
+        space = popcount(bitboard.flood(1 << index, passable))
+        score_space = float(space) / popcount(passable)
+
+        scores.append((score_enemy + score_food + score_space, move_name))
+
+    scores.sort(key=lambda score: -score[0])
+    return scores
+
+def bitboard_move(state, me):
+    """Board.move() for a bitboard.BitState: pick the best move for
+    the BitSnake me"""
+    scores = bitboard_scores(state, me)
+    if not scores:
+        return MOVES[0].name
+    return scores[0][1]
+
+def move_budget(data, timeout=MOVE_TIMEOUT, margin=MOVE_MARGIN):
+    """seconds I can spend on this move request.  The request's timeout
+    is in milliseconds."""
+    if data.get('timeout') is not None:
+        timeout = float(data['timeout']) / 1000
+    return max(timeout - margin, 0.0)
+
+def _make_board(key):
+    cls, xmax, ymax = key
+    board = cls(xmax, ymax, CELL_TYPE_SPACE)
+    board.pooled = True
+    return board
+
+_blank_boards = {}
+
+def _reset_board(board, key):
+    try:
+        blank = _blank_boards[key]
+    except KeyError:
+        blank = _blank_boards[key] = [CELL_TYPE_SPACE] * (board.xmax * board.ymax)
+    board[:] = blank
+    board.ttl = 10
+    board.previous = None
+    board.changed = None
+    board.vacate = None
+
+# empty boards to reuse, by (class, xmax, ymax)
+BOARD_POOL = BufferPool(_make_board, _reset_board)
+
+def request_board(data, snake_name):
+    """make a board from a /move request, with me as A.  It comes from
+    BOARD_POOL, so release() it when done"""
+    xmax, ymax = request_size(data)
+    board = BOARD_POOL.acquire((board_class(xmax, ymax), xmax, ymax))
+
+    if LOG.isEnabledFor(logging.DEBUG):
+        debug_data = data.copy()
+        debug_data.pop('board', None)
+        LOG.debug("battlesnake_board snake_name=%s data=%s", snake_name, debug_data)
 
-        for x, y in snake['coords']:
-            if board.get(x, y) == CELL_TYPE_SPACE:
-                board.put(x, y, snake_id)
-            snake_id = snake_id.lower()
+    # make a board with all snakes as Aaaa Bbbbb Cccc.... where Aaaaa is me
+    me = paint_request(board, xmax, ymax, data, snake_name,
+                       CELL_TYPE_FOOD, CELL_TYPE_SELF, ENEMY_IDS, CELL_TYPE_SPACE)
+    if SPACE_TIMED:
+        board.vacate = vacate_turns(data, xmax, ymax)
+    if me is not None:
+        try:
+            board.ttl = STARVATION_TURNS - (data['turn'] - me['last_eaten'])
+        except KeyError:
+            board.ttl = 0
+    return board
+
+def changed_cells(prev, prev_data, board, data):
+    """the sorted indices of the cells that differ between board and
+    prev, the board of an earlier request in the same game.  Only the
+    cells either request draws on can have changed"""
+    if (prev.__class__, prev.xmax, prev.ymax) != (board.__class__, board.xmax, board.ymax):
+        return None
+    cells = request_indices(prev_data, board.xmax) | request_indices(data, board.xmax)
+    return sorted(idx for idx in cells if prev[idx] != board[idx])
+
+def dump_request(data, snake_name):
+    """the board of a /move request, for logs"""
+    board = request_board(data, snake_name)
+    try:
+        return board.dump()
+    finally:
+        board.release()
 
-    LOG.debug("battlesnake_board board=\n%s\n", board.dump())
-    return board.move()
+def battlesnake_move(data, snake_name):
+    deadline = time.time() + move_budget(data)
+    game = data.get('game')
+    session = None
+    if game is not None:
+        session = SESSIONS.session(game, snake_name)
+        if session.turn is not None and session.turn == data.get('turn') and session.data == data:
+            # asked again, so say the same again
+            return session.move
+
+    board = request_board(data, snake_name)
+    prev = None
+    if session is not None:
+        # keep this turn's board for the next, and find what changed
+        # since the last
+        prev, prev_data = session.take_board()
+        if prev is not None:
+            board.previous = prev
+            board.changed = changed_cells(prev, prev_data, board, data)
+    try:
+        if LOG.isEnabledFor(logging.DEBUG):
+            LOG.debug("battlesnake_board board=\n%s\n", board.dump())
+        timer = metrics.current()
+        if timer:
+            timer.mark('parse')
+        best_move = board.move(deadline)
+    finally:
+        if prev is not None:
+            board.previous = None
+            prev.release()
+        if session is not None:
+            session.keep(board, data)
+        else:
+            board.release()
+
+    if MOVE_SEARCH and time.time() < deadline:
+        from . import search
+        state, me = search.request_state(data, snake_name)
+        if me is not None:
+            found = search.Search(snake_name, deadline, search.game_table(game, snake_name))
+            search_move, _value, depth = found.run(state)
+            if depth:
+                best_move = search_move
+        if timer:
+            timer.mark('search')
+
+    if session is not None:
+        session.turn, session.move = data.get('turn'), best_move
+    return best_move
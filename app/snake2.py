@@ -3,14 +3,16 @@ import string
 import logging
 import collections
 
+from battlesnake.board import neighbour_table, paint_request, request_size
+
 LOG = logging.getLogger(__name__)
-logging.basicConfig(level=logging.DEBUG)
 
+Move = collections.namedtuple('Move', ['dx', 'dy', 'name'])
 MOVES = (
-    (-1,  0, 'left'),
-    ( 1,  0, 'right'),
-    ( 0,  1, 'down'),
-    ( 0, -1, 'up'),
+    Move(-1,  0, 'left'),
+    Move( 1,  0, 'right'),
+    Move( 0,  1, 'down'),
+    Move( 0, -1, 'up'),
     )
 
 class DEFAULT(): pass
@@ -75,17 +77,8 @@ class Board():
         board[self.cell_idx(x, y)] = thing
 
     def cell_neighbours(self):
-        neighbours = []
-
-        for x, y, i in self.board_iter():
-            adj = []
-            for dx, dy, move_name in MOVES:
-                x1 = x + dx
-                y1 = y + dy
-                if x1 >= 0 and x1 < self.xmax and y1 >= 0 and y1 < self.ymax:
-                    adj.append((self.cell_idx(x1,y1), move_name))
-            neighbours.append(adj)
-        return neighbours
+        """(idx, move_name) for each cell's neighbours, shared by all boards this size"""
+        return neighbour_table(self.xmax, self.ymax, MOVES).by_name
 
     def dumps(self, board=None):
         if board is None:
@@ -219,8 +212,9 @@ class Board():
             if death is not None and death < 2:
                 score_death = -10
             score = score_death + score_food + score_space
-            LOG.debug("score=%.2f starvation=%0.3f score_death=%.3f + score_food=%.3f + score_space=%.3f food=%s",
-                      score, self.starvation, score_death, score_food, score_space, food)
+            if LOG.isEnabledFor(logging.DEBUG):
+                LOG.debug("score=%.2f starvation=%0.3f score_death=%.3f + score_food=%.3f + score_space=%.3f food=%s",
+                          score, self.starvation, score_death, score_food, score_space, food)
         return score
 
     def move(self):
@@ -230,6 +224,7 @@ class Board():
         death, death_max = self.smell_death()
         space, space_max = self.smell_space()
 
+        debug = LOG.isEnabledFor(logging.DEBUG)
         best_move = MOVES[0][-1]
         best_score = None
         for move_idx, move_name in self.neighbours[head_idx]:
@@ -243,9 +238,10 @@ class Board():
                                death_abs,
                                space[move_idx])
 
-            LOG.debug("score=%s move_name=%-5s cell=%s starvation=%s food=%s death=%s space=%s",
-                      score, move_name, cell, self.starvation,
-                      food[move_idx], death_abs, space[move_idx])
+            if debug:
+                LOG.debug("score=%s move_name=%-5s cell=%s starvation=%s food=%s death=%s space=%s",
+                          score, move_name, cell, self.starvation,
+                          food[move_idx], death_abs, space[move_idx])
 
 
             if score is None:
@@ -255,45 +251,38 @@ class Board():
                 best_move = move_name
                 best_score = score
 
-        LOG.debug("head=%s best_move=%s", head_idx, best_move)
-        LOG.debug("board\n%s", self.dumps())
+        if debug:
+            LOG.debug("head=%s best_move=%s", head_idx, best_move)
+            LOG.debug("board\n%s", self.dumps())
 
         return best_move
 
 def battlesnake_board(data, snake_name):
     LOG.debug("battlesnake_board snake_name=%s", snake_name)
 
-    ymax = len(data['board'])
-    xmax = len(data['board'][0])
-
+    xmax, ymax = request_size(data)
     board = Board(xmax, ymax)
 
-    debug_data = data.copy()
-    del debug_data['board']
-    LOG.debug("battlesnake_board data=%s", debug_data)
-
-    for x, y in data['food']:
-        board.put(x, y, CELL_FOOD)
+    if LOG.isEnabledFor(logging.DEBUG):
+        debug_data = data.copy()
+        debug_data.pop('board', None)
+        LOG.debug("battlesnake_board data=%s", debug_data)
 
     # make a board with all snakes as Aaaa Bbbbb Cccc.... where Aaaaa is me
-    snake_ids = iter(CELL_SNAKE_HEADS)
-    my_id = next(snake_ids)
-    for snake in data['snakes']:
-        if snake['name'] == snake_name:
-            snake_id = my_id
-            try:
-                board.starvation = float(data['turn'] - snake['last_eaten']) / STARVATION_TURNS
-            except KeyError as e:
-                LOG.warn("KeyError: %s", e)
-                board.starvation = .5
-        else:
-            snake_id = next(snake_ids)
-        for x, y in snake['coords']:
-            if board.get(x, y) == CELL_BLANK:
-                board.put(x, y, snake_id)
-            snake_id = cell_snake_body(snake_id)
+    me = paint_request(board.board, xmax, ymax, data, snake_name,
+                       CELL_FOOD, CELL_SNAKE_HEADS[0], CELL_SNAKE_HEADS[1:], CELL_BLANK)
+    if me is not None:
+        try:
+            board.starvation = float(data['turn'] - me['last_eaten']) / STARVATION_TURNS
+        except KeyError as e:
+            LOG.warn("KeyError: %s", e)
+            board.starvation = .5
 
     return board
 
 def battlesnake_move(data, snake_name):
     return battlesnake_board(data, snake_name).move()
+
+def dump_request(data, snake_name):
+    """the board of a /move request, for logs"""
+    return battlesnake_board(data, snake_name).dumps()
@@ -0,0 +1,323 @@
+"""Latency benchmarks for /move.
+
+Replays a corpus of /move requests through a snake's
+battlesnake_move(), or through the whole bottle application in
+app.main, and reports p50/p95/p99/max latency by board size and
+number of snakes:
+
+    python -m battlesnake.bench bench/moves.jsonl.gz -t snake -t snake2 -t wsgi
+
+The corpus isn't kept in git.  Make one from 12 headless games with
+
+    python -m battlesnake.bench bench/moves.jsonl.gz --make-corpus 12
+
+or capture one from real games with battlesnake.capture.  `make
+benchmark` makes the corpus if it's missing, then runs the command
+above.
+
+A corpus is JSON lines, gzipped if it ends in .gz.  Each line is a
+record like the ones battlesnake.capture writes,
+
+    {"path": "/move", "snake_name": "a", "request": {...}}
+
+or just the /move request itself.  Records for other paths are
+skipped, and snake_name defaults to app.main.SNAKE_NAME.  --make-corpus
+writes a corpus from headless games.
+
+The json and bottle-json targets only decode each request's body, with
+battlesnake.codec and with bottle's request.json, to compare the two.
+
+--save-baseline keeps the results, and --baseline compares against
+them and exits 1 if any group's p95 got more than --tolerance times
+slower, or if anything took longer than --max-ms.
+"""
+from __future__ import print_function
+
+import argparse
+import collections
+import copy
+import gzip
+import importlib
+import io
+import json
+import logging
+import os
+import sys
+import timeit
+
+from battlesnake.board import request_size
+from battlesnake.tournament import POLICY_MODULES, RequestSnake, load_policy
+from battlesnake.game import Game
+
+BENCH_REPEAT = 1
+BENCH_TOLERANCE = 1.25
+
+# the latencies of one group of requests, in seconds, sorted
+Timings = collections.namedtuple('Timings', ['count', 'p50', 'p95', 'p99', 'max'])
+
+
+def open_corpus(path, mode='r'):
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 'b')
+    return io.open(path, mode + 'b')
+
+
+def read_corpus(path):
+    """yield (snake_name, request) for every /move in a corpus"""
+    with open_corpus(path) as lines:
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line.decode('utf-8'))
+            if 'request' in record:
+                if record.get('path', '/move') != '/move':
+                    continue
+                data = record['request']
+            else:
+                data = record
+            yield record.get('snake_name'), data
+
+
+def group_key(data):
+    """the group a request's latency is reported in: WxH/snakes"""
+    width, height = request_size(data)
+    return "%dx%d/%d" % (width, height, len(data['snakes']))
+
+
+def percentile(values, fraction):
+    """nearest-rank percentile of sorted values"""
+    idx = int(fraction * len(values) + 0.5) - 1
+    return values[min(max(idx, 0), len(values) - 1)]
+
+
+def timings(values):
+    values = sorted(values)
+    return Timings(len(values), percentile(values, 0.50), percentile(values, 0.95),
+                   percentile(values, 0.99), values[-1])
+
+
+def default_snake_name():
+    from app import main as app_main
+    return app_main.SNAKE_NAME
+
+
+def direct_target(spec):
+    """a function to time: the module's battlesnake_move(data, snake_name)"""
+    module = importlib.import_module(POLICY_MODULES.get(spec, spec))
+    return module.battlesnake_move
+
+
+def wsgi_target():
+    """a function to time: a POST to /move through app.main.application.
+    The request's snake_name is renamed to the app's SNAKE_NAME"""
+    from app import main as app_main
+    application = app_main.application
+
+    def start_response(status, headers, exc_info=None):
+        if not status.startswith('200'):
+            raise RuntimeError("/move returned %s" % status)
+
+    def move(data, snake_name):
+        if snake_name != app_main.SNAKE_NAME:
+            data = copy.deepcopy(data)
+            for snake in data['snakes']:
+                if snake['name'] == snake_name:
+                    snake['name'] = app_main.SNAKE_NAME
+        body = json.dumps(data).encode('utf-8')
+        environ = {
+            'REQUEST_METHOD': 'POST',
+            'PATH_INFO': '/move',
+            'SCRIPT_NAME': '',
+            'QUERY_STRING': '',
+            'SERVER_NAME': 'bench',
+            'SERVER_PORT': '80',
+            'SERVER_PROTOCOL': 'HTTP/1.1',
+            'CONTENT_TYPE': 'application/json',
+            'CONTENT_LENGTH': str(len(body)),
+            'wsgi.input': io.BytesIO(body),
+            'wsgi.url_scheme': 'http',
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': False,
+            'wsgi.multiprocess': False,
+            'wsgi.run_once': False,
+            'wsgi.version': (1, 0),
+        }
+        return b''.join(application(environ, start_response))
+    return move
+
+
+def wsgi_environ(body):
+    """the smallest environ a POST of body needs"""
+    return {
+        'REQUEST_METHOD': 'POST',
+        'CONTENT_TYPE': 'application/json',
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.input': io.BytesIO(body),
+    }
+
+
+def decode_target(decode):
+    """a function to time: decode(environ) of a /move request body.
+    Bodies are encoded by its prepare(), outside the timing"""
+    def move(body, snake_name):
+        return decode(wsgi_environ(body))
+    move.prepare = lambda data: json.dumps(data).encode('utf-8')
+    return move
+
+
+def bottle_decode(environ):
+    import bottle
+    return bottle.BaseRequest(environ).json
+
+
+def unprepared(data):
+    """a target's prepare() when it takes requests as they are"""
+    return data
+
+
+def target(spec):
+    if spec == 'wsgi':
+        return wsgi_target()
+    if spec == 'json':
+        from battlesnake import codec
+        return decode_target(codec.read_move)
+    if spec == 'bottle-json':
+        return decode_target(bottle_decode)
+    return direct_target(spec)
+
+
+def run(corpus, targets, repeat=BENCH_REPEAT, clock=timeit.default_timer):
+    """time every request in corpus against every target.  corpus is
+    a list of (snake_name, request), targets a list of specs.  Returns
+    {target: {group: Timings}}"""
+    results = {}
+    for spec in targets:
+        move = target(spec)
+        prepare = getattr(move, 'prepare', unprepared)
+        latencies = collections.defaultdict(list)
+        for snake_name, data in corpus:
+            if snake_name is None:
+                snake_name = default_snake_name()
+            key = group_key(data)
+            data = prepare(data)
+            for _ in range(repeat):
+                start = clock()
+                move(data, snake_name)
+                latencies[key].append(clock() - start)
+                latencies['all'].append(latencies[key][-1])
+        results[spec] = dict((key, timings(values)) for key, values in latencies.items())
+    return results
+
+
+def regressions(results, baseline, tolerance=BENCH_TOLERANCE, max_ms=None):
+    """a list of complaints about results: any group whose p95 is more
+    than tolerance times its baseline p95, and any request slower than
+    max_ms"""
+    complaints = []
+    for spec, groups in sorted(results.items()):
+        for key, timing in sorted(groups.items()):
+            if max_ms is not None and timing.max * 1000 > max_ms:
+                complaints.append("%s %s: max %.1fms is over %.1fms"
+                                  % (spec, key, timing.max * 1000, max_ms))
+            try:
+                base = Timings(*baseline[spec][key])
+            except (KeyError, TypeError):
+                continue
+            if timing.p95 > base.p95 * tolerance:
+                complaints.append("%s %s: p95 %.2fms is over %.2fms * %s"
+                                  % (spec, key, timing.p95 * 1000, base.p95 * 1000, tolerance))
+    return complaints
+
+
+def dump(results):
+    lines = []
+    for spec, groups in sorted(results.items()):
+        lines.append("%-10s %-12s %6s %8s %8s %8s %8s"
+                     % (spec, "group", "count", "p50ms", "p95ms", "p99ms", "maxms"))
+        for key, timing in sorted(groups.items()):
+            lines.append("%-10s %-12s %6d %8.2f %8.2f %8.2f %8.2f"
+                         % ("", key, timing.count, timing.p50 * 1000, timing.p95 * 1000,
+                            timing.p99 * 1000, timing.max * 1000))
+    return "\n".join(lines)
+
+
+class RecordingSnake(RequestSnake):
+    """a RequestSnake that also writes its requests to a corpus"""
+
+    def __init__(self, battlesnake_move, out):
+        super(RecordingSnake, self).__init__(battlesnake_move)
+        self.out = out
+
+    def move(self, game, board):
+        player = [p for p in game.snakes if p.snake is self][0]
+        data = game.move_request(self.game_id)
+        record = {'path': '/move', 'snake_name': player.name, 'request': data}
+        self.out.write(json.dumps(record, sort_keys=True).encode('utf-8') + b"\n")
+        return self.battlesnake_move(data, player.name)
+
+
+def make_corpus(path, games, sizes=(11, 15, 20), snakes=(2, 4), policy='snake', seed=0,
+                max_turns=100):
+    """write a corpus of the /move requests from headless games between
+    copies of policy"""
+    directory = os.path.dirname(path)
+    if directory and not os.path.isdir(directory):
+        os.makedirs(directory)
+    with open_corpus(path, 'w') as out:
+        for game_no in range(games):
+            size = sizes[game_no % len(sizes)]
+            count = snakes[(game_no // len(sizes)) % len(snakes)]
+            game = Game(size, size, seed + game_no)
+            for _ in range(count):
+                snake = RecordingSnake(load_policy(policy).battlesnake_move, out)
+                snake.game_id = game_no
+                game.add_snake(snake)
+            for _board in game.run():
+                if game.turn_count >= max_turns:
+                    break
+                game.add_stuff()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="time /move over a corpus of requests")
+    parser.add_argument('corpus')
+    parser.add_argument('-t', '--target', action='append', dest='targets',
+                        help="snake, snake2, search, mcts, a module, wsgi for app.main, "
+                        "or json or bottle-json to time decoding")
+    parser.add_argument('-r', '--repeat', type=int, default=BENCH_REPEAT)
+    parser.add_argument('--baseline', help="fail if slower than these saved results")
+    parser.add_argument('--save-baseline', help="save the results here")
+    parser.add_argument('--tolerance', type=float, default=BENCH_TOLERANCE)
+    parser.add_argument('--max-ms', type=float, help="fail if any move takes longer")
+    parser.add_argument('--make-corpus', type=int, metavar='GAMES',
+                        help="write a corpus from this many headless games instead")
+    args = parser.parse_args(argv)
+    # before the snakes are imported, so their own logging setup
+    # doesn't log every move
+    logging.basicConfig(level=logging.WARNING)
+
+    if args.make_corpus:
+        make_corpus(args.corpus, args.make_corpus)
+        return 0
+
+    corpus = list(read_corpus(args.corpus))
+    results = run(corpus, args.targets or ['snake'], args.repeat)
+    print(dump(results))
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as out:
+            json.dump(results, out, indent=1, sort_keys=True)
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+    complaints = regressions(results, baseline, args.tolerance, args.max_ms)
+    for complaint in complaints:
+        print("REGRESSION", complaint)
+    return 1 if complaints else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
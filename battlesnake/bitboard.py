@@ -0,0 +1,350 @@
+"""Bitboards for the game simulator.
+
+Each class of cell is one Python integer with a bit per cell: walls,
+food, and the body of each snake.  Rows are stride = width+1 bits
+apart, so the extra bit at the end of each row stops left and right
+moves wrapping into the next row.  Moving a whole mask is a shift,
+and collision tests and flood fills are ANDs and ORs.
+
+A BitState is a Game's state in this form.  BitState.turn() applies
+the same rules as Game.turn(), much faster, and copy() is cheap, so
+it's the state to use for search.
+"""
+from battlesnake.game import Game, SnakeBoard
+from battlesnake.zobrist import KIND_FOOD, KIND_BODY, KIND_HEAD, KIND_LENGTH, KIND_HEALTH
+
+
+def popcount(mask):
+    """the number of bits set in mask"""
+    return bin(mask).count('1')
+
+
+def bits(mask):
+    """yield the index of every bit set in mask, lowest first"""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+class BitBoard(object):
+    """the geometry of a width x height board of bits"""
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.stride = width + 1
+        row = (1 << width) - 1
+        inside = 0
+        for y in range(height):
+            inside |= row << (y * self.stride)
+        self.inside = inside
+
+        # move name -> change in bit index
+        self.deltas = {}
+        for move_name, (dx, dy) in SnakeBoard.MOVES.items():
+            self.deltas[move_name] = dy * self.stride + dx
+
+    def bit_index(self, pos):
+        """convert a board position (y*width + x) to a bit index"""
+        return pos + pos // self.width
+
+    def pos(self, bit_index):
+        """convert a bit index to a board position"""
+        return bit_index - bit_index // self.stride
+
+    def mask(self, positions):
+        """a mask with the bit for every board position set"""
+        mask = 0
+        for pos in positions:
+            mask |= 1 << self.bit_index(pos)
+        return mask
+
+    def positions(self, mask):
+        """the board positions of every bit in mask"""
+        return [self.pos(idx) for idx in bits(mask)]
+
+    def territory(self, heads, passable, lengths=None, longer_wins=True):
+        """battlesnake.territory.Territory.run() on bits: every snake's
+        BFS one level at a time, each a mask, so each level is a few
+        big-integer operations per snake rather than a loop over cells.
+        heads are bit indexes.  Returns (owned, contested), where
+        owned[k] is a mask of the cells snake k gets to first,
+        including its head, and contested the cells snakes tie for"""
+        count = len(heads)
+        if not (longer_wins and lengths):
+            lengths = [1] * count
+        # snakes of the same length, strongest first, so the cells they
+        # claim are taken before weaker snakes get to them
+        groups = {}
+        for k in range(count):
+            groups.setdefault(lengths[k], []).append(k)
+        groups = [groups[strength] for strength in sorted(groups, reverse=True)]
+        spread = self.spread
+        owned = [0] * count
+        claims = [1 << head for head in heads]
+        taken = 0
+        contested = 0
+        while True:
+            growing = False
+            for group in groups:
+                if len(group) == 1:
+                    k = group[0]
+                    claim = claims[k] & ~taken
+                    claims[k] = claim
+                    owned[k] |= claim
+                    taken |= claim
+                    growing = growing or claim != 0
+                    continue
+                # cells more than one snake of the same strength claims
+                seen = 0
+                clash = 0
+                for k in group:
+                    claim = claims[k] & ~taken
+                    clash |= seen & claim
+                    seen |= claim
+                    claims[k] = claim
+                for k in group:
+                    claim = claims[k] = claims[k] & ~clash
+                    owned[k] |= claim
+                contested |= clash
+                taken |= seen
+                growing = growing or seen != 0
+            if not growing:
+                return owned, contested
+            for k in range(count):
+                if claims[k]:
+                    claims[k] = spread(claims[k]) & passable
+
+    def on_board(self, bit_index):
+        return bit_index >= 0 and (self.inside >> bit_index) & 1 == 1
+
+    def spread(self, mask):
+        """mask plus every cell next to it"""
+        stride = self.stride
+        return (mask | mask << 1 | mask >> 1 | mask << stride | mask >> stride) & self.inside
+
+    def flood(self, seeds, passable):
+        """every cell reachable from seeds through passable cells"""
+        reached = seeds
+        while True:
+            grown = self.spread(reached) & (passable | reached)
+            if grown == reached:
+                return reached
+            reached = grown
+
+    def layers(self, seeds, passable):
+        """yield the cells at distance 0, 1, 2... from seeds, moving
+        through passable cells"""
+        reached = seeds
+        frontier = seeds
+        while frontier:
+            yield frontier
+            frontier = self.spread(frontier) & passable & ~reached
+            reached |= frontier
+
+
+class BitSnake(object):
+    """a snake in a BitState.  body is a list of bit indexes, head first"""
+    __slots__ = ('name', 'cell_type', 'body', 'mask', 'length', 'health', 'killed')
+
+    def copy(self):
+        snake = BitSnake()
+        snake.name = self.name
+        snake.cell_type = self.cell_type
+        snake.body = list(self.body)
+        snake.mask = self.mask
+        snake.length = self.length
+        snake.health = self.health
+        snake.killed = self.killed
+        return snake
+
+    def __repr__(self):
+        if self.killed:
+            state = "killed=%s" % (self.killed,)
+        else:
+            state = "health=%s length=%s" % (self.health, self.length)
+        return "%s(id=%s name=%s %s)" % \
+               (self.__class__.__name__, self.cell_type, self.name, state)
+
+
+class BitState(object):
+    """a game state as bitboards"""
+
+    def __init__(self, board, food=0, walls=0, snakes=(), max_health=Game.MAX_HEALTH):
+        self.board = board
+        self.food = food
+        self.walls = walls
+        self.snakes = list(snakes)
+        self.killed = []
+        self.turn_count = 0
+        self.max_health = max_health
+        # zobrist.Zobrist keys, and my key if hashed
+        self.zobrist = None
+        self.key = 0
+
+    @classmethod
+    def from_game(cls, game):
+        board = BitBoard(game.width, game.height)
+        state = cls(board, board.mask(game.food), board.mask(game.walls),
+                    max_health=game.MAX_HEALTH)
+        for player in game.snakes:
+            snake = BitSnake()
+            snake.name = player.name
+            snake.cell_type = player.cell_type
+            snake.body = [board.bit_index(pos) for pos in player.body]
+            snake.mask = board.mask(player.body)
+            snake.length = player.length
+            snake.health = player.health
+            snake.killed = player.killed
+            state.snakes.append(snake)
+        state.turn_count = game.turn_count
+        return state
+
+    def copy(self):
+        state = BitState(self.board, self.food, self.walls,
+                         [snake.copy() for snake in self.snakes], self.max_health)
+        state.killed = list(self.killed)
+        state.turn_count = self.turn_count
+        state.zobrist = self.zobrist
+        state.key = self.key
+        return state
+
+    def hash_with(self, zobrist):
+        """start keeping my Zobrist key up to date as I turn"""
+        self.zobrist = zobrist
+        self.key = zobrist.state_key(self)
+        return self.key
+
+    def occupied(self):
+        """every cell covered by a wall or a snake"""
+        mask = self.walls
+        for snake in self.snakes:
+            mask |= snake.mask
+        return mask
+
+    def turn(self, move_names):
+        """move every snake, one move name per snake in self.snakes,
+        with the same rules as Game.turn().  A snake with a move of
+        None stays put, so runs into itself"""
+        self.turn_count += 1
+        board = self.board
+        deltas = board.deltas
+        inside = board.inside
+        zobrist = self.zobrist
+        if zobrist is not None:
+            zkey = zobrist.key
+
+        # move snakes, and clear the tails that move off
+        for snake, move_name in zip(self.snakes, move_names):
+            if move_name is None:
+                continue
+            idx = snake.body[0] + deltas[move_name]
+            if idx < 0 or not (inside >> idx) & 1:
+                snake.killed = "Moved out of bounds"
+                continue
+            body = snake.body
+            if zobrist is not None:
+                slot = snake.cell_type
+                self.key ^= (zkey(KIND_HEAD, slot, body[0]) ^ zkey(KIND_HEAD, slot, idx)
+                             ^ zkey(KIND_BODY, slot, idx))
+            body.insert(0, idx)
+            while len(body) > snake.length:
+                tail = body.pop()
+                snake.mask &= ~(1 << tail)
+                if zobrist is not None:
+                    self.key ^= zkey(KIND_BODY, snake.cell_type, tail)
+
+        # place the new heads and detect collisions
+        for snake in self.snakes:
+            idx = snake.body[0]
+            bit = 1 << idx
+            if self.food & bit:
+                if zobrist is not None:
+                    slot = snake.cell_type
+                    self.key ^= (zkey(KIND_FOOD, None, idx)
+                                 ^ zkey(KIND_LENGTH, slot, snake.length) ^ zkey(KIND_LENGTH, slot, snake.length + 1)
+                                 ^ zkey(KIND_HEALTH, slot, snake.health) ^ zkey(KIND_HEALTH, slot, self.max_health))
+                snake.length += 1
+                snake.health = self.max_health
+                snake.mask |= bit
+                self.food &= ~bit
+            elif self.walls & bit:
+                snake.killed = "Ran into wall!"
+            else:
+                other = None
+                for other in self.snakes:
+                    if other.mask & bit:
+                        break
+                else:
+                    other = None
+                if other is None:
+                    if zobrist is not None:
+                        slot = snake.cell_type
+                        self.key ^= (zkey(KIND_HEALTH, slot, snake.health)
+                                     ^ zkey(KIND_HEALTH, slot, snake.health - 1))
+                    snake.health -= 1
+                    if snake.health <= 0:
+                        snake.killed = "Starvation!"
+                    snake.mask |= bit
+                elif other is snake:
+                    snake.killed = "Ran into self!"
+                else:
+                    snake.killed = "Ran into %s!" % other.name
+                    if idx == other.body[0]:
+                        # head to head, both are dead
+                        other.killed = "Ran into %s!" % snake.name
+
+        for snake in list(self.snakes):
+            if snake.killed:
+                if zobrist is not None:
+                    self.key ^= zobrist.snake_key(snake)
+                self.killed.append(snake)
+                self.snakes.remove(snake)
+
+    def step(self, deltas):
+        """turn() for rollouts: the same rules, but moves are changes in
+        bit index (see BitBoard.deltas), nothing is allocated, kills
+        aren't explained or in order, and my Zobrist key goes stale."""
+        self.turn_count += 1
+        inside = self.board.inside
+        snakes = self.snakes
+
+        for snake, delta in zip(snakes, deltas):
+            body = snake.body
+            idx = body[0] + delta
+            if idx < 0 or not (inside >> idx) & 1:
+                snake.killed = True
+                continue
+            body.insert(0, idx)
+            while len(body) > snake.length:
+                snake.mask &= ~(1 << body.pop())
+
+        for snake in snakes:
+            idx = snake.body[0]
+            bit = 1 << idx
+            if self.food & bit:
+                snake.length += 1
+                snake.health = self.max_health
+                snake.mask |= bit
+                self.food &= ~bit
+            elif self.walls & bit:
+                snake.killed = True
+            else:
+                for other in snakes:
+                    if other.mask & bit:
+                        snake.killed = True
+                        if other is not snake and idx == other.body[0]:
+                            other.killed = True
+                        break
+                else:
+                    snake.health -= 1
+                    if snake.health <= 0:
+                        snake.killed = True
+                    snake.mask |= bit
+
+        i = len(snakes)
+        while i:
+            i -= 1
+            if snakes[i].killed:
+                self.killed.append(snakes.pop(i))
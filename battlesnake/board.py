@@ -1,4 +1,7 @@
-from collections import namedtuple
+from array import array
+from collections import namedtuple, OrderedDict
+import itertools
+import threading
 
 Move = namedtuple('Move', ['name', 'dx', 'dy'], verbose=True)
 
@@ -20,6 +23,136 @@ CompassMoves = (
     Move("NW", -1, -1),
 )
 
+# a board's neighbour tables, indexed by cell.  moves[i] is a tuple of
+# (index, move) for every move from i that stays on the board,
+# by_name[i] the same with move.name, and adjacency[i] just the indexes
+NeighbourTable = namedtuple('NeighbourTable', ['width', 'height', 'moves', 'by_name', 'adjacency'])
+
+NEIGHBOUR_TABLE_CACHE_SIZE = 16
+_neighbour_tables = OrderedDict()
+_neighbour_tables_lock = threading.Lock()
+
+def neighbour_table(width, height, moves=ManhattanMoves):
+    """return the NeighbourTable for a board size and move set.
+
+    Tables are immutable and shared by every board in the process, so
+    each size is only built once.  moves is a sequence of objects with
+    dx, dy and name, best a tuple.  Finding a table that's already
+    built is a plain dict lookup; only building one takes a lock.  The
+    oldest tables are dropped after NEIGHBOUR_TABLE_CACHE_SIZE."""
+    if not isinstance(moves, tuple):
+        moves = tuple(moves)
+    key = (width, height, moves)
+    table = _neighbour_tables.get(key)
+    if table is not None:
+        return table
+    with _neighbour_tables_lock:
+        table = _neighbour_tables.get(key)
+        if table is None:
+            table = _neighbour_tables[key] = _build_neighbour_table(width, height, moves)
+            while len(_neighbour_tables) > NEIGHBOUR_TABLE_CACHE_SIZE:
+                _neighbour_tables.popitem(last=False)
+    return table
+
+def _build_neighbour_table(width, height, moves):
+    by_move = []
+    for y in range(height):
+        for x in range(width):
+            neighs = []
+            for move in moves:
+                x1 = x + move.dx
+                y1 = y + move.dy
+                if x1 >= 0 and x1 < width and y1 >= 0 and y1 < height:
+                    neighs.append((y1 * width + x1, move))
+            by_move.append(tuple(neighs))
+    return NeighbourTable(
+        width, height,
+        tuple(by_move),
+        tuple(tuple((index, move.name) for index, move in neighs) for neighs in by_move),
+        tuple(tuple(index for index, _move in neighs) for neighs in by_move))
+
+_row_offsets = {}
+
+def row_offsets(width, height):
+    """the index of the first cell of each row of a flat board"""
+    key = (width, height)
+    try:
+        return _row_offsets[key]
+    except KeyError:
+        rows = _row_offsets[key] = tuple(range(0, width * height, width))
+        return rows
+
+def request_size(data):
+    """(width, height) of a /move request's board.  From its width and
+    height if it has them, so the board grid is never looked at"""
+    try:
+        return data['width'], data['height']
+    except KeyError:
+        board = data['board']
+        return len(board[0]), len(board)
+
+def _outside(x, y, width, height):
+    return IndexError("coordinates (%s, %s) are outside (%s, %s)" % (x, y, width, height))
+
+def paint_request(cells, width, height, data, snake_name, food, me, enemies, blank):
+    """draw a /move request's food and snakes straight into cells, a
+    flat list of width*height blank cells.  Each snake is its head
+    letter then that letter in lower case, and cells that are already
+    drawn on keep what they have.  I'm me, and the other snakes get
+    letters from enemies in turn, round again if there are more
+    snakes than letters.  Returns my snake from the request, or None.
+    Raises IndexError for coordinates off the board, like Board.index()"""
+    rows = row_offsets(width, height)
+    for x, y in data['food']:
+        if x < 0 or y < 0 or x >= width or y >= height:
+            raise _outside(x, y, width, height)
+        cells[rows[y] + x] = food
+
+    enemies = itertools.cycle(enemies)
+    mine = None
+    for snake in data['snakes']:
+        if snake['name'] == snake_name:
+            head = me
+            mine = snake
+        else:
+            head = next(enemies)
+        cell = head
+        body = head.lower()
+        for x, y in snake['coords']:
+            if x < 0 or y < 0 or x >= width or y >= height:
+                raise _outside(x, y, width, height)
+            idx = rows[y] + x
+            if cells[idx] == blank:
+                cells[idx] = cell
+            cell = body
+    return mine
+
+def request_indices(data, width):
+    """the set of cell indices a /move request draws on: its food and
+    snakes"""
+    indices = set(y * width + x for x, y in data['food'])
+    for snake in data['snakes']:
+        indices.update(y * width + x for x, y in snake['coords'])
+    return indices
+
+def vacate_turns(data, width, height):
+    """how many moves until each cell a /move request's snakes are on
+    is free, if none of them eat: a snake n long leaves the cell of its
+    segment i after n - i moves, and a cell it's on twice, after eating,
+    when its first segment there leaves.  Returns an integer array
+    with 0 for free cells"""
+    vacate = array('i', [0]) * (width * height)
+    rows = row_offsets(width, height)
+    for snake in data['snakes']:
+        coords = snake['coords']
+        length = len(coords)
+        for i, (x, y) in enumerate(coords):
+            idx = rows[y] + x
+            turns = length - i
+            if turns > vacate[idx]:
+                vacate[idx] = turns
+    return vacate
+
 class Board(list):
     """A 2-d array of values, stored in a list"""
 
@@ -47,8 +180,7 @@ class Board(list):
     def index(self, x, y):
         """convert (x,y) coordinates to an integer index in my array"""
         if x < 0 or y < 0 or x >= self.width or y >= self.height:
-            raise IndexError("coordinates (%s, %s) are outside (%s, %s)"
-                             % (x, y, self.width, self.height))
+            raise _outside(x, y, self.width, self.height)
         return y * self.width + x
 
     def coords(self, index):
@@ -56,14 +188,8 @@ class Board(list):
         return index % self.width, index / self.width
 
     def neighbours(self, pos, moves):
-        """return all (x, y, move) adjacent to index.  moves is an array of obects that define dx and dy"""
-        x, y = self.coords(pos)
-        neighs = []
-        for move in moves:
-            x1 = x + move.dx
-            y1 = y + move.dy
-            if x1 >= 0 and x1 < self.width and y1 >= 0 and y1 < self.height:
-                yield self.index(x1, y1), move
+        """return all (index, move) adjacent to index.  moves is an array of obects that define dx and dy"""
+        return neighbour_table(self.width, self.height, moves).moves[pos]
     
     def dump(self):
         s = ""
@@ -0,0 +1,246 @@
+"""Capture a sample of a snake server's requests as a corpus.
+
+CaptureMiddleware wraps a WSGI application and records a sample of the
+/start, /move and /end requests it serves: the request body, the
+response, and how long the application took.  Records go to a
+CaptureWriter, which writes them as JSON lines from a background
+thread, one per request:
+
+    {"path": "/move", "time": 1476789000.0, "elapsed": 0.0021,
+     "status": "200 OK", "request": {...}, "response": {...}}
+
+the shape battlesnake.bench reads.  The request thread only copies the
+bodies onto a bounded queue; JSON and disk are the writer thread's
+problem, and if it falls behind, records are dropped rather than
+making a request wait.
+
+The writer is a real OS thread even when gevent has monkeypatched
+threading, as it has under gunicorn's gevent workers: a patched thread
+would be a greenlet, and gzip and disk would stall the worker's event
+loop.  So the thread and its locks are the unpatched ones, and the
+queue is a deque the request side never blocks on.
+
+Files end in .gz to be gzipped, and rotate when they reach max_bytes
+on disk: moves.jsonl becomes moves.1.jsonl and so on, keeping backups
+old files.
+"""
+import collections
+import gzip
+import importlib
+import io
+import json
+import logging
+import os
+import random
+import sys
+import time
+
+try:
+    from gevent.monkey import get_original
+except ImportError:
+    def get_original(mod_name, item_names):
+        module = importlib.import_module(mod_name)
+        return [getattr(module, name) for name in item_names]
+
+LOG = logging.getLogger(__name__)
+
+# real threads and locks, whatever gevent has patched
+_THREAD = 'thread' if sys.version_info[0] == 2 else '_thread'
+start_new_thread, allocate_lock = get_original(_THREAD, ['start_new_thread', 'allocate_lock'])
+ThreadError = importlib.import_module(_THREAD).error
+
+CAPTURE_PATHS = ('/start', '/move', '/end')
+CAPTURE_MAX_BYTES = 64 << 20
+CAPTURE_BACKUPS = 4
+CAPTURE_QUEUE_SIZE = 1024
+
+
+def rotated_path(path, n):
+    """moves.jsonl.gz -> moves.<n>.jsonl.gz"""
+    gz = ''
+    if path.endswith('.gz'):
+        path, gz = path[:-3], '.gz'
+    root, ext = os.path.splitext(path)
+    return "%s.%d%s%s" % (root, n, ext, gz)
+
+
+def decode(body):
+    """a body as JSON if it is, else as text"""
+    if not body:
+        return None
+    try:
+        return json.loads(body.decode('utf-8'))
+    except ValueError:
+        return body.decode('utf-8', 'replace')
+
+
+class CaptureWriter(object):
+    """writes captured requests to path from a background thread"""
+
+    def __init__(self, path, max_bytes=CAPTURE_MAX_BYTES, backups=CAPTURE_BACKUPS,
+                 queue_size=CAPTURE_QUEUE_SIZE, start=True):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.queue = collections.deque()
+        self.queue_size = queue_size
+        # held while the queue may be empty, released by put() to wake
+        # the writer
+        self.wake = allocate_lock()
+        self.wake.acquire()
+        # held until the writer thread has finished
+        self.done = None
+        self.out = None
+        self.size = 0
+        self.written = 0
+        self.dropped = 0
+        if start:
+            self.start()
+
+    def start(self):
+        self.done = allocate_lock()
+        self.done.acquire()
+        start_new_thread(self.run, ())
+
+    def notify(self):
+        try:
+            self.wake.release()
+        except ThreadError:
+            # already released, and the writer will see the queue
+            pass
+
+    def put(self, record):
+        """queue a record (path, time, elapsed, status, request body,
+        response body) without waiting"""
+        if len(self.queue) >= self.queue_size:
+            self.dropped += 1
+            return
+        self.queue.append(record)
+        self.notify()
+
+    def close(self):
+        """write everything queued, then stop.  This waits for the
+        writer, so it's for shutdown, not the request path"""
+        if self.done is not None:
+            self.queue.append(None)
+            self.notify()
+            self.done.acquire()
+            self.done = None
+        if self.out is not None:
+            self.out.close()
+            self.out = None
+
+    def open(self):
+        if self.path.endswith('.gz'):
+            self.out = gzip.open(self.path, 'ab')
+        else:
+            self.out = io.open(self.path, 'ab')
+        self.size = os.path.getsize(self.path)
+
+    def disk_size(self):
+        """the bytes of my file on disk so far, compressed if it is"""
+        return getattr(self.out, 'fileobj', self.out).tell()
+
+    def rotate(self):
+        self.out.close()
+        self.out = None
+        for n in range(self.backups - 1, 0, -1):
+            src = rotated_path(self.path, n)
+            if os.path.exists(src):
+                os.rename(src, rotated_path(self.path, n + 1))
+        if self.backups:
+            os.rename(self.path, rotated_path(self.path, 1))
+        else:
+            os.remove(self.path)
+
+    def write(self, record):
+        path, when, elapsed, status, request, response = record
+        line = json.dumps({
+            'path': path,
+            'time': when,
+            'elapsed': elapsed,
+            'status': status,
+            'request': decode(request),
+            'response': decode(response),
+            }, sort_keys=True).encode('utf-8') + b"\n"
+        if self.out is None:
+            self.open()
+        self.out.write(line)
+        self.size = max(self.size, self.disk_size())
+        self.written += 1
+        if self.size >= self.max_bytes:
+            self.rotate()
+
+    def run(self):
+        try:
+            while True:
+                try:
+                    record = self.queue.popleft()
+                except IndexError:
+                    # caught up, so put what's written on disk and wait
+                    try:
+                        if self.out is not None:
+                            self.out.flush()
+                            self.size = max(self.size, self.disk_size())
+                    except Exception:
+                        LOG.exception("capture failed path=%s", self.path)
+                    self.wake.acquire()
+                    continue
+                if record is None:
+                    break
+                try:
+                    self.write(record)
+                except Exception:
+                    LOG.exception("capture failed path=%s", self.path)
+        finally:
+            self.done.release()
+
+
+class CaptureMiddleware(object):
+    """WSGI middleware that sends a sample of app's requests to writer"""
+
+    def __init__(self, app, writer, rate=1.0, paths=CAPTURE_PATHS, rnd=None):
+        self.app = app
+        self.writer = writer
+        self.rate = rate
+        self.paths = frozenset(paths)
+        self.random = rnd or random.Random()
+
+    def __call__(self, environ, start_response):
+        path = environ.get('PATH_INFO', '')
+        if path not in self.paths or self.random.random() >= self.rate:
+            return self.app(environ, start_response)
+
+        # read the body so it can be recorded, and give the app a copy
+        try:
+            length = int(environ.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            length = 0
+        request = environ['wsgi.input'].read(length) if length > 0 else b''
+        environ['wsgi.input'] = io.BytesIO(request)
+
+        status = []
+        def capture_start_response(status_line, headers, exc_info=None):
+            status.append(status_line)
+            if exc_info is None:
+                return start_response(status_line, headers)
+            return start_response(status_line, headers, exc_info)
+
+        start = time.time()
+        result = self.app(environ, capture_start_response)
+        try:
+            response = b''.join(result)
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+        elapsed = time.time() - start
+
+        self.writer.put((path, start, elapsed, status[0] if status else None, request, response))
+        return [response]
+
+
+def capture_middleware(app, path, rate=1.0, max_bytes=CAPTURE_MAX_BYTES,
+                       backups=CAPTURE_BACKUPS, queue_size=CAPTURE_QUEUE_SIZE):
+    """wrap app to capture rate of its requests to path"""
+    writer = CaptureWriter(path, max_bytes, backups, queue_size)
+    return CaptureMiddleware(app, writer, rate)
@@ -0,0 +1,132 @@
+"""Chambers: how much room is behind each cell, given chokepoints.
+
+A flood fill counts every cell I can reach, but if I go through a
+cell whose removal splits the free cells in two, an articulation
+point, I only get one side: my body seals the other off behind me.
+analyse() finds the articulation points of the free cells with one
+depth-first search (Tarjan's, with an explicit stack), and for each
+cell, the sizes of the chambers its removal leaves, so the room after
+moving to any cell is known without another flood fill.
+
+Boards are flat, with the same adjacency tables and passable masks as
+battlesnake.field.
+"""
+from array import array
+
+from battlesnake.field import UNREACHED, new_field
+
+
+class Chambers(object):
+    """the result of analyse().  For each passable cell reached:
+
+    disc, low: Tarjan's discovery order and low link
+    parent: the cell it was discovered from, UNREACHED for a root
+    root: the root of its component
+    count: the number of cells in its DFS subtree, itself included
+    cut: 1 if it's an articulation point
+    split_max, split_sum: the largest and total size of the DFS
+        subtrees under it that only connect to the rest through it
+    """
+
+    def __init__(self, size):
+        self.disc = new_field(size)
+        self.low = new_field(size)
+        self.parent = new_field(size)
+        self.root = new_field(size)
+        self.count = array('i', [0]) * size
+        self.split_max = array('i', [0]) * size
+        self.split_sum = array('i', [0]) * size
+        self.cut = bytearray(size)
+
+    def component(self, idx):
+        """the number of cells in idx's component"""
+        if self.disc[idx] == UNREACHED:
+            return 0
+        return self.count[self.root[idx]]
+
+    def room(self, idx):
+        """how many cells I can visit starting at idx, idx included:
+        all of its component, unless idx is an articulation point, when
+        it's idx and the biggest chamber it leaves.  0 if idx wasn't
+        reached"""
+        if self.disc[idx] == UNREACHED:
+            return 0
+        rest = self.count[self.root[idx]] - 1 - self.split_sum[idx]
+        return 1 + max(self.split_max[idx], rest)
+
+
+def analyse(adjacency, passable, roots):
+    """find the articulation points of the passable cells in the
+    components of roots, with one depth-first search per component.
+    Returns Chambers."""
+    chambers = Chambers(len(adjacency))
+    disc = chambers.disc
+    low = chambers.low
+    parent = chambers.parent
+    root_of = chambers.root
+    count = chambers.count
+    split_max = chambers.split_max
+    split_sum = chambers.split_sum
+    cut = chambers.cut
+
+    # the next neighbour to look at, by cell
+    next_adj = bytearray(len(adjacency))
+    order = 0
+    for root in roots:
+        if not passable[root] or disc[root] != UNREACHED:
+            continue
+        disc[root] = low[root] = order
+        order += 1
+        count[root] = 1
+        root_of[root] = root
+        root_children = 0
+        stack = [root]
+        idx = root
+        while True:
+            neighbours = adjacency[idx]
+            i = next_adj[idx]
+            end = len(neighbours)
+            low_idx = low[idx]
+            while i < end:
+                adj = neighbours[i]
+                i += 1
+                if passable[adj]:
+                    seen = disc[adj]
+                    if seen == UNREACHED:
+                        break
+                    if seen < low_idx and adj != parent[idx]:
+                        low_idx = seen
+            else:
+                low[idx] = low_idx
+                # done with idx, so fold it into its parent
+                stack.pop()
+                if not stack:
+                    break
+                up = stack[-1]
+                size = count[idx]
+                count[up] += size
+                if low_idx < low[up]:
+                    low[up] = low_idx
+                if low_idx >= disc[up]:
+                    # idx's subtree only connects through up
+                    split_sum[up] += size
+                    if size > split_max[up]:
+                        split_max[up] = size
+                    if up != root:
+                        cut[up] = 1
+                    else:
+                        root_children += 1
+                idx = up
+                continue
+            low[idx] = low_idx
+            next_adj[idx] = i
+            disc[adj] = low[adj] = order
+            order += 1
+            parent[adj] = idx
+            root_of[adj] = root
+            count[adj] = 1
+            stack.append(adj)
+            idx = adj
+        if root_children > 1:
+            cut[root] = 1
+    return chambers
@@ -0,0 +1,102 @@
+"""JSON for the snake server's requests and responses.
+
+bottle decodes request.json with the stdlib, after copying the body
+into a buffer of its own.  This module uses the fastest JSON library
+there is, trying CODECS in order (or the comma separated module names
+in SNAKE_JSON), and the stdlib json if none of the others are
+installed.  read_json() decodes a request body straight from
+wsgi.input.
+
+Most of a legacy /move request is its board, a grid of every cell,
+which the snakes never look at: they draw their own boards from the
+food and snakes.  read_move() cuts the board out of the body before
+it's decoded, when the request has a width and height to go by
+instead, and keeps only MOVE_FIELDS.
+"""
+import importlib
+import os
+import re
+
+CODECS = ('ujson', 'simplejson', 'json')
+
+# all a snake reads from a /move request
+MOVE_FIELDS = ('game', 'turn', 'width', 'height', 'food', 'snakes', 'timeout')
+
+# the board, a list of rows of cells, none of which contain a list,
+# but may contain strings with brackets in them
+_STRING = br'"[^"\\]*(?:\\.[^"\\]*)*"'
+_ROW = br'\[[^\[\]"]*(?:' + _STRING + br'[^\[\]"]*)*\]'
+BOARD_RE = re.compile(br'([{,]\s*"board"\s*:\s*)\[\s*(?:' + _ROW + br'\s*(?:,\s*' + _ROW
+                      + br'\s*)*)?\]')
+BOARD_KEY_RE = re.compile(br'"board"\s*:\s*')
+
+
+def load_codec(names=CODECS):
+    """the first of the modules called names that can be imported"""
+    for name in names:
+        try:
+            return importlib.import_module(name.strip())
+        except ImportError:
+            pass
+    return importlib.import_module('json')
+
+
+CODEC = load_codec(os.environ['SNAKE_JSON'].split(',') if os.environ.get('SNAKE_JSON')
+                   else CODECS)
+loads = CODEC.loads
+dumps = CODEC.dumps
+
+
+def read_body(environ):
+    """the request body from wsgi.input"""
+    try:
+        length = int(environ.get('CONTENT_LENGTH') or -1)
+    except ValueError:
+        length = -1
+    if length == 0:
+        return b''
+    if length > 0:
+        return environ['wsgi.input'].read(length)
+    return environ['wsgi.input'].read()
+
+
+def read_json(environ):
+    """the request body decoded, or None if there isn't one"""
+    body = read_body(environ)
+    if not body:
+        return None
+    return loads(body)
+
+
+def strip_board(body):
+    """a /move request body with its board replaced by null, if it has
+    a width and height to go by instead"""
+    if b'"width"' not in body or b'"height"' not in body:
+        return body
+    key = BOARD_KEY_RE.match(body, max(body.find(b'"board"'), 0))
+    if key is None:
+        return body
+    # a board of nulls or numbers ends at the first ]], and finding
+    # that is much quicker than matching BOARD_RE
+    start = key.end()
+    end = body.find(b']]', start)
+    if end >= 0 and body.find(b'"', start, end) < 0 and body[start:start + 1] == b'[':
+        return body[:start] + b'null' + body[end + 2:]
+    return BOARD_RE.sub(br'\1null', body, 1)
+
+
+def decode_move(body):
+    """the MOVE_FIELDS of a /move request body"""
+    data = loads(strip_board(body))
+    if data.get('board') is None:
+        return dict((key, data[key]) for key in MOVE_FIELDS if key in data)
+    # no width or height, so keep the board to measure
+    return data
+
+
+def read_move(environ):
+    """the MOVE_FIELDS of a /move request"""
+    body = read_body(environ)
+    if not body:
+        return None
+    return decode_move(body)
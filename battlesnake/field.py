@@ -0,0 +1,254 @@
+"""Distance fields over flat boards.
+
+A board here is just a range of integer cell indexes.  Geometry comes
+from an adjacency table: adjacency[i] is a tuple of the cell indexes
+next to i.  Cells are passable if passable[i] is true.  Distances are
+integer moves stored in an array, with UNREACHED for cells that can't
+be reached from any seed.
+
+Searches given a deadline check clock() against it every
+DEADLINE_LEVELS levels and raise FieldTimeout when it's passed, so a
+caller out of time can give up on a field halfway through.
+"""
+from array import array
+import time
+
+from battlesnake.pool import BufferPool
+
+UNREACHED = -1
+
+DEADLINE_LEVELS = 4
+
+
+class FieldTimeout(Exception):
+    """a search ran past its deadline and was abandoned"""
+
+
+def check_deadline(deadline, clock=time.time):
+    """raise FieldTimeout if deadline, a clock() time, has passed"""
+    if deadline is not None and clock() >= deadline:
+        raise FieldTimeout()
+
+
+def new_field(size, value=UNREACHED):
+    """make an integer array of size cells, all set to value"""
+    return array('i', [value]) * size
+
+
+_blank_fields = {}
+
+def reset_field(dist, size):
+    """set every cell of dist back to UNREACHED, in one copy"""
+    try:
+        blank = _blank_fields[size]
+    except KeyError:
+        blank = _blank_fields[size] = new_field(size)
+    dist[:] = blank
+
+# distance fields to reuse, by size
+FIELD_POOL = BufferPool(new_field, reset_field)
+
+
+def distance_field(adjacency, seeds, passable, dist=None, labels=None, level=0,
+                   deadline=None, clock=time.time):
+    """breadth-first search out from all seeds at once.
+
+    Returns (dist, max_dist) where dist[i] is the number of moves from
+    cell i to the nearest seed, and max_dist is the largest distance
+    found.  Seeds are always at distance level, even if not passable.
+    If dist is given, unvisited cells must be UNREACHED, and it is
+    reused.
+
+    If labels is given, every cell reached copies the label of the
+    cell it was reached from, so each cell ends up labelled with the
+    seed that got there first.  Seeds must already be labelled.
+
+    If deadline is given, raises FieldTimeout when it passes, leaving
+    dist half done.
+    """
+    if dist is None:
+        dist = new_field(len(adjacency))
+
+    frontier = []
+    for idx in seeds:
+        if dist[idx] == UNREACHED:
+            dist[idx] = level
+            frontier.append(idx)
+    max_dist = level if frontier else 0
+
+    while frontier:
+        level += 1
+        if deadline is not None and level % DEADLINE_LEVELS == 0 and clock() >= deadline:
+            raise FieldTimeout()
+        frontier_next = []
+        append = frontier_next.append
+        if labels is None:
+            for idx in frontier:
+                for adj in adjacency[idx]:
+                    if dist[adj] == UNREACHED and passable[adj]:
+                        dist[adj] = level
+                        append(adj)
+        else:
+            for idx in frontier:
+                label = labels[idx]
+                for adj in adjacency[idx]:
+                    if dist[adj] == UNREACHED and passable[adj]:
+                        dist[adj] = level
+                        labels[adj] = label
+                        append(adj)
+        if frontier_next:
+            max_dist = level
+        frontier = frontier_next
+
+    return dist, max_dist
+
+
+def timed_field(adjacency, seeds, passable, vacate, dist=None, labels=None, level=0,
+                deadline=None, clock=time.time):
+    """distance_field() over a board where snakes move on.  vacate[i]
+    is the number of moves until cell i is free, or 0 if it's free or
+    never will be, like a wall, and a cell that isn't passable can be
+    moved into anyway at or after the move it's vacated.
+
+    A cell that's still occupied when one neighbour gets to it isn't
+    marked, so a neighbour that gets there later can try again.  Every
+    cell is still only searched out from once, at the first move it's
+    reached, so this costs the same as distance_field(), at most one
+    look from every neighbour.  That also means no waiting around: a
+    body that's only gone after the fill has passed it stays blocked.
+    """
+    if dist is None:
+        dist = new_field(len(adjacency))
+
+    frontier = []
+    for idx in seeds:
+        if dist[idx] == UNREACHED:
+            dist[idx] = level
+            frontier.append(idx)
+    max_dist = level if frontier else 0
+
+    while frontier:
+        level += 1
+        if deadline is not None and level % DEADLINE_LEVELS == 0 and clock() >= deadline:
+            raise FieldTimeout()
+        frontier_next = []
+        append = frontier_next.append
+        if labels is None:
+            for idx in frontier:
+                for adj in adjacency[idx]:
+                    if dist[adj] == UNREACHED and (passable[adj] or 0 < vacate[adj] <= level):
+                        dist[adj] = level
+                        append(adj)
+        else:
+            for idx in frontier:
+                label = labels[idx]
+                for adj in adjacency[idx]:
+                    if dist[adj] == UNREACHED and (passable[adj] or 0 < vacate[adj] <= level):
+                        dist[adj] = level
+                        labels[adj] = label
+                        append(adj)
+        if frontier_next:
+            max_dist = level
+        frontier = frontier_next
+
+    return dist, max_dist
+
+
+def passable_mask(values, is_passable):
+    """make a bytearray that is 1 for every value where
+    is_passable(value) is true.  is_passable is only called once per
+    distinct value."""
+    memo = {}
+    mask = bytearray(len(values))
+    for idx, val in enumerate(values):
+        try:
+            ok = memo[val]
+        except KeyError:
+            ok = memo[val] = 1 if is_passable(val) else 0
+        if ok:
+            mask[idx] = 1
+    return mask
+
+
+def repair_field(adjacency, dist, seeds, passable, changed):
+    """update dist, the distance field of an earlier board, in place
+    for a board that differs from it in the cells changed.  seeds and
+    passable are the new board's, as for distance_field().  Returns
+    (dist, max_dist), the same as distance_field() would have made.
+
+    Only the cells whose distances change are visited, in two passes
+    over buckets of cells by distance.  First, increases: a cell keeps
+    its distance if a neighbour is still one closer, and the cells
+    that don't are cleared, which in turn can clear the cells one
+    further out.  Then decreases: the cleared and changed cells get
+    the best distance their neighbours offer, or 0 for seeds, and
+    breadth-first search goes on from them over any cell they make
+    closer.
+    """
+    seeds = set(seeds)
+
+    # increases, nearest first, so a neighbour's distance is settled
+    # before it's used as support
+    buckets = {}
+    for idx in changed:
+        level = dist[idx]
+        if level != UNREACHED:
+            buckets.setdefault(level, []).append(idx)
+    cleared = []
+    level = min(buckets) if buckets else 0
+    while buckets:
+        cells = buckets.pop(level, ())
+        for idx in cells:
+            if dist[idx] != level:
+                continue
+            if idx in seeds:
+                # only ever gets closer
+                continue
+            if passable[idx] and level > 0:
+                below = level - 1
+                if any(dist[adj] == below for adj in adjacency[idx]):
+                    continue
+            dist[idx] = UNREACHED
+            cleared.append(idx)
+            above = level + 1
+            for adj in adjacency[idx]:
+                if dist[adj] == above:
+                    buckets.setdefault(above, []).append(adj)
+        level += 1
+
+    # decreases
+    buckets = {}
+    for idx in cleared + list(changed):
+        if idx in seeds:
+            best = 0
+        elif passable[idx]:
+            best = UNREACHED
+            for adj in adjacency[idx]:
+                level = dist[adj]
+                if level != UNREACHED and (best == UNREACHED or level + 1 < best):
+                    best = level + 1
+            if best == UNREACHED:
+                continue
+        else:
+            continue
+        if dist[idx] == UNREACHED or best < dist[idx]:
+            dist[idx] = best
+            buckets.setdefault(best, []).append(idx)
+    level = min(buckets) if buckets else 0
+    while buckets:
+        cells = buckets.pop(level, ())
+        above = level + 1
+        frontier_next = []
+        for idx in cells:
+            if dist[idx] != level:
+                continue
+            for adj in adjacency[idx]:
+                old = dist[adj]
+                if (old == UNREACHED or old > above) and passable[adj]:
+                    dist[adj] = above
+                    frontier_next.append(adj)
+        if frontier_next:
+            buckets.setdefault(above, []).extend(frontier_next)
+        level = above
+
+    return dist, max(max(dist), 0) if len(dist) else 0
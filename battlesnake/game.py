@@ -1,10 +1,155 @@
 import math
 import collections
 import itertools
-from random import randint
+import random
 
 from battlesnake.board import Board
 
+# snake servers count a /move request's last_eaten against this many
+# turns without food, so move_request() says when a snake last ate as
+# if it had this many, whatever MAX_HEALTH is
+REQUEST_STARVATION_TURNS = 100
+
+class SnakeBody(object):
+    """a snake's body positions, head first.  Pushing a new head and
+    popping the tail are O(1), and so is checking whether the body
+    covers a position.  Otherwise it acts like the list it used to be,
+    with the other list operations O(length)."""
+
+    # mutable, so not hashable, like a list
+    __hash__ = None
+
+    def __init__(self, positions=()):
+        self.cells = collections.deque()
+        self.counts = collections.defaultdict(int)
+        self.extend(positions)
+
+    def _count(self, pos, delta):
+        count = self.counts[pos] + delta
+        if count:
+            self.counts[pos] = count
+        else:
+            del self.counts[pos]
+
+    def _replace(self, positions):
+        """make me positions, after a change in the middle"""
+        self.cells = collections.deque(positions)
+        self.counts = collections.defaultdict(int)
+        for pos in self.cells:
+            self.counts[pos] += 1
+
+    def push(self, pos):
+        """add a new head"""
+        self.cells.appendleft(pos)
+        self.counts[pos] += 1
+
+    def append(self, pos):
+        """add a new tail"""
+        self.cells.append(pos)
+        self.counts[pos] += 1
+
+    def extend(self, positions):
+        for pos in positions:
+            self.append(pos)
+
+    def pop_tail(self):
+        pos = self.cells.pop()
+        self._count(pos, -1)
+        return pos
+
+    def pop(self, index=-1):
+        if index == -1 or index == len(self.cells) - 1:
+            return self.pop_tail()
+        if index == 0:
+            pos = self.cells.popleft()
+            self._count(pos, -1)
+            return pos
+        cells = list(self.cells)
+        pos = cells.pop(index)
+        self._replace(cells)
+        return pos
+
+    @property
+    def head(self):
+        return self.cells[0]
+
+    def __contains__(self, pos):
+        return pos in self.counts
+
+    def __len__(self):
+        return len(self.cells)
+
+    def __iter__(self):
+        return iter(self.cells)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return list(self.cells)[index]
+        return self.cells[index]
+
+    def __setitem__(self, index, pos):
+        if isinstance(index, slice):
+            cells = list(self.cells)
+            cells[index] = pos
+            self._replace(cells)
+        else:
+            old = self.cells[index]
+            self.cells[index] = pos
+            self._count(old, -1)
+            self.counts[pos] += 1
+
+    def __delitem__(self, index):
+        if isinstance(index, slice) and index.step is None and index.stop is None \
+           and index.start is not None and index.start >= 0:
+            # trimming the tail
+            while len(self.cells) > index.start:
+                self.pop_tail()
+        else:
+            cells = list(self.cells)
+            del cells[index]
+            self._replace(cells)
+
+    def insert(self, index, pos):
+        if index == 0:
+            self.push(pos)
+        elif index >= len(self.cells):
+            self.append(pos)
+        else:
+            cells = list(self.cells)
+            cells.insert(index, pos)
+            self._replace(cells)
+
+    def index(self, pos):
+        if pos not in self.counts:
+            raise ValueError("%r is not in body" % (pos,))
+        return list(self.cells).index(pos)
+
+    def count(self, pos):
+        return self.counts.get(pos, 0)
+
+    def __add__(self, other):
+        return list(self.cells) + list(other)
+
+    def __radd__(self, other):
+        return list(other) + list(self.cells)
+
+    def __eq__(self, other):
+        # equal to the lists I stand in for, and nothing else
+        if isinstance(other, SnakeBody):
+            return self.cells == other.cells
+        if isinstance(other, list):
+            return list(self.cells) == other
+        return NotImplemented
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        if equal is NotImplemented:
+            return equal
+        return not equal
+
+    def __repr__(self):
+        return repr(list(self.cells))
+
 class SnakePlayer(object):
     def __init__(self, snake, name, cell_type):
         self.snake = snake
@@ -15,6 +160,14 @@ class SnakePlayer(object):
         self.body = []
         self.length = 0
 
+    @property
+    def body(self):
+        return self._body
+
+    @body.setter
+    def body(self, positions):
+        self._body = SnakeBody(positions)
+
     def move(self, game, board):
         return self.snake.move(game, board)
 
@@ -50,9 +203,18 @@ class Game(object):
     CELL_TYPE_FOOD = '+'
     CELL_TYPE_WALL = '#'
 
-    def __init__(self, width, height):
+    def __init__(self, width, height, seed=None, bitboard_turns=False):
         self.width = width
         self.height = height
+        # my own random numbers, so a seed replays the same game
+        if seed is None:
+            seed = random.randrange(1 << 32)
+        self.seed = seed
+        self.random = random.Random(seed)
+        # a battlesnake.replay.ReplayLog to record turns in, and the
+        # food added since the last turn
+        self.replay_log = None
+        self.food_added = []
         self.turn_count = 0
         self.snakes = []
         self.killed = []
@@ -60,6 +222,13 @@ class Game(object):
         self.food_count = 4
         self.walls = []
         self.snake_by_cell = {}
+        # the live board turn() updates in place, and the snakes killed
+        # last turn that are still on it.  Set board to None after
+        # changing food, walls or snakes by hand to render it again.
+        self.board = None
+        self.board_killed = []
+        # play turns with BitState.turn(), see bitboard_turn()
+        self.bitboard_turns = bitboard_turns
 
     def add_snake(self, snake, name=None):
         assert len(self.snakes) < 26, "Too many snakes! Max 26"
@@ -99,6 +268,11 @@ class Game(object):
                    "Collision at %s. board too small for snakes and food?" % pos
             self.food.append(pos)
         self.food_count = 4
+        self.food_added = []
+        self.board = None
+        self.board_killed = []
+        if self.replay_log is not None:
+            self.replay_log.start(self)
 
     def render_list(self, board, pos_list, cell):
         for pos in pos_list:
@@ -108,6 +282,8 @@ class Game(object):
             board[pos] = cell
         
     def render(self):
+        """draw a new board from scratch.  turn() keeps its own board up
+        to date, so this is just for snapshots and debugging"""
         board = SnakeBoard(self.width, self.height, self.CELL_TYPE_EMPTY)
         self.render_list(board, self.food, self.CELL_TYPE_FOOD)
         self.render_list(board, self.walls, self.CELL_TYPE_WALL)
@@ -115,27 +291,53 @@ class Game(object):
             self.render_list(board, snake.body, snake.cell_type)
         return board
 
-    def add_stuff(self, board):
+    def add_stuff(self, board=None):
         # add more food and walls
+        if board is None:
+            board = self.live_board()
         while len(self.food) < self.food_count:
-            pos = randint(1, len(board))-1
+            pos = self.random.randint(1, len(board))-1
             if board[pos] == self.CELL_TYPE_EMPTY:
                 self.food.append(pos)
+                self.food_added.append(pos)
                 board[pos] = self.CELL_TYPE_FOOD
         
+    def live_board(self):
+        """the board turn() updates in place, without the snakes killed
+        last turn"""
+        if self.board is None:
+            self.board = self.render()
+            self.board_killed = []
+
+        board = self.board
+        for snake in self.board_killed:
+            for pos in snake.body:
+                if board[pos] == snake.cell_type:
+                    board[pos] = self.CELL_TYPE_EMPTY
+        self.board_killed = []
+        return board
+
     def turn(self):
+        """play one turn.  Returns the live board, which changes next
+        turn; use render() for a copy to keep"""
+        if self.bitboard_turns:
+            return self.bitboard_turn()
+
         self.turn_count += 1
 
-        board = self.render()
+        board = self.live_board()
 
         # move snakes
+        moves = {}
         for snake in self.snakes:
             # ask the snake for its next move name
             try: 
                 move_name = snake.move(self, board)
             except Exception as e:
                 snake.killed = "Failed to move: %s" % e.message
+                moves[snake.name] = None
                 continue
+            moves[snake.name] = move_name
 
             # get the new move's pos on the board
             try:
@@ -147,10 +349,10 @@ class Game(object):
                 snake.killed = "Moved out of bounds"
                 continue
 
-            snake.body.insert(0, pos)
-            for pos in snake.body[snake.length:]:
-                board[pos] = self.CELL_TYPE_EMPTY
-            del snake.body[snake.length:]
+            body = snake.body
+            body.push(pos)
+            while len(body) > snake.length:
+                board[body.pop_tail()] = self.CELL_TYPE_EMPTY
 
         # place the new heads and detect collisions
         for snake in self.snakes:
@@ -178,13 +380,111 @@ class Game(object):
                         # head to head, both are dead
                         other.killed = "Ran into %s!" % snake.name
         
-        for snake in self.snakes:
+        killed = []
+        for snake in list(self.snakes):
             if snake.killed:
                 self.killed.append(snake)
                 self.snakes.remove(snake)
+                # leave them on the board for now, see live_board()
+                self.board_killed.append(snake)
+                killed.append(snake)
+
+        if self.replay_log is not None:
+            self.replay_log.turn(self, moves, killed)
+        self.food_added = []
 
         return board
-                
+
+    def bitboard_turn(self):
+        """turn(), with the rules played by BitState.turn() and the
+        results copied back to my snakes, food and live board.  Every
+        snake picks its move before any of them moves"""
+        board = self.live_board()
+        state = self.bitboard()
+        self.turn_count += 1
+
+        moves = {}
+        move_names = []
+        for snake in self.snakes:
+            try:
+                move_name = snake.move(self, board)
+            except Exception as e:
+                snake.killed = "Failed to move: %s" % e.message
+                move_name = None
+            else:
+                if move_name not in SnakeBoard.MOVES:
+                    snake.killed = "Invalid move: %s" % move_name
+                    move_name = None
+            moves[snake.name] = move_name
+            # a snake that can't move stays put, and runs into itself
+            move_names.append(move_name)
+
+        state.turn(move_names)
+
+        # clear every tail that moved off before placing any heads
+        bitboard = state.board
+        heads = []
+        for bitsnake in state.snakes + state.killed:
+            snake = self.snake_by_cell[bitsnake.cell_type]
+            old = set(snake.body)
+            snake.body._replace([bitboard.pos(idx) for idx in bitsnake.body])
+            for pos in old.difference(snake.body):
+                if board[pos] == snake.cell_type:
+                    board[pos] = self.CELL_TYPE_EMPTY
+            heads.append((snake, set(snake.body).difference(old)))
+            snake.length = bitsnake.length
+            snake.health = bitsnake.health
+            snake.killed = bitsnake.killed
+        for snake, added in heads:
+            for pos in added:
+                # heads that ran into something don't cover it
+                if board[pos] in (self.CELL_TYPE_EMPTY, self.CELL_TYPE_FOOD):
+                    board[pos] = snake.cell_type
+        self.food = [pos for pos in self.food
+                     if state.food >> bitboard.bit_index(pos) & 1]
+
+        killed = [self.snake_by_cell[bitsnake.cell_type] for bitsnake in state.killed]
+        for snake in killed:
+            self.killed.append(snake)
+            self.snakes.remove(snake)
+            # leave them on the board for now, see live_board()
+            self.board_killed.append(snake)
+
+        if self.replay_log is not None:
+            self.replay_log.turn(self, moves, killed)
+        self.food_added = []
+
+        return board
+
+    def bitboard(self):
+        """a BitState snapshot of this game, for fast simulation"""
+        from battlesnake.bitboard import BitState
+        return BitState.from_game(self)
+
+    def move_request(self, game_id=None):
+        """the JSON a snake server would get in a /move request for
+        this turn"""
+        def coords(pos):
+            return list(divmod(pos, self.width)[::-1])
+
+        return {
+            'game': game_id,
+            'turn': self.turn_count,
+            'width': self.width,
+            'height': self.height,
+            'board': [[None] * self.width for _ in range(self.height)],
+            'food': [coords(pos) for pos in self.food],
+            'snakes': [{
+                'id': snake.cell_type,
+                'name': snake.name,
+                'health_points': snake.health,
+                # so REQUEST_STARVATION_TURNS - (turn - last_eaten)
+                # is the turns it has left, its health
+                'last_eaten': self.turn_count - (REQUEST_STARVATION_TURNS - snake.health),
+                'coords': [coords(pos) for pos in snake.body],
+                } for snake in self.snakes],
+            }
+
     def run(self):
         board = self.start()
         yield self.render()
@@ -0,0 +1,127 @@
+"""Per-phase timing of the move pipeline, as Prometheus histograms.
+
+Off unless SNAKE_METRICS is set, and then it costs a clock read per
+phase.  Off, the hot path only pays for a global lookup: code asks
+for the current timer and skips its marks when there isn't one.
+
+    timer = metrics.start()        # None if metrics are off
+    ...parse...
+    if timer:
+        timer.mark('parse')
+    ...smell...
+    if timer:
+        timer.mark('smell_food')
+    metrics.finish(timer)
+
+Code further down the call stack gets the same timer from current().
+finish() adds each phase's time to the snake_move_phase_seconds
+histogram, labelled by phase, and exposition() is the text for a
+/metrics page.
+"""
+import bisect
+import os
+import threading
+import time
+
+ENABLED = bool(os.environ.get('SNAKE_METRICS', ''))
+
+# seconds
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+           0.05, 0.1, 0.25, 0.5, 1.0)
+
+_local = threading.local()
+
+
+class Histogram(object):
+    """a Prometheus histogram with one label"""
+
+    def __init__(self, name, doc, label, buckets=BUCKETS):
+        self.name = name
+        self.doc = doc
+        self.label = label
+        self.buckets = tuple(buckets)
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observe(self, label_value, value):
+        with self.lock:
+            series = self.series.get(label_value)
+            if series is None:
+                # counts per bucket, then +Inf, then the sum
+                series = self.series[label_value] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[bisect.bisect_left(self.buckets, value)] += 1
+            series[-1] += value
+
+    def exposition(self):
+        lines = ["# HELP %s %s" % (self.name, self.doc),
+                 "# TYPE %s histogram" % self.name]
+        with self.lock:
+            series = sorted((key, list(value)) for key, value in self.series.items())
+        for label_value, counts in series:
+            label = '%s="%s"' % (self.label, label_value)
+            total = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                total += count
+                lines.append('%s_bucket{%s,le="%s"} %d' % (self.name, label, bound, total))
+            lines.append('%s_sum{%s} %r' % (self.name, label, counts[-1]))
+            lines.append('%s_count{%s} %d' % (self.name, label, total))
+        return "\n".join(lines) + "\n"
+
+
+PHASES = Histogram('snake_move_phase_seconds',
+                   "Time spent in each phase of choosing a move.", 'phase')
+
+
+class PhaseTimer(object):
+    """times consecutive phases of one request"""
+    __slots__ = ('clock', 'begin', 'last', 'phases')
+
+    def __init__(self, clock=time.time):
+        self.clock = clock
+        self.begin = self.last = clock()
+        self.phases = []
+
+    def mark(self, phase):
+        """end the phase called phase, which began at the last mark"""
+        now = self.clock()
+        self.phases.append((phase, now - self.last))
+        self.last = now
+
+    def total(self):
+        return self.last - self.begin
+
+    def server_timing(self):
+        """the phases as a Server-Timing header value, in milliseconds"""
+        return ", ".join("%s;dur=%.3f" % (phase, seconds * 1000)
+                         for phase, seconds in self.phases + [('total', self.total())])
+
+
+def start(clock=time.time):
+    """start timing a request in this thread, if metrics are on"""
+    if not ENABLED:
+        return None
+    timer = _local.timer = PhaseTimer(clock)
+    return timer
+
+
+def current():
+    """the timer of the request in this thread, or None"""
+    if not ENABLED:
+        return None
+    return getattr(_local, 'timer', None)
+
+
+def finish(timer, histogram=PHASES):
+    """stop timing and record the phases"""
+    if timer is None:
+        return
+    _local.timer = None
+    timer.mark('other')
+    for phase, seconds in timer.phases:
+        histogram.observe(phase, seconds)
+    histogram.observe('total', timer.total())
+
+
+def exposition():
+    """the text of a Prometheus /metrics page"""
+    return PHASES.exposition()
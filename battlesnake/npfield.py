@@ -0,0 +1,109 @@
+"""Distance fields over NumPy grids.
+
+The same fields as battlesnake.field, but each BFS level is computed
+for the whole board at once with boolean masks shifted one cell in
+each direction.  Grids are 2-d arrays indexed [y, x].  NumPy is
+optional: check AVAILABLE before using anything here.
+"""
+import time
+
+from battlesnake.field import DEADLINE_LEVELS, FieldTimeout, UNREACHED
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+AVAILABLE = numpy is not None
+
+
+def padded(grid, fill=0):
+    """copy a 2-d grid into a flat array with an extra column of fill
+    at the end of each row.  On a padded grid, moving left or right is
+    a shift by 1 and moving up or down a shift by the row stride, and
+    the padding column stops moves wrapping around between rows."""
+    height, width = grid.shape
+    out = numpy.full((height, width + 1), fill, dtype=grid.dtype)
+    out[:, :width] = grid
+    return out.ravel()
+
+
+def unpadded(flat, shape):
+    """the 2-d grid view of a padded flat array"""
+    height, width = shape
+    return flat.reshape(height, width + 1)[:, :width]
+
+
+def spread(src, out, stride, combine=numpy.logical_or if numpy else None):
+    """write src shifted one cell in each direction into out, combined
+    with combine.  src and out are padded grids with rows stride cells
+    apart.  Cells nothing moves into are zeroed."""
+    out[:stride] = 0
+    out[stride:] = src[:-stride]
+    view = out[:-stride]
+    combine(view, src[stride:], out=view)
+    view = out[1:]
+    combine(view, src[:-1], out=view)
+    view = out[:-1]
+    combine(view, src[1:], out=view)
+    return out
+
+
+def distance_grid(seeds, passable, deadline=None, clock=time.time):
+    """distance from every cell to the nearest seed, moving only
+    through passable cells.  seeds and passable are boolean grids.
+    Returns (dist, max_dist) where dist is an int32 grid with
+    UNREACHED for cells no seed can reach.  Raises FieldTimeout if
+    deadline passes, like field.distance_field()"""
+    stride = seeds.shape[1] + 1
+    frontier = padded(seeds)
+    unreached = padded(passable) & ~frontier
+    dist = numpy.full(frontier.shape, UNREACHED, dtype=numpy.int32)
+    dist[frontier] = 0
+    grown = numpy.empty_like(frontier)
+
+    level = 0
+    while True:
+        spread(frontier, grown, stride)
+        grown &= unreached
+        if not grown.any():
+            break
+        level += 1
+        if deadline is not None and level % DEADLINE_LEVELS == 0 and clock() >= deadline:
+            raise FieldTimeout()
+        unreached ^= grown
+        numpy.copyto(dist, level, where=grown)
+        frontier, grown = grown, frontier
+    return unpadded(dist, seeds.shape), level
+
+
+def label_grid(labels, passable, dist, deadline=None, clock=time.time):
+    """flood fill labels through passable cells.  labels is a uint8 grid
+    where seeds have a non-zero label, dist a distance grid where the
+    seeds and any cells to leave alone are already set.  Returns new
+    (labels, dist) grids where each cell reached gets the label of a
+    neighbour one step closer.  Where two labels arrive at once, the
+    highest wins.  Raises FieldTimeout if deadline passes"""
+    shape = labels.shape
+    stride = shape[1] + 1
+    labels = padded(labels)
+    dist = padded(dist, UNREACHED)
+    frontier = labels > 0
+    unreached = padded(passable) & (dist == UNREACHED)
+    level = int(dist[frontier].max()) if frontier.any() else 0
+    front = numpy.zeros_like(labels)
+    arrived = numpy.zeros_like(labels)
+    while True:
+        numpy.multiply(labels, frontier, out=front)
+        spread(front, arrived, stride, numpy.maximum)
+        numpy.greater(arrived, 0, out=frontier)
+        frontier &= unreached
+        if not frontier.any():
+            break
+        level += 1
+        if deadline is not None and level % DEADLINE_LEVELS == 0 and clock() >= deadline:
+            raise FieldTimeout()
+        unreached ^= frontier
+        numpy.copyto(labels, arrived, where=frontier)
+        numpy.copyto(dist, level, where=frontier)
+    return unpadded(labels, shape), unpadded(dist, shape)
@@ -0,0 +1,44 @@
+"""Pools of reusable buffers.
+
+Boards and distance fields are the same few sizes request after
+request, so rather than allocate new ones every time, a BufferPool
+keeps free lists of them by key (their dimensions, say) and resets
+a buffer in bulk when it is reused.
+
+Pools are per process, so each worker has its own.  Acquiring and
+releasing are single list operations, safe under threads and gevent.
+"""
+
+POOL_MAX_FREE = 8
+
+
+class BufferPool(object):
+    """free lists of buffers by key.  make(key) makes a new buffer, and
+    reset(buf, key) clears a free one for reuse."""
+
+    def __init__(self, make, reset, max_free=POOL_MAX_FREE):
+        self.make = make
+        self.reset = reset
+        self.max_free = max_free
+        self.free = {}
+        self.hits = 0
+        self.misses = 0
+
+    def acquire(self, key):
+        try:
+            buf = self.free[key].pop()
+        except (KeyError, IndexError):
+            self.misses += 1
+            return self.make(key)
+        self.hits += 1
+        self.reset(buf, key)
+        return buf
+
+    def release(self, key, buf):
+        """give buf back.  Don't use it after this."""
+        free = self.free.setdefault(key, [])
+        if len(free) < self.max_free:
+            free.append(buf)
+
+    def clear(self):
+        self.free = {}
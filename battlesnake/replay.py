@@ -0,0 +1,113 @@
+"""Replay logs for battlesnake.game.Game.
+
+A replay log is a file of JSON lines, appended to as the game goes.
+The first line is the game: its seed, size and snakes.  Then there's
+a line per turn with the food added since the turn before, every
+snake's move, and the snakes killed.
+
+    {"seed": 7, "width": 12, "height": 12, "snakes": ["a", "b"]}
+    {"turn": 1, "food": [], "moves": {"a": "up", "b": "left"}, "killed": []}
+    {"turn": 2, "food": [40], "moves": {"a": "up", "b": null},
+     "killed": [["b", "Failed to move: oops"]]}
+
+replay() plays a log back with the recorded moves instead of the snake
+policies, so it runs at full speed, and checks every turn kills the
+same snakes it did the first time.
+
+    game = Game(12, 12, seed)
+    game.replay_log = ReplayLog(open(path, 'a'))
+    ...play it...
+
+    for board in replay(open(path)):
+        pass
+"""
+import json
+
+from battlesnake.game import Game
+
+FAILED_TO_MOVE = "Failed to move: "
+
+
+class ReplayError(Exception):
+    pass
+
+
+class ReplayLog(object):
+    """records a Game's turns to out, a file opened for appending"""
+
+    def __init__(self, out):
+        self.out = out
+
+    def write(self, record):
+        self.out.write(json.dumps(record, sort_keys=True, separators=(',', ':')))
+        self.out.write("\n")
+        self.out.flush()
+
+    def start(self, game):
+        self.write({
+            'seed': game.seed,
+            'width': game.width,
+            'height': game.height,
+            'snakes': [snake.name for snake in game.snakes],
+            })
+
+    def turn(self, game, moves, killed):
+        self.write({
+            'turn': game.turn_count,
+            'food': game.food_added,
+            'moves': moves,
+            'killed': [[snake.name, snake.killed] for snake in killed],
+            })
+
+
+def read(lines):
+    """the (game, turns) records of a replay log"""
+    records = (json.loads(line) for line in lines if line.strip())
+    header = next(records)
+    return header, list(records)
+
+
+class ReplaySnake(object):
+    """plays one snake's moves from a replay log"""
+
+    def __init__(self, name):
+        self.name = name
+        self.turn = None
+
+    def move(self, game, board):
+        move_name = self.turn['moves'].get(self.name)
+        if move_name is None:
+            # fail the same way it did the first time
+            reason = dict(self.turn['killed']).get(self.name, "")
+            if reason.startswith(FAILED_TO_MOVE):
+                reason = reason[len(FAILED_TO_MOVE):]
+            raise ReplayError(reason)
+        return move_name
+
+
+def replay(lines, game_class=Game):
+    """play back a replay log.  Yields the board at the start and after
+    every turn, like Game.run()"""
+    header, turns = read(lines)
+    game = game_class(header['width'], header['height'], header['seed'])
+    snakes = [ReplaySnake(name) for name in header['snakes']]
+    for snake in snakes:
+        game.add_snake(snake, snake.name)
+    game.start()
+    yield game.render()
+
+    for turn in turns:
+        for snake in snakes:
+            snake.turn = turn
+        if turn['food']:
+            board = game.live_board()
+            for pos in turn['food']:
+                game.food.append(pos)
+                board[pos] = game.CELL_TYPE_FOOD
+        killed_before = len(game.killed)
+        board = game.turn()
+        killed = [[player.name, player.killed] for player in game.killed[killed_before:]]
+        if turn['turn'] != game.turn_count or killed != turn['killed']:
+            raise ReplayError("turn %s killed %s, but the log says turn %s killed %s"
+                              % (game.turn_count, killed, turn['turn'], turn['killed']))
+        yield board
@@ -0,0 +1,76 @@
+"""A sampled ring buffer of records, logged only when asked.
+
+Dumping every board on every move costs more than choosing the move,
+but the boards of a game I just lost are worth having.  A RingLog
+keeps a sample of raw records, the last capacity of them, without
+formatting anything, and flush() formats and logs a game's records
+from a background thread:
+
+    BOARDS = RingLog(logging.getLogger('boards'), format_record)
+    BOARDS.record(game_id, (data, move))     # on every move
+    BOARDS.flush(game_id)                     # when I lose
+
+format_record turns a record into a dict, which is logged as one JSON
+line at INFO.
+"""
+import collections
+import json
+import logging
+import random
+import threading
+
+LOG = logging.getLogger(__name__)
+
+RING_LOG_SIZE = 256
+
+
+class RingLog(object):
+
+    def __init__(self, logger, format_record, capacity=RING_LOG_SIZE, rate=1.0, rnd=None):
+        self.logger = logger
+        self.format_record = format_record
+        self.rate = rate
+        self.random = rnd or random.Random()
+        self.ring = collections.deque(maxlen=capacity)
+        self.lock = threading.Lock()
+
+    def record(self, key, record):
+        """keep record, maybe, filed under key.  record must not change
+        afterwards, it's only formatted when flushed."""
+        if self.rate < 1.0 and self.random.random() >= self.rate:
+            return
+        with self.lock:
+            self.ring.append((key, record))
+
+    def take(self, key=None):
+        """remove and return the records under key, or all of them"""
+        with self.lock:
+            if key is None:
+                taken = [record for _key, record in self.ring]
+                self.ring.clear()
+            else:
+                taken = [record for record_key, record in self.ring if record_key == key]
+                kept = [entry for entry in self.ring if entry[0] != key]
+                self.ring.clear()
+                self.ring.extend(kept)
+        return taken
+
+    def flush(self, key=None, wait=False):
+        """log the records under key, or all of them, from a background
+        thread.  Returns the thread, or None if there was nothing"""
+        records = self.take(key)
+        if not records:
+            return None
+        thread = threading.Thread(target=self.write, args=(records,), name="ringlog")
+        thread.daemon = True
+        thread.start()
+        if wait:
+            thread.join()
+        return thread
+
+    def write(self, records):
+        for record in records:
+            try:
+                self.logger.info("%s", json.dumps(self.format_record(record), sort_keys=True))
+            except Exception:
+                LOG.exception("can't log record")
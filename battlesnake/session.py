@@ -0,0 +1,127 @@
+"""What a snake server remembers about each game between requests.
+
+Turn after turn of a game only differs by a few cells, so there's work
+worth keeping from one /move to the next: the last turn's board and
+its distance fields, and search transposition tables.  A Session holds
+them for one snake in one game, made by /start, or by the first /move
+if the server missed /start, and dropped by /end:
+
+    session = SESSIONS.session(game_id, snake_name)
+    ...
+    SESSIONS.end(game_id, snake_name)
+
+Games that never end are forgotten too.  A SessionCache keeps at most
+max_games sessions, dropping the least recently used, and drops any
+that haven't been used for ttl seconds.  A dropped session is close()d,
+which gives its board back to its pool, so memory stays bounded however
+many games one worker is playing.
+"""
+import collections
+import os
+import threading
+import time
+
+SESSION_GAMES = int(os.environ.get('SNAKE_SESSION_GAMES', '8'))
+SESSION_TTL = float(os.environ.get('SNAKE_SESSION_TTL', '300'))
+
+
+def game_id(data):
+    """the game a request is for: /start says game_id, the rest game"""
+    return data.get('game', data.get('game_id'))
+
+
+class Session(object):
+    """one snake's state in one game"""
+
+    def __init__(self, key, now):
+        self.key = key
+        self.touched = now
+        # the last /move I answered, and my answer
+        self.turn = None
+        self.move = None
+        # the last turn's board, see take_board()
+        self.board = None
+        self.data = None
+        # search's transposition table
+        self.table = None
+        self.lock = threading.Lock()
+
+    def take_board(self):
+        """(board, data) of the last turn, which are mine until I keep()
+        a new one.  (None, None) if there isn't one, or another request
+        has it"""
+        with self.lock:
+            board, data = self.board, self.data
+            self.board = self.data = None
+        return board, data
+
+    def keep(self, board, data):
+        """remember this turn's board and request for the next turn.
+        data must not change afterwards"""
+        with self.lock:
+            old, self.board, self.data = self.board, board, data
+        if old is not None:
+            old.release()
+
+    def close(self):
+        board, _data = self.take_board()
+        if board is not None:
+            board.release()
+        self.table = None
+
+
+class SessionCache(object):
+    """Sessions by (game id, snake name), LRU and TTL evicted"""
+
+    def __init__(self, max_games=SESSION_GAMES, ttl=SESSION_TTL, clock=time.time):
+        self.max_games = max_games
+        self.ttl = ttl
+        self.clock = clock
+        self.sessions = collections.OrderedDict()
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.sessions)
+
+    def __contains__(self, key):
+        return key in self.sessions
+
+    def session(self, game_id, snake_name):
+        """the session of snake_name in game_id, made if it's new"""
+        key = (game_id, snake_name)
+        now = self.clock()
+        dropped = []
+        with self.lock:
+            session = self.sessions.pop(key, None)
+            if session is None:
+                session = Session(key, now)
+            session.touched = now
+            self.sessions[key] = session
+            # least recently used first
+            while len(self.sessions) > self.max_games:
+                dropped.append(self.sessions.popitem(last=False)[1])
+            while self.sessions:
+                oldest = next(iter(self.sessions.values()))
+                if now - oldest.touched <= self.ttl:
+                    break
+                dropped.append(self.sessions.popitem(last=False)[1])
+        for old in dropped:
+            old.close()
+        return session
+
+    def end(self, game_id, snake_name):
+        """forget snake_name's session in game_id"""
+        with self.lock:
+            session = self.sessions.pop((game_id, snake_name), None)
+        if session is not None:
+            session.close()
+
+    def clear(self):
+        with self.lock:
+            sessions = list(self.sessions.values())
+            self.sessions.clear()
+        for session in sessions:
+            session.close()
+
+
+SESSIONS = SessionCache()
@@ -0,0 +1,159 @@
+"""Territory: which snake gets to each cell first.
+
+One breadth-first search out from every snake's head at once labels
+each cell with the snake that can get there first, its owner, and
+when, its arrival time.  A cell two snakes reach at the same time
+goes to the longer one when longer_wins is set, the way a head-to-head
+collision goes to the longer snake, or to nobody (CONTESTED) when
+they're the same length, or when longer_wins isn't set and both would
+die, as in battlesnake.game.  Contested cells aren't searched past.
+
+Boards are flat, with the same adjacency tables and passable masks as
+battlesnake.field.  A Territory owns its buffers and reuses them every
+run(), so it can be called at every leaf of a search without making
+garbage, but one Territory must only be used by one thread at a time:
+get them from TERRITORY_POOL.  BitBoard.territory() is the same on
+bitboards, for search, where it's faster still.
+
+    territory = TERRITORY_POOL.acquire(adjacency)
+    try:
+        counts = territory.run([my_head, enemy_head], passable, [3, 5])
+        mine = counts[1]
+    finally:
+        TERRITORY_POOL.release(adjacency, territory)
+"""
+from array import array
+
+from battlesnake.field import UNREACHED, new_field
+from battlesnake.pool import BufferPool
+
+NOBODY = 0
+CONTESTED = 255
+# owners are numbered from 1, so this many snakes at most
+MAX_OWNERS = CONTESTED - 1
+
+
+class Territory(object):
+    """reusable buffers for territory on boards with one adjacency table"""
+
+    def __init__(self, adjacency, longer_wins=True):
+        size = len(adjacency)
+        self.adjacency = adjacency
+        self.longer_wins = longer_wins
+        # the owner of every cell, its arrival time, and the length of
+        # the snake with the strongest claim on it
+        self.owner = bytearray(size)
+        self.dist = new_field(size)
+        self.strength = array('i', [0]) * size
+        # cells in the order they're reached
+        self.queue = array('i', [0]) * size
+        self.reached = 0
+        # cells owned, by owner
+        self.counts = array('i', [0]) * (CONTESTED + 1)
+        self._blank_owner = bytearray(size)
+        self._blank_dist = new_field(size)
+        self._blank_counts = array('i', [0]) * (CONTESTED + 1)
+
+    def run(self, heads, passable, lengths=None):
+        """claim cells for the snakes with heads, the first of which is
+        owner 1.  passable[i] is true for cells snakes can move into,
+        and lengths are the snakes' lengths.  Returns counts, where
+        counts[owner] is the number of cells owner has, including its
+        head, and counts[CONTESTED] the number snakes tie for"""
+        if len(heads) > MAX_OWNERS:
+            raise ValueError("too many snakes: %d" % len(heads))
+        adjacency = self.adjacency
+        owner = self.owner
+        dist = self.dist
+        strength = self.strength
+        queue = self.queue
+        owner[:] = self._blank_owner
+        dist[:] = self._blank_dist
+        longer_wins = self.longer_wins
+
+        # while loops over indexes, since range() makes a list on
+        # python 2
+        tail = 0
+        who = 0
+        while who < len(heads):
+            head = heads[who]
+            claim = lengths[who] if longer_wins and lengths else 1
+            who += 1
+            if dist[head] == UNREACHED:
+                dist[head] = 0
+                owner[head] = who
+                strength[head] = claim
+                queue[tail] = head
+                tail += 1
+            elif claim > strength[head]:
+                owner[head] = who
+                strength[head] = claim
+            elif claim == strength[head]:
+                owner[head] = CONTESTED
+
+        front = 0
+        level = 0
+        while front < tail:
+            level += 1
+            level_end = tail
+            i = front
+            while i < level_end:
+                idx = queue[i]
+                i += 1
+                who = owner[idx]
+                if who == CONTESTED:
+                    continue
+                claim = strength[idx]
+                for adj in adjacency[idx]:
+                    arrival = dist[adj]
+                    if arrival == UNREACHED:
+                        if passable[adj]:
+                            dist[adj] = level
+                            owner[adj] = who
+                            strength[adj] = claim
+                            queue[tail] = adj
+                            tail += 1
+                    elif arrival == level and owner[adj] != who:
+                        if claim > strength[adj]:
+                            owner[adj] = who
+                            strength[adj] = claim
+                        elif claim == strength[adj]:
+                            owner[adj] = CONTESTED
+            front = level_end
+        self.reached = tail
+
+        counts = self.counts
+        counts[:] = self._blank_counts
+        i = 0
+        while i < tail:
+            counts[owner[queue[i]]] += 1
+            i += 1
+        return counts
+
+
+class TerritoryPool(BufferPool):
+    """Territories by adjacency table.  Tables are big, shared and
+    immutable, so they're told apart by identity rather than hashed.
+    A pooled Territory keeps its table alive, so its id isn't reused"""
+
+    def __init__(self):
+        super(TerritoryPool, self).__init__(None, None)
+
+    def acquire(self, adjacency, longer_wins=True):
+        key = (id(adjacency), longer_wins)
+        try:
+            territory = self.free[key].pop()
+        except (KeyError, IndexError):
+            self.misses += 1
+            return Territory(adjacency, longer_wins)
+        self.hits += 1
+        return territory
+
+    def release(self, adjacency, territory):
+        key = (id(adjacency), territory.longer_wins)
+        free = self.free.setdefault(key, [])
+        if len(free) < self.max_free:
+            free.append(territory)
+
+
+TERRITORY_POOL = TerritoryPool()
@@ -0,0 +1,229 @@
+"""Headless tournaments between snake policies.
+
+Plays lots of games of battlesnake.game.Game between policies, spread
+over a multiprocessing pool, and streams each game's result back as
+it finishes.  A policy is named by a spec:
+
+  snake, snake2, search, mcts    the app module's battlesnake_move()
+  package.module                 any module with a battlesnake_move()
+  package.module:Class           a Game snake class, made with no args
+
+so "python -m battlesnake.tournament -n 1000 snake snake2" plays the
+current snake against the old one a thousand times.  Seats are
+rotated from game to game, and every game has its own random seed, so
+a tournament is repeatable whatever the number of processes.  With
+--replays, every game's battlesnake.replay log is kept so an
+interesting game can be played back without the policies.
+"""
+from __future__ import print_function
+
+import argparse
+import collections
+import importlib
+import logging
+import math
+import multiprocessing
+import os
+import random
+import sys
+
+from battlesnake.game import Game
+from battlesnake.replay import ReplayLog
+
+TOURNAMENT_SIZE = 20
+TOURNAMENT_MAX_TURNS = 1000
+
+# short names for the app's snakes
+POLICY_MODULES = {
+    'snake': 'app.snake',
+    'snake2': 'app.snake2',
+    'search': 'app.search',
+    'mcts': 'app.mcts',
+}
+
+# one game's result.  placings is a list of (seat, policy, turns
+# survived, killed reason) in the order they died, then any still
+# alive at max_turns with reason None, and winner is the
+# seat of the one snake that outlived the others, or None for a draw
+GameResult = collections.namedtuple(
+    'GameResult', ['game_no', 'seed', 'policies', 'turns', 'winner', 'placings'])
+
+
+class RequestSnake(object):
+    """a Game snake that plays by a server's battlesnake_move(data,
+    snake_name), getting the JSON of a /move request"""
+
+    def __init__(self, battlesnake_move, game_id=None):
+        self.battlesnake_move = battlesnake_move
+        self.game_id = game_id
+
+    def move(self, game, board):
+        player = [p for p in game.snakes if p.snake is self][0]
+        return self.battlesnake_move(game.move_request(self.game_id), player.name)
+
+
+def load_policy(spec):
+    """make a Game snake from a policy spec"""
+    module_name, _, class_name = spec.partition(':')
+    module = importlib.import_module(POLICY_MODULES.get(module_name, module_name))
+    if class_name:
+        return getattr(module, class_name)()
+    return RequestSnake(module.battlesnake_move)
+
+
+def replay_path(replay_dir, game_no):
+    return os.path.join(replay_dir, "game-%06d.jsonl" % game_no)
+
+
+def play(game_no, seed, policies, size=TOURNAMENT_SIZE, max_turns=TOURNAMENT_MAX_TURNS,
+         replay_dir=None):
+    """play one game between policies, one per seat, logging it in
+    replay_dir if given.  Returns a GameResult"""
+    # for the policies that use the global random
+    random.seed(seed)
+    game = Game(size, size, seed)
+    for spec in policies:
+        player = game.add_snake(load_policy(spec))
+        if isinstance(player.snake, RequestSnake):
+            player.snake.game_id = game_no
+
+    replay_file = None
+    if replay_dir is not None:
+        replay_file = open(replay_path(replay_dir, game_no), 'w')
+        game.replay_log = ReplayLog(replay_file)
+
+    seat_by_cell = dict((player.cell_type, seat) for seat, player in enumerate(game.snakes))
+    placings = []
+    try:
+        for _board in game.run():
+            for player in game.killed[len(placings):]:
+                seat = seat_by_cell[player.cell_type]
+                placings.append((seat, policies[seat], game.turn_count, player.killed))
+            if game.turn_count >= max_turns:
+                break
+            # the last snake standing has won, no need to watch it starve
+            if len(game.snakes) <= 1 and len(policies) > 1:
+                break
+            game.add_stuff()
+    finally:
+        if replay_file is not None:
+            replay_file.close()
+    for player in game.snakes:
+        seat = seat_by_cell[player.cell_type]
+        placings.append((seat, policies[seat], game.turn_count, None))
+
+    winner = None
+    if not game.snakes and len(placings) > 1 and placings[-2][2] < placings[-1][2]:
+        winner = placings[-1][0]
+    elif len(game.snakes) == 1 and len(policies) > 1:
+        winner = seat_by_cell[game.snakes[0].cell_type]
+    return GameResult(game_no, seed, list(policies), game.turn_count, winner, placings)
+
+
+def _play(args):
+    return play(*args)
+
+
+def _init_worker(seed):
+    # policies that use the global random get a different stream in
+    # each worker; play() reseeds it for each game anyway
+    random.seed(seed + multiprocessing.current_process().pid)
+
+
+def games(policies, count, seed=0, size=TOURNAMENT_SIZE, max_turns=TOURNAMENT_MAX_TURNS,
+          replay_dir=None):
+    """the arguments to play() for count games, rotating the seats"""
+    policies = list(policies)
+    for game_no in range(count):
+        shift = game_no % len(policies)
+        seats = policies[shift:] + policies[:shift]
+        yield (game_no, seed + game_no, seats, size, max_turns, replay_dir)
+
+
+def tournament(policies, count, seed=0, processes=None, **kwargs):
+    """yield a GameResult for each of count games between policies, as
+    they finish.  processes=1 plays them all in this process."""
+    tasks = games(policies, count, seed, **kwargs)
+    if processes == 1:
+        for task in tasks:
+            yield _play(task)
+        return
+
+    pool = multiprocessing.Pool(processes, _init_worker, (seed,))
+    try:
+        for result in pool.imap_unordered(_play, tasks):
+            yield result
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+class Standings(object):
+    """games, wins and turns survived by each policy"""
+
+    def __init__(self):
+        self.games = 0
+        self.played = collections.Counter()
+        self.wins = collections.Counter()
+        self.turns = collections.Counter()
+
+    def add(self, result):
+        self.games += 1
+        for _seat, policy, turns, _killed in result.placings:
+            self.turns[policy] += turns
+        for policy in result.policies:
+            self.played[policy] += 1
+        if result.winner is not None:
+            self.wins[result.policies[result.winner]] += 1
+
+    def win_rate(self, policy, z=1.96):
+        """a policy's win rate and the Wilson score interval around it"""
+        n = self.played[policy]
+        if not n:
+            return 0.0, 0.0, 1.0
+        p = float(self.wins[policy]) / n
+        centre = p + z * z / (2 * n)
+        spread = z * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n))
+        scale = 1 + z * z / n
+        return p, max(0.0, (centre - spread) / scale), min(1.0, (centre + spread) / scale)
+
+    def dump(self):
+        lines = ["%d games" % self.games]
+        width = max([len(policy) for policy in self.played] + [0])
+        for policy in sorted(self.played, key=lambda p: -self.wins[p]):
+            rate, low, high = self.win_rate(policy)
+            lines.append("%-*s wins=%-6d rate=%.3f (%.3f-%.3f) mean_turns=%.1f" % (
+                width, policy, self.wins[policy], rate, low, high,
+                float(self.turns[policy]) / self.played[policy]))
+        return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="play headless games between snake policies")
+    parser.add_argument('policies', nargs='+', help="policy specs, one per seat")
+    parser.add_argument('-n', '--games', type=int, default=100)
+    parser.add_argument('-s', '--size', type=int, default=TOURNAMENT_SIZE)
+    parser.add_argument('-t', '--max-turns', type=int, default=TOURNAMENT_MAX_TURNS)
+    parser.add_argument('-j', '--processes', type=int, default=None,
+                        help="worker processes, default one per CPU")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('-r', '--replays', metavar='DIR', help="keep a replay log of every game in DIR")
+    parser.add_argument('-v', '--verbose', action='store_true', help="print every game")
+    args = parser.parse_args(argv)
+    # before the policies are imported, so their own logging setup
+    # doesn't drown the results in debug logs
+    logging.basicConfig(level=logging.WARNING)
+
+    standings = Standings()
+    for result in tournament(args.policies, args.games, args.seed, args.processes,
+                             size=args.size, max_turns=args.max_turns,
+                             replay_dir=args.replays):
+        standings.add(result)
+        if args.verbose:
+            print(result)
+    print(standings.dump())
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,106 @@
+"""Zobrist hashing and a transposition table for game states.
+
+A state's key is the XOR of a random 64-bit number for each feature
+of the state: every food cell, every cell of every snake's body, each
+snake's head, length and health.  Keys are updated as the state
+changes by XORing features out and in, see BitState.turn().
+
+Keys are only comparable between states hashed with the same Zobrist
+object.  Snakes are told apart by a slot, which must stay the same
+for a snake from one state to the next.
+"""
+import random
+
+KIND_FOOD = 0
+KIND_WALL = 1
+KIND_BODY = 2
+KIND_HEAD = 3
+KIND_LENGTH = 4
+KIND_HEALTH = 5
+
+# TranspositionTable entry flags: value is exact, or a bound from an
+# alpha-beta cutoff
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+
+class Zobrist(object):
+    """random keys for state features, made as they're first needed"""
+
+    def __init__(self, seed=None):
+        self.random = random.Random(seed)
+        self.keys = {}
+
+    def key(self, kind, slot, value):
+        feature = (kind, slot, value)
+        try:
+            return self.keys[feature]
+        except KeyError:
+            key = self.keys[feature] = self.random.getrandbits(64)
+            return key
+
+    def snake_key(self, snake):
+        """the key of all of one snake's features"""
+        slot = snake.cell_type
+        key = self.key(KIND_LENGTH, slot, snake.length) ^ self.key(KIND_HEALTH, slot, snake.health)
+        if snake.body:
+            key ^= self.key(KIND_HEAD, slot, snake.body[0])
+        for idx in snake.body:
+            key ^= self.key(KIND_BODY, slot, idx)
+        return key
+
+    def state_key(self, state):
+        """the key of a whole BitState, from scratch"""
+        from battlesnake.bitboard import bits
+        key = 0
+        for idx in bits(state.food):
+            key ^= self.key(KIND_FOOD, None, idx)
+        for idx in bits(state.walls):
+            key ^= self.key(KIND_WALL, None, idx)
+        for snake in state.snakes:
+            key ^= self.snake_key(snake)
+        return key
+
+
+class TranspositionTable(object):
+    """a fixed-size table of search results by state key.
+
+    Each of the size buckets holds two entries: one that is only
+    replaced by a search at least as deep, and one that is always
+    replaced.  So the table never grows, deep results survive, and
+    recent results still get stored."""
+
+    def __init__(self, size=1 << 16):
+        self.size = size
+        # two slots per bucket: [2*i] depth-preferred, [2*i+1] always-replace
+        self.keys = [None] * (2 * size)
+        self.entries = [None] * (2 * size)
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, key):
+        """return (depth, value, flag, best_move) stored for key, or None"""
+        slot = 2 * (key % self.size)
+        if self.keys[slot] == key:
+            self.hits += 1
+            return self.entries[slot]
+        if self.keys[slot + 1] == key:
+            self.hits += 1
+            return self.entries[slot + 1]
+        self.misses += 1
+        return None
+
+    def store(self, key, depth, value, flag, best_move=None):
+        slot = 2 * (key % self.size)
+        entry = self.entries[slot]
+        if entry is None or self.keys[slot] == key or depth >= entry[0]:
+            self.keys[slot] = key
+            self.entries[slot] = (depth, value, flag, best_move)
+        else:
+            self.keys[slot + 1] = key
+            self.entries[slot + 1] = (depth, value, flag, best_move)
+
+    def clear(self):
+        self.keys = [None] * (2 * self.size)
+        self.entries = [None] * (2 * self.size)
@@ -0,0 +1,97 @@
+#! /usr/bin/env python
+import itertools
+import random
+
+import pytest
+
+from app import snake
+from battlesnake import field
+from tests.test_field import random_board_strs
+from tests.test_search import TRAP
+
+
+def test_moves():
+    rnd = random.Random(3)
+    for _ in range(30):
+        board = snake.Board.load_strs(*random_board_strs(rnd, rnd.randint(4, 12), rnd.randint(4, 12)))
+        moves = list(board.moves())
+        # a safe move, then one for each stage of smells
+        assert len(moves) == 4
+        safe = [move.value for move in board.safe_moves(board.head())]
+        assert moves[0] == (safe[0] if safe else snake.MOVES[0].name)
+        assert all(move in safe for move in moves if safe)
+        assert moves[-1] == board.move()
+
+
+def ticks():
+    count = itertools.count()
+    return lambda: next(count)
+
+
+def test_deadline():
+    board = snake.Board.load_strs(
+        "     ",
+        " aA  ",
+        "#### ",
+        "*    ",
+        )
+    assert board.move() == 'right'
+
+    # a clock that ticks every time it's read: the deadline cuts the
+    # stages short
+    assert board.move(deadline=0, clock=ticks()) == 'up'
+    assert board.move(deadline=100, clock=ticks()) == 'right'
+
+
+def test_deadline_in_stage(monkeypatch):
+    # a long corridor, so the space flood has plenty of levels
+    board = snake.Board.load_strs(
+        " " * 40,
+        " aA" + " " * 37,
+        "#" * 39 + " ",
+        "*" + " " * 39,
+        )
+    moves = list(board.moves())
+
+    # time runs out once the space flood has started, so it's abandoned
+    # partway and I go with the move from the stage before
+    late = []
+    space_field = snake.Board.space_field
+    def starting_space_field(self, *args, **kwargs):
+        late.append(True)
+        try:
+            return space_field(self, *args, **kwargs)
+        except field.FieldTimeout:
+            late.append('abandoned')
+            raise
+    monkeypatch.setattr(snake.Board, 'space_field', starting_space_field)
+    clock = lambda: 1 if late else 0
+    assert board.move(deadline=1, clock=clock) == moves[2]
+    assert late == [True, 'abandoned']
+    del late[:]
+    assert list(board.moves(deadline=1, clock=clock)) == moves[:3]
+    board.release()
+
+
+def test_battlesnake_move_deadline(monkeypatch):
+    # no time at all, just a safe move
+    assert snake.battlesnake_move(dict(TRAP, timeout=0), 'me') == 'up'
+    assert snake.battlesnake_move(dict(TRAP, timeout=1000), 'me') == 'up'
+
+    # search ahead with the time left over
+    monkeypatch.setattr(snake, 'MOVE_SEARCH', True)
+    assert snake.battlesnake_move(dict(TRAP, timeout=1000), 'me') == 'right'
+    assert snake.battlesnake_move(dict(TRAP, timeout=0), 'me') == 'up'
+
+
+def test_field_deadline():
+    adjacency = snake.Board(40, 1).adjacency()
+    passable = bytearray([1]) * 40
+    with pytest.raises(field.FieldTimeout):
+        field.distance_field(adjacency, [0], passable, deadline=1, clock=ticks())
+    # the clock's only read every few levels
+    reads = []
+    clock = lambda: reads.append(1) or 0
+    _dist, max_dist = field.distance_field(adjacency, [0], passable, deadline=100, clock=clock)
+    assert max_dist == 39
+    assert len(reads) == 40 // field.DEADLINE_LEVELS
@@ -0,0 +1,34 @@
+#! /usr/bin/env python
+from battlesnake import bench
+
+
+def test_percentile():
+    values = list(range(1, 101))
+    assert bench.percentile(values, 0.5) == 50
+    assert bench.percentile(values, 0.99) == 99
+    assert bench.timings([3, 1, 2]) == bench.Timings(3, 2, 3, 3, 3)
+
+
+def test_bench(tmpdir):
+    # made in a directory of its own, like bench/moves.jsonl.gz
+    path = str(tmpdir.join('bench', 'moves.jsonl.gz'))
+    bench.make_corpus(path, 2, sizes=(11,), snakes=(2,), max_turns=5)
+    corpus = list(bench.read_corpus(path))
+    assert len(corpus) == 2 * 2 * 5
+    assert corpus[0][0] == 'a'
+
+    results = bench.run(corpus, ['snake', 'snake2', 'wsgi', 'json', 'bottle-json'])
+    assert sorted(results) == ['bottle-json', 'json', 'snake', 'snake2', 'wsgi']
+    assert results['json']['all'].count == len(corpus)
+    assert results['wsgi']['all'].count == len(corpus)
+    assert results['snake']['11x11/2'].count == len(corpus)
+    assert bench.regressions(results, results) == []
+
+
+def test_regressions():
+    results = {'snake': {'all': bench.Timings(10, 0.001, 0.002, 0.003, 0.010)}}
+    baseline = {'snake': {'all': [10, 0.001, 0.001, 0.001, 0.001]}}
+    assert bench.regressions(results, {}) == []
+    assert len(bench.regressions(results, baseline)) == 1
+    assert bench.regressions(results, baseline, tolerance=3) == []
+    assert len(bench.regressions(results, {}, max_ms=5)) == 1
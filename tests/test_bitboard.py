@@ -0,0 +1,130 @@
+#! /usr/bin/env python
+import random
+
+from app import snake as app_snake
+from battlesnake.bitboard import BitBoard, popcount
+from battlesnake.game import Game, SnakeBoard
+
+
+class RandomSnake(object):
+    """moves at random, mostly staying on the board"""
+    def __init__(self, rnd):
+        self.rnd = rnd
+        self.last_move = None
+
+    def move(self, game, board):
+        player = [p for p in game.snakes if p.snake is self][0]
+        x, y = board.coords(player.body[0])
+        moves = [name for name, (dx, dy) in SnakeBoard.MOVES.items()
+                 if 0 <= x+dx < board.width and 0 <= y+dy < board.height]
+        if self.rnd.random() < 0.05:
+            moves = list(SnakeBoard.MOVES)
+        self.last_move = self.rnd.choice(sorted(moves))
+        return self.last_move
+
+
+class BitboardSnake(object):
+    """app.snake.bitboard_move as a Game snake"""
+    def move(self, game, board):
+        state = game.bitboard()
+        me = [s for s in state.snakes if game.snake_by_cell[s.cell_type].snake is self][0]
+        return app_snake.bitboard_move(state, me)
+
+
+def game_state(game):
+    return (
+        game.turn_count,
+        sorted(game.food),
+        [(s.name, list(s.body), s.length, s.health) for s in game.snakes],
+        [(s.name, s.killed) for s in game.killed],
+        )
+
+
+def bit_state(state):
+    board = state.board
+    return (
+        state.turn_count,
+        sorted(board.positions(state.food)),
+        [(s.name, [board.pos(idx) for idx in s.body], s.length, s.health) for s in state.snakes],
+        [(s.name, s.killed) for s in state.killed],
+        )
+
+
+def test_bitboard():
+    board = BitBoard(3, 2)
+    assert board.stride == 4
+    assert board.inside == 0b01110111
+    assert board.bit_index(4) == 5
+    assert board.pos(5) == 4
+    assert board.positions(board.mask([0, 2, 4])) == [0, 2, 4]
+
+    # spreading never wraps around rows
+    assert board.spread(board.mask([2])) == board.mask([1, 2, 5])
+    assert board.spread(board.mask([3])) == board.mask([0, 3, 4])
+
+    walls = board.mask([1, 4])
+    passable = board.inside & ~walls
+    assert board.flood(board.mask([0]), passable) == board.mask([0, 3])
+    assert list(board.layers(board.mask([2]), passable)) == [board.mask([2]), board.mask([5])]
+    assert popcount(board.inside) == 6
+
+
+def test_turn_matches_game():
+    rnd = random.Random(5)
+    for _ in range(30):
+        game = Game(12, 12)
+        policies = [RandomSnake(rnd) for _ in range(rnd.randint(1, 4))]
+        for policy in policies:
+            game.add_snake(policy)
+        game.start()
+        state = game.bitboard()
+        assert bit_state(state) == game_state(game)
+
+        while game.snakes:
+            players = list(game.snakes)
+            game.turn()
+            state.turn([player.snake.last_move for player in players])
+            assert bit_state(state) == game_state(game)
+
+
+def test_copy():
+    game = Game(8, 8)
+    game.add_snake(RandomSnake(random.Random(1)))
+    game.start()
+    state = game.bitboard()
+    copy = state.copy()
+    copy.turn(["left"])
+    assert state.turn_count == 0
+    assert len(state.snakes[0].body) == 1
+    assert len(copy.snakes[0].body) == 2
+
+
+def test_bitboard_move():
+    game = Game(12, 12)
+    game.add_snake(BitboardSnake())
+    game.add_snake(RandomSnake(random.Random(2)))
+    for _ in game.run():
+        if game.turn_count > 100:
+            break
+    # eats, so outlives the random snake
+    assert game.killed[0].name == 'b'
+
+
+def test_step_matches_turn():
+    rnd = random.Random(6)
+    for _ in range(30):
+        game = Game(12, 12)
+        for _ in range(rnd.randint(1, 4)):
+            game.add_snake(RandomSnake(rnd))
+        game.start()
+        turned = game.bitboard()
+        stepped = game.bitboard()
+        deltas = stepped.board.deltas
+        while turned.snakes:
+            moves = [rnd.choice(sorted(deltas)) for _ in turned.snakes]
+            turned.turn(moves)
+            stepped.step([deltas[move] for move in moves])
+            assert [(s.name, s.body, s.length, s.health) for s in stepped.snakes] == \
+                   [(s.name, s.body, s.length, s.health) for s in turned.snakes]
+            assert sorted(s.name for s in stepped.killed) == sorted(s.name for s in turned.killed)
+            assert stepped.food == turned.food
@@ -1,5 +1,6 @@
 import pytest
-from battlesnake.board import Board, CompassMoves, ManhattanMoves
+from battlesnake.board import Board, CompassMoves, ManhattanMoves, neighbour_table, NEIGHBOUR_TABLE_CACHE_SIZE
+from battlesnake.board import paint_request, request_size, row_offsets, vacate_turns
 
 def test_board():
     board = Board(3,5)
@@ -35,3 +36,72 @@ def test_board():
         with pytest.raises(IndexError) as e:
             board.index(board.index(x, y))
         
+
+def test_neighbour_table():
+    table = neighbour_table(6, 3, ManhattanMoves)
+    assert table is neighbour_table(6, 3, ManhattanMoves)
+    assert table is not neighbour_table(6, 3, CompassMoves)
+
+    board = Board(6, 3)
+    for pos in range(len(board)):
+        assert set(table.adjacency[pos]) == set(index for index, move in board.neighbours(pos, ManhattanMoves))
+        assert set(table.by_name[pos]) == set((index, move.name) for index, move in table.moves[pos])
+    assert set(table.by_name[board.index(2, 1)]) == set([
+        (board.index(2, 0), "N"),
+        (board.index(3, 1), "E"),
+        (board.index(2, 2), "S"),
+        (board.index(1, 1), "W"),
+        ])
+
+    # the oldest tables get dropped
+    for width in range(1, NEIGHBOUR_TABLE_CACHE_SIZE + 1):
+        neighbour_table(width, 1)
+    assert table is not neighbour_table(6, 3, ManhattanMoves)
+
+
+def test_request_size():
+    assert (3, 2) == request_size({'width': 3, 'height': 2})
+    assert (3, 2) == request_size({'board': [[None] * 3] * 2})
+    assert (0, 3, 6) == row_offsets(3, 3)
+    assert row_offsets(3, 3) is row_offsets(3, 3)
+
+
+def test_paint_request():
+    width, height = 8, 4
+    data = {
+        'food': [[0, 0], [7, 3]],
+        'snakes': [{'name': 'me', 'coords': [[1, 1], [1, 2], [1, 2]]}]
+        + [{'name': 'e%d' % i, 'coords': [[i % width, 3], [i % width, 2]]} for i in range(2, 7)],
+        }
+    cells = [' '] * (width * height)
+    me = paint_request(cells, width, height, data, 'me', '*', 'A', 'BC', ' ')
+    assert me is data['snakes'][0]
+    assert ("*       \n"
+            " A      \n"
+            " abcbcb \n"
+            "  BCBCB*\n") == "".join(
+                "".join(cells[y * width:(y + 1) * width]) + "\n" for y in range(height))
+    assert None is paint_request([' '] * (width * height), width, height, data, 'nobody',
+                                 '*', 'A', 'BC', ' ')
+
+    # coordinates off the board don't wrap onto it
+    for x, y in [(8, 0), (-1, 1), (0, 4), (0, -1)]:
+        with pytest.raises(IndexError):
+            paint_request([' '] * (width * height), width, height,
+                          {'food': [[x, y]], 'snakes': []}, 'me', '*', 'A', 'BC', ' ')
+        with pytest.raises(IndexError):
+            paint_request([' '] * (width * height), width, height,
+                          {'food': [], 'snakes': [{'name': 'me', 'coords': [[1, 1], [x, y]]}]},
+                          'me', '*', 'A', 'BC', ' ')
+
+
+def test_vacate_turns():
+    data = {
+        'food': [[0, 0]],
+        'snakes': [{'name': 'me', 'coords': [[1, 1], [1, 2], [2, 2], [2, 2]]},
+                   {'name': 'you', 'coords': [[0, 2]]}],
+        }
+    # my stacked tail goes with my third segment, after 2 moves
+    assert list(vacate_turns(data, 3, 3)) == [0, 0, 0,
+                                              0, 4, 0,
+                                              1, 3, 2]
@@ -0,0 +1,98 @@
+#! /usr/bin/env python
+import io
+import json
+import os
+import random
+import threading
+
+from battlesnake import bench, capture
+
+
+def echo_app(environ, start_response):
+    body = environ['wsgi.input'].read(int(environ.get('CONTENT_LENGTH') or 0))
+    start_response('200 OK', [('Content-Type', 'application/json')])
+    return [b'{"move": "up", "echo": ', body or b'null', b'}']
+
+
+def post(app, path, data):
+    body = json.dumps(data).encode('utf-8')
+    environ = {
+        'PATH_INFO': path,
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.input': io.BytesIO(body),
+    }
+    statuses = []
+    response = b''.join(app(environ, lambda status, headers: statuses.append(status)))
+    assert statuses == ['200 OK']
+    return json.loads(response.decode('utf-8'))
+
+
+def test_capture(tmpdir):
+    path = str(tmpdir.join('moves.jsonl.gz'))
+    writer = capture.CaptureWriter(path)
+    app = capture.CaptureMiddleware(echo_app, writer)
+    move = {'snakes': [], 'board': [[None]], 'turn': 3}
+    assert post(app, '/move', move)['echo'] == move
+    assert post(app, '/start', {'game': 'g'})['echo'] == {'game': 'g'}
+    post(app, '/other', {})
+    writer.close()
+
+    records = [json.loads(line.decode('utf-8')) for line in bench.open_corpus(path)]
+    assert [record['path'] for record in records] == ['/move', '/start']
+    assert records[0]['request'] == move
+    assert records[0]['response']['move'] == 'up'
+    assert records[0]['elapsed'] >= 0
+    assert list(bench.read_corpus(path)) == [(None, move)]
+
+
+def test_sample_and_rotate(tmpdir):
+    path = str(tmpdir.join('moves.jsonl'))
+    writer = capture.CaptureWriter(path, max_bytes=1000, backups=2)
+    app = capture.CaptureMiddleware(echo_app, writer, rate=0.5, rnd=random.Random(1))
+    for turn in range(100):
+        post(app, '/move', {'turn': turn, 'padding': 'x' * 100})
+    writer.close()
+
+    assert 20 < writer.written < 80
+    assert sorted(tmpdir.listdir()) == [tmpdir.join(name) for name in
+                                        ['moves.1.jsonl', 'moves.2.jsonl', 'moves.jsonl']]
+    assert capture.rotated_path('a/moves.jsonl.gz', 2) == 'a/moves.2.jsonl.gz'
+
+
+def test_full_queue(tmpdir):
+    writer = capture.CaptureWriter(str(tmpdir.join('moves.jsonl')), queue_size=2, start=False)
+    app = capture.CaptureMiddleware(echo_app, writer)
+    for turn in range(5):
+        # never blocks, even though nothing is writing
+        post(app, '/move', {'turn': turn})
+    assert writer.dropped == 3
+    writer.start()
+    writer.close()
+    assert writer.written == 2
+
+
+def test_real_thread(tmpdir, monkeypatch):
+    # gevent would make threading.Thread a greenlet, so it's not used
+    def no_thread(*args, **kwargs):
+        raise AssertionError("patched threading used")
+    monkeypatch.setattr(threading, 'Thread', no_thread)
+    writer = capture.CaptureWriter(str(tmpdir.join('moves.jsonl')))
+    app = capture.CaptureMiddleware(echo_app, writer)
+    post(app, '/move', {'turn': 1})
+    writer.close()
+    assert writer.written == 1
+
+
+def test_rotate_compressed(tmpdir):
+    # gzipped files rotate by their size on disk, before and after
+    # they're reopened, not by the JSON written to them
+    path = str(tmpdir.join('moves.jsonl.gz'))
+    for _ in range(2):
+        writer = capture.CaptureWriter(path, max_bytes=4000)
+        app = capture.CaptureMiddleware(echo_app, writer)
+        for turn in range(5):
+            post(app, '/move', {'turn': turn, 'padding': 'x' * 1000})
+        writer.close()
+        assert writer.size < 4000
+        assert os.listdir(str(tmpdir)) == ['moves.jsonl.gz']
+    assert len(list(bench.open_corpus(path))) == 10
@@ -0,0 +1,85 @@
+#! /usr/bin/env python
+import random
+
+from app import snake
+from battlesnake import chamber, field
+from tests.test_field import random_board_strs
+
+
+def components(adjacency, passable, removed, starts):
+    """sizes of the components of passable cells reached from starts,
+    without removed"""
+    seen = set([removed])
+    sizes = []
+    for start in starts:
+        if start in seen or not passable[start]:
+            continue
+        seen.add(start)
+        stack = [start]
+        size = 0
+        while stack:
+            idx = stack.pop()
+            size += 1
+            for adj in adjacency[idx]:
+                if adj not in seen and passable[adj]:
+                    seen.add(adj)
+                    stack.append(adj)
+        sizes.append(size)
+    return sizes
+
+
+def test_analyse():
+    # articulation points and room agree with removing each cell and
+    # flood filling what's left
+    rnd = random.Random(5)
+    for _ in range(200):
+        xmax, ymax = rnd.randint(1, 9), rnd.randint(1, 9)
+        adjacency = snake.Board(xmax, ymax).adjacency()
+        size = xmax * ymax
+        passable = bytearray(rnd.random() < 0.65 for _ in range(size))
+        roots = rnd.sample(range(size), min(size, 3))
+        chambers = chamber.analyse(adjacency, passable, roots)
+        for idx in range(size):
+            if chambers.disc[idx] == field.UNREACHED:
+                assert chambers.room(idx) == 0
+                continue
+            parts = components(adjacency, passable, idx, adjacency[idx])
+            assert chambers.component(idx) == components(adjacency, passable, None, [idx])[0]
+            assert chambers.room(idx) == 1 + max([0] + parts)
+            assert chambers.cut[idx] == (len(parts) > 1)
+
+
+def test_chamber_space(monkeypatch):
+    # right is a fork: 3 cells up it and 2 down, but I only get one way.
+    # the flood counts both, and my head, which it floods back into
+    board = snake.Board.load_strs(
+        "#   #",
+        "A ###",
+        "a  ##",
+        )
+    passable = field.passable_mask(board.values(), lambda val: not snake.CellTypeSelf.is_opaque(val))
+    assert board.space_by_move(board.space_field(passable)[1]) == ({'right': 7.0}, 7.0)
+    assert board.chamber_space(passable) == ({'right': 4.0}, 4.0)
+
+    monkeypatch.setattr(snake, 'SPACE_CHAMBERS', True)
+    assert board.smells().space_by_move == {'right': 4.0}
+    board.release()
+
+
+def test_chamber_space_exits(monkeypatch):
+    # down is a dead end of 2, and my head doesn't join it to the 5
+    # cells on the right
+    board = snake.Board.load_strs(
+        "##########",
+        "  aaA     ",
+        "#### #####",
+        "#### #####",
+        )
+    passable = field.passable_mask(board.values(), lambda val: not snake.CellTypeSelf.is_opaque(val))
+    assert board.chamber_space(passable) == ({'down': 2.0, 'right': 5.0}, 5.0)
+    assert passable[board.head().index]
+
+    monkeypatch.setattr(snake, 'SPACE_CHAMBERS', True)
+    assert board.move() == 'right'
+    board.release()
+
@@ -0,0 +1,47 @@
+#! /usr/bin/env python
+import io
+import json
+
+from battlesnake import codec
+
+REQUEST = {
+    'game': 'g',
+    'turn': 3,
+    'width': 3,
+    'height': 2,
+    'food': [[0, 0]],
+    'snakes': [{'name': 'a', 'coords': [[1, 1], [2, 1]]}],
+    'board': [[None] * 3] * 2,
+    }
+
+
+def environ(data):
+    body = json.dumps(data).encode('utf-8')
+    return {'CONTENT_LENGTH': str(len(body)), 'wsgi.input': io.BytesIO(body)}
+
+
+def test_load_codec():
+    assert codec.load_codec(['no_such_json', 'json']).__name__ == 'json'
+    assert codec.load_codec(['no_such_json']).__name__ == 'json'
+
+
+def test_strip_board():
+    slim = dict(REQUEST)
+    del slim['board']
+    assert codec.decode_move(json.dumps(REQUEST).encode('utf-8')) == slim
+    assert codec.read_move(environ(REQUEST)) == slim
+    assert codec.read_json(environ(REQUEST)) == REQUEST
+    assert codec.read_json({'CONTENT_LENGTH': '0', 'wsgi.input': io.BytesIO()}) is None
+
+    # legacy cells, with names that look like JSON
+    legacy = dict(REQUEST, board=[[{'state': 'empty'}, {'state': 'head', 'snake': 'a]],"x'},
+                                   {'state': 'food'}]] * 2)
+    assert codec.decode_move(json.dumps(legacy).encode('utf-8')) == slim
+    legacy['snakes'] = [{'name': '"board": [[]]', 'coords': []}]
+    assert codec.decode_move(json.dumps(legacy, sort_keys=True).encode('utf-8'))['snakes'] \
+        == legacy['snakes']
+
+    # without a width and height the board is all there is to go by
+    sizeless = dict(REQUEST)
+    del sizeless['width']
+    assert codec.decode_move(json.dumps(sizeless).encode('utf-8')) == sizeless
@@ -0,0 +1,189 @@
+#! /usr/bin/env python
+import random
+
+from battlesnake import field
+from battlesnake import snake as legacy
+from app import snake
+
+
+def random_board_strs(rnd, xmax, ymax):
+    """a random board with food, walls, one of me and a few enemies"""
+    cells = [rnd.choice("    *#") for _ in range(xmax * ymax)]
+    heads = rnd.sample(range(xmax * ymax), 4)
+    for snake_id, index in zip("ABCD", heads):
+        cells[index] = snake_id
+        for adj in (index + 1, index + xmax):
+            if adj < len(cells) and cells[adj] == ' ':
+                cells[adj] = snake_id.lower()
+    return ["".join(cells[y*xmax:(y+1)*xmax]) for y in range(ymax)]
+
+
+def test_distance_field():
+    # 1-d board: 0 - 1 - 2 - 3 - 4 with a wall at 3
+    adjacency = ((1,), (0, 2), (1, 3), (2, 4), (3,))
+    passable = bytearray([1, 1, 1, 0, 1])
+
+    dist, max_dist = field.distance_field(adjacency, [0], passable)
+    assert list(dist) == [0, 1, 2, field.UNREACHED, field.UNREACHED]
+    assert max_dist == 2
+
+    dist, max_dist = field.distance_field(adjacency, [0, 4], passable)
+    assert list(dist) == [0, 1, 2, field.UNREACHED, 0]
+    assert max_dist == 2
+
+    dist, max_dist = field.distance_field(adjacency, [], passable)
+    assert list(dist) == [field.UNREACHED] * 5
+    assert max_dist == 0
+
+
+def test_passable_mask():
+    calls = []
+    def is_passable(val):
+        calls.append(val)
+        return val == ' '
+    assert field.passable_mask(list("  # #"), is_passable) == bytearray([1, 1, 0, 1, 0])
+    assert sorted(calls) == [' ', '#']
+
+
+def test_smell_parity():
+    rnd = random.Random(1)
+    for _ in range(50):
+        strs = random_board_strs(rnd, rnd.randint(4, 12), rnd.randint(4, 12))
+        old = legacy.Board.load_strs(*strs)
+        new = snake.Board.load_strs(*strs)
+        assert new.smell_food() == old.smell_food()
+        assert new.smell_enemy() == old.smell_enemy()
+        assert new.smell_self() == old.smell_self()
+        assert new.move() == old.move()
+
+
+def as_board(dist):
+    return [snake.INF if d == field.UNREACHED else d for d in dist]
+
+
+def test_smells_parity():
+    rnd = random.Random(2)
+    for _ in range(50):
+        strs = random_board_strs(rnd, rnd.randint(4, 12), rnd.randint(4, 12))
+        old = legacy.Board.load_strs(*strs)
+        new = snake.Board.load_strs(*strs)
+
+        assert new.smell_space() == old.smell_space()
+
+        # one fused pass gives the same fields as the four separate ones
+        smells = new.smells()
+        assert (as_board(smells.food), smells.food_max) == old.smell_food()
+        assert (as_board(smells.enemy), smells.enemy_max) == old.smell_enemy()
+        assert (as_board(smells.dist), smells.dist_max) == old.smell_self()
+        space_by_move, space_max, space_map = old.smell_space()
+        assert smells.space_by_move == space_by_move
+        assert smells.space_max == space_max
+        assert [snake.MOVES[label-1].name if label else None for label in smells.space] == space_map
+
+
+def test_repair_field():
+    rnd = random.Random(3)
+    for _ in range(500):
+        xmax, ymax = rnd.randint(2, 9), rnd.randint(2, 9)
+        adjacency = snake.Board(xmax, ymax).adjacency()
+        size = xmax * ymax
+        passable = bytearray(rnd.random() < 0.75 for _ in range(size))
+        seeds = rnd.sample(range(size), rnd.randint(0, 3))
+        dist, _max_dist = field.distance_field(adjacency, seeds, passable)
+
+        # walls come and go, and seeds move
+        changed = set()
+        for _ in range(rnd.randint(0, 4)):
+            idx = rnd.randrange(size)
+            passable[idx] ^= 1
+            changed.add(idx)
+        if seeds and rnd.random() < 0.5:
+            changed.add(seeds.pop(rnd.randrange(len(seeds))))
+        if rnd.random() < 0.5:
+            seeds.append(rnd.randrange(size))
+            changed.add(seeds[-1])
+
+        expected, expected_max = field.distance_field(adjacency, seeds, passable)
+        dist, max_dist = field.repair_field(adjacency, dist, seeds, passable, sorted(changed))
+        assert list(dist) == list(expected)
+        assert max_dist == expected_max
+
+
+def test_repaired_smells(tmpdir):
+    from battlesnake import bench
+    from battlesnake.session import SESSIONS
+    path = str(tmpdir.join('moves.jsonl'))
+    bench.make_corpus(path, 2, sizes=(11,), snakes=(2,), max_turns=30)
+    repaired = 0
+    for snake_name, data in bench.read_corpus(path):
+        data['game'] = ('repaired', data['game'])
+        snake.battlesnake_move(data, snake_name)
+        board = SESSIONS.session(data['game'], snake_name).board
+        repaired += board.changed is not None
+        fresh = snake.request_board(data, snake_name)
+        try:
+            assert list(board.smelled['food']) == list(fresh.smells().food)
+        finally:
+            fresh.release()
+    assert repaired > 0
+
+
+def test_timed_field():
+    # 1-d board: 0 - 1 - 2 - 3 - 4, with bodies on 2 and 3
+    adjacency = ((1,), (0, 2), (1, 3), (2, 4), (3,))
+    passable = bytearray([1, 1, 0, 0, 1])
+    dist, max_dist = field.timed_field(adjacency, [0], passable, [0, 0, 2, 5, 0])
+    assert list(dist) == [0, 1, 2, field.UNREACHED, field.UNREACHED]
+    assert max_dist == 2
+    dist, max_dist = field.timed_field(adjacency, [0], passable, [0, 0, 2, 3, 0])
+    assert list(dist) == [0, 1, 2, 3, 4]
+    assert max_dist == 4
+
+    rnd = random.Random(4)
+    for _ in range(200):
+        xmax, ymax = rnd.randint(2, 9), rnd.randint(2, 9)
+        adjacency = snake.Board(xmax, ymax).adjacency()
+        size = xmax * ymax
+        passable = bytearray(rnd.random() < 0.6 for _ in range(size))
+        vacate = [0 if ok else rnd.randint(0, 8) for ok in passable]
+        seeds = rnd.sample(range(size), rnd.randint(0, 2))
+        dist, _max_dist = field.timed_field(adjacency, seeds, passable, vacate)
+
+        # nothing is further than it was, and bodies are only entered
+        # once they're gone
+        plain, _max_dist = field.distance_field(adjacency, seeds, passable)
+        for idx in range(size):
+            if plain[idx] != field.UNREACHED:
+                assert dist[idx] <= plain[idx]
+            if not passable[idx] and dist[idx] != field.UNREACHED and idx not in seeds:
+                assert 0 < vacate[idx] <= dist[idx]
+
+        # with nothing leaving, it's distance_field
+        dist, _max_dist = field.timed_field(adjacency, seeds, passable, [0] * size)
+        assert list(dist) == list(plain)
+
+
+def test_timed_space(monkeypatch):
+    # I'm boxed in, but my body moves out of the way as I follow my tail
+    data = {
+        'width': 3, 'height': 3, 'turn': 1, 'food': [],
+        'snakes': [{'name': 'me', 'coords': [[0, 0], [0, 1], [1, 1], [2, 1], [2, 0]]},
+                   {'name': 'you', 'coords': [[2, 2]]}],
+        }
+    board = snake.request_board(data, 'me')
+    assert board.vacate is None
+    assert board.smells().space_by_move == {'right': 2.0}
+    board.release()
+
+    monkeypatch.setattr(snake, 'SPACE_TIMED', True)
+    board = snake.request_board(data, 'me')
+    smells = board.smells()
+    assert smells.space_by_move == {'right': 9.0}
+    dist, _labels = board.space_field(field.passable_mask(
+        board.values(), lambda val: not snake.CellTypeSelf.is_opaque(val)))
+    assert list(dist) == [0, 1, 2,
+                          5, 4, 3,
+                          6, 5, 4]
+    # my distance field stays like the others, through empty cells only
+    assert list(smells.dist) == [0, 1] + [field.UNREACHED] * 7
+    board.release()
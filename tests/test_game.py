@@ -1,3 +1,4 @@
+import pytest
 from battlesnake.game import Game
 from itertools import repeat
 
@@ -110,3 +111,125 @@ def test_food():
     assert player1.length == game.INITIAL_LENGTH+1
        
     
+
+def test_live_board():
+    import random
+    from tests.test_bitboard import RandomSnake
+
+    class CheckSnake(object):
+        """checks the live board matches a fresh render every turn"""
+        def move(self, game, board):
+            assert board.dump() == Game.render(game).dump()
+            return "up"
+
+    class CountingGame(Game):
+        renders = 0
+        def render(self):
+            self.renders += 1
+            return super(CountingGame, self).render()
+
+    rnd = random.Random(9)
+    for i in range(20):
+        game = CountingGame(12, 12)
+        game.add_snake(CheckSnake())
+        for j in range(rnd.randint(1, 3)):
+            game.add_snake(RandomSnake(rnd))
+        game.start()
+        while game.snakes:
+            game.turn()
+            game.add_stuff()
+            assert Game.render(game).dump() == game.live_board().dump()
+        # rendered by start() and for the first turn, then updated in place
+        assert game.renders == 2
+
+def test_bitboard_turns():
+    import random
+    from tests.test_bitboard import RandomSnake, game_state
+
+    class WanderSnake(RandomSnake):
+        """moves at random, but not back into itself.  Only looks at
+        itself, so moves the same whatever the others did this turn"""
+        def move(self, game, board):
+            player = [p for p in game.snakes if p.snake is self][0]
+            for i in range(10):
+                move_name = super(WanderSnake, self).move(game, board)
+                try:
+                    if board.move(player.body[0], move_name) not in player.body:
+                        break
+                except IndexError:
+                    pass
+            return move_name
+
+    class FailSnake(WanderSnake):
+        """wanders, then breaks"""
+        def move(self, game, board):
+            if game.turn_count == 10:
+                raise ValueError("broken")
+            return super(FailSnake, self).move(game, board)
+
+    def play(seed, bitboard_turns):
+        rnd = random.Random(seed)
+        game = Game(12, 12, seed, bitboard_turns=bitboard_turns)
+        game.add_snake(FailSnake(rnd))
+        for i in range(rnd.randint(1, 3)):
+            game.add_snake(WanderSnake(rnd))
+        game.start()
+        while game.snakes:
+            board = game.turn()
+            game.add_stuff()
+            yield game_state(game), board.dump(), Game.render(game).dump()
+
+    for seed in range(20):
+        turns = list(play(seed, False))
+        assert list(play(seed, True)) == turns
+        # the live board stays right too
+        assert all(board == render for _, board, render in turns)
+
+def test_snake_body():
+    from battlesnake.game import SnakeBody
+
+    body = SnakeBody([5, 4, 3])
+    body.push(6)
+    assert body == [6, 5, 4, 3]
+    assert body[0] == 6 and body[-1] == 3
+    assert body[1:3] == [5, 4]
+    assert 3 in body and 7 not in body
+    assert body.pop_tail() == 3
+    assert 3 not in body
+
+    # a body can cross itself while growing in place
+    body.push(5)
+    assert list(body) == [5, 6, 5, 4]
+    del body[2:]
+    assert body == [5, 6] and 5 in body and 4 not in body
+
+    # the old list operations still work
+    body.insert(0, 7)
+    del body[1]
+    assert body == [7, 6]
+    assert len(body) == 2
+
+    # all of them, keeping the position counts right
+    body = SnakeBody([1, 2, 3, 2])
+    assert body.index(2) == 1 and body.count(2) == 2 and body.count(9) == 0
+    with pytest.raises(ValueError):
+        body.index(9)
+    body[1] = 4
+    assert body == [1, 4, 3, 2] and body.count(2) == 1
+    body[1:3] = [5]
+    assert body == [1, 5, 2] and 4 not in body and 3 not in body
+    assert body.pop() == 2 and 2 not in body
+    assert body.pop(0) == 1 and body == [5]
+    body.extend([6, 7, 8])
+    assert body.pop(1) == 6 and body == [5, 7, 8] and 6 not in body
+    body.insert(1, 9)
+    body.insert(10, 10)
+    assert body == [5, 9, 7, 8, 10] and 9 in body and 10 in body
+    assert body + [11] == [5, 9, 7, 8, 10, 11]
+    assert [4] + body == [4, 5, 9, 7, 8, 10]
+    with pytest.raises(TypeError):
+        hash(body)
+    # and compare like a list
+    assert body == SnakeBody([5, 9, 7, 8, 10]) and body != SnakeBody([5])
+    assert body != None and not body == None
+    assert body != 5 and body != (5, 9, 7, 8, 10)
@@ -0,0 +1,37 @@
+#! /usr/bin/env python
+import random
+import time
+
+from app import mcts
+from tests.test_search import TRAP
+
+
+def test_mcts_avoids_trap():
+    state, _me = mcts.request_state(TRAP, 'me')
+    search = mcts.MCTS(time.time() + 10, random.Random(1))
+    assert search.run(state, 'me', max_simulations=2000) == 'right'
+    assert search.simulations == 2000
+
+
+def test_mcts_deadline():
+    state, _me = mcts.request_state(TRAP, 'me')
+    search = mcts.MCTS(time.time() - 1, random.Random(1))
+    assert search.run(state, 'me') in ('up', 'right')
+    assert search.simulations == 0
+
+
+def test_rewards():
+    state, _me = mcts.request_state(TRAP, 'me')
+    assert mcts.rewards(state, ['me', 'them']) == {'me': 0.5, 'them': 0.5}
+    state.killed.append(state.snakes.pop())
+    assert mcts.rewards(state, ['me', 'them']) == {'me': 1.0, 'them': 0.0}
+
+
+def test_mcts_solo():
+    # alone, there's nothing to simulate, and no need to wait
+    state, _me = mcts.request_state(dict(TRAP, snakes=TRAP['snakes'][:1]), 'me')
+    search = mcts.MCTS(time.time() + 10, random.Random(1))
+    start = time.time()
+    assert search.run(state, 'me') == mcts.snake.bitboard_move(state, state.snakes[0])
+    assert search.simulations == 0
+    assert time.time() - start < 1
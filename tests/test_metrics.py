@@ -0,0 +1,81 @@
+#! /usr/bin/env python
+import io
+import itertools
+import json
+
+from battlesnake import metrics
+from tests.test_search import TRAP
+
+
+def test_histogram():
+    histogram = metrics.Histogram('h', "a test", 'phase', buckets=(1, 2))
+    for value in (0.5, 1, 1.5, 3):
+        histogram.observe('x', value)
+    lines = histogram.exposition().splitlines()
+    assert 'h_bucket{phase="x",le="1"} 2' in lines
+    assert 'h_bucket{phase="x",le="2"} 3' in lines
+    assert 'h_bucket{phase="x",le="+Inf"} 4' in lines
+    assert 'h_sum{phase="x"} 6.0' in lines
+    assert 'h_count{phase="x"} 4' in lines
+
+
+def test_disabled(monkeypatch):
+    monkeypatch.setattr(metrics, 'ENABLED', False)
+    assert metrics.start() is None
+    assert metrics.current() is None
+    metrics.finish(None)
+
+
+def test_phases(monkeypatch):
+    from app import snake
+    monkeypatch.setattr(metrics, 'ENABLED', True)
+    clock = itertools.count()
+    histogram = metrics.Histogram('h', "a test", 'phase')
+
+    timer = metrics.start(lambda: next(clock))
+    assert metrics.current() is timer
+    snake.battlesnake_move(TRAP, 'me')
+    metrics.finish(timer, histogram)
+    assert metrics.current() is None
+
+    phases = [phase for phase, _seconds in timer.phases]
+    assert phases == ['parse', 'smell_seeds', 'smell_enemy', 'score', 'smell_food', 'score',
+                      'smell_space', 'score', 'other']
+    assert all(seconds == 1 for _phase, seconds in timer.phases)
+    assert sorted(histogram.series) == sorted(set(phases + ['total']))
+    assert timer.server_timing().startswith("parse;dur=1000.000, ")
+
+
+def call(application, method, path, data=None):
+    body = json.dumps(data).encode('utf-8') if data is not None else b''
+    environ = {
+        'REQUEST_METHOD': method,
+        'PATH_INFO': path,
+        'CONTENT_TYPE': 'application/json',
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': io.BytesIO(),
+        'wsgi.url_scheme': 'http',
+        'SERVER_NAME': 'test',
+        'SERVER_PORT': '80',
+    }
+    response = []
+    def start_response(status, headers, exc_info=None):
+        response.extend([status, dict(headers)])
+    response.append(b''.join(application(environ, start_response)).decode('utf-8'))
+    return response
+
+
+def test_metrics_route(monkeypatch):
+    from app import main
+    monkeypatch.setattr(metrics, 'ENABLED', True)
+    monkeypatch.setattr(main, 'SNAKE_TIMING_HEADER', '1')
+    data = dict(TRAP, snakes=[dict(TRAP['snakes'][0], name=main.SNAKE_NAME)] + TRAP['snakes'][1:])
+
+    status, headers, body = call(main.application, 'POST', '/move', data)
+    assert status == '200 OK'
+    assert 'smell_space;dur=' in headers['Server-Timing']
+
+    status, headers, body = call(main.application, 'GET', '/metrics')
+    assert headers['Content-Type'].startswith('text/plain')
+    assert 'snake_move_phase_seconds_count{phase="total"}' in body
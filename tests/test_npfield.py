@@ -0,0 +1,74 @@
+#! /usr/bin/env python
+import random
+
+import pytest
+
+from app import snake
+from battlesnake import field
+from tests.test_field import random_board_strs
+
+numpy = pytest.importorskip("numpy")
+from battlesnake import npfield
+
+
+def test_distance_grid():
+    passable = numpy.array([
+        [1, 1, 0, 1],
+        [1, 0, 0, 1],
+        [1, 1, 1, 1],
+        ], dtype=bool)
+    seeds = numpy.zeros(passable.shape, dtype=bool)
+    seeds[0, 0] = True
+
+    dist, max_dist = npfield.distance_grid(seeds, passable)
+    assert dist.tolist() == [
+        [0, 1, field.UNREACHED, 7],
+        [1, field.UNREACHED, field.UNREACHED, 6],
+        [2, 3, 4, 5],
+        ]
+    assert max_dist == 7
+
+
+def test_numpy_board_parity():
+    rnd = random.Random(3)
+    for _ in range(50):
+        strs = random_board_strs(rnd, rnd.randint(4, 12), rnd.randint(4, 12))
+        board = snake.Board.load_strs(*strs)
+        np_board = snake.NumpyBoard.from_values(board.xmax, board.ymax, board.values())
+
+        smells = board.smells()
+        np_smells = np_board.smells()
+        assert list(np_smells.food) == list(smells.food)
+        assert np_smells.food_max == smells.food_max
+        assert list(np_smells.enemy) == list(smells.enemy)
+        assert np_smells.enemy_max == smells.enemy_max
+        assert list(np_smells.dist) == list(smells.dist)
+        assert np_smells.dist_max == smells.dist_max
+
+        # ties between first moves may break differently, but the same
+        # cells are reachable
+        assert [bool(label) for label in np_smells.space] == [bool(label) for label in smells.space]
+        assert sum(np_smells.space_by_move.values()) == sum(smells.space_by_move.values())
+
+
+def test_numpy_board_move():
+    for strs, move in (
+            ((" *  # ",
+              " A    ",
+              " aBb  ",
+              "      "), 'left'),
+            ((" *  #*",
+              "    BA",
+              "      ",
+              "      "), 'down'),
+            (("    # ",
+              " A*   ",
+              " a  Bb",
+              "      "), 'right'),
+        ):
+        assert snake.NumpyBoard.load_strs(*strs).move() == move
+
+
+def test_board_class():
+    assert snake.board_class(11, 11) is snake.Board
+    assert snake.board_class(50, 50) is snake.NumpyBoard
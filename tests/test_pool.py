@@ -0,0 +1,69 @@
+#! /usr/bin/env python
+import random
+
+from app import snake
+from battlesnake import field
+from battlesnake.pool import BufferPool
+from tests.test_field import random_board_strs
+from tests.test_search import TRAP
+
+
+def test_buffer_pool():
+    resets = []
+    pool = BufferPool(lambda key: [key], lambda buf, key: resets.append(buf), max_free=1)
+    a = pool.acquire(1)
+    assert a == [1] and pool.misses == 1
+    pool.release(1, a)
+    pool.release(1, [1])
+    assert pool.acquire(1) is a
+    assert resets == [a] and pool.hits == 1
+    assert pool.acquire(2) == [2]
+
+
+def test_field_pool():
+    dist = field.FIELD_POOL.acquire(6)
+    field.distance_field(((1,), (0, 2), (1, 3), (2, 4), (3, 5), (4,)), [0], bytearray(b'\x01' * 6), dist)
+    field.FIELD_POOL.release(6, dist)
+    again = field.FIELD_POOL.acquire(6)
+    assert again is dist
+    assert list(again) == [field.UNREACHED] * 6
+
+
+def test_pooled_boards():
+    # boards and fields reused from the pool give the same moves as new ones
+    rnd = random.Random(4)
+    for _ in range(50):
+        xmax, ymax = rnd.choice([(5, 5), (7, 6)])
+        strs = random_board_strs(rnd, xmax, ymax)
+        fresh = snake.Board.load_strs(*strs)
+        expected = fresh.move()
+
+        board = snake.BOARD_POOL.acquire((snake.Board, xmax, ymax))
+        assert board.values() == [snake.CELL_TYPE_SPACE] * (xmax * ymax)
+        board[:] = fresh.values()
+        assert board.move() == expected
+        board.release()
+
+    hits = snake.BOARD_POOL.hits
+    assert snake.battlesnake_move(TRAP, 'me') == snake.battlesnake_move(TRAP, 'me')
+    assert snake.BOARD_POOL.hits > hits
+
+
+def test_board_fields():
+    # a board smelt again and again only holds its last smells' fields
+    board = snake.Board.load_strs(*random_board_strs(random.Random(5), 6, 6))
+    for _ in range(5):
+        board.smells()
+    assert 0 < len(board.fields) <= 3
+    board.smell_space()
+    assert len(board.fields) == 1
+
+    # and only boards from the pool go back to it
+    free = lambda: [id(free_board) for free_board in snake.BOARD_POOL.free.get((snake.Board, 6, 6), [])]
+    before = free()
+    board.release()
+    assert board.fields == []
+    assert free() == before
+    pooled = snake.BOARD_POOL.acquire((snake.Board, 6, 6))
+    pooled.release()
+    assert snake.BOARD_POOL.acquire((snake.Board, 6, 6)) is pooled
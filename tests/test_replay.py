@@ -0,0 +1,73 @@
+#! /usr/bin/env python
+import random
+from io import BytesIO
+
+from battlesnake import replay, tournament
+from battlesnake.game import Game
+from tests.test_bitboard import RandomSnake
+
+
+class FailingSnake(object):
+    def move(self, game, board):
+        if game.turn_count > 3:
+            raise Exception("oops")
+        return "up"
+
+
+def play(seed, log=None):
+    game = Game(12, 12, seed)
+    game.replay_log = log
+    rnd = random.Random(seed)
+    game.add_snake(RandomSnake(rnd))
+    game.add_snake(RandomSnake(rnd))
+    game.add_snake(FailingSnake())
+    boards = []
+    game.start()
+    boards.append(game.render().dump())
+    while game.snakes:
+        boards.append(game.turn().dump())
+        game.add_stuff()
+    return game, boards
+
+
+def test_seeded_food():
+    game1, boards1 = play(3)
+    game2, boards2 = play(3)
+    assert boards1 == boards2
+    assert game1.food == game2.food
+
+
+def test_replay():
+    for seed in range(10):
+        out = BytesIO()
+        game, boards = play(seed, replay.ReplayLog(out))
+        lines = out.getvalue().splitlines()
+        header, turns = replay.read(lines)
+        assert header['seed'] == seed
+        assert len(turns) == game.turn_count
+
+        replayed = [board.dump() for board in replay.replay(lines)]
+        # the food added after the last turn isn't logged
+        assert replayed[:-1] == boards[:-1]
+        assert turns[3]['moves']['c'] is None
+        assert 'c' in [name for name, _reason in turns[3]['killed']]
+
+    # a log that doesn't match the game
+    turns[-1]['killed'] = []
+    lines = [replay.json.dumps(header)] + [replay.json.dumps(turn) for turn in turns]
+    try:
+        for board in replay.replay(lines):
+            pass
+    except replay.ReplayError:
+        pass
+    else:
+        assert False, "replayed a bad log"
+
+
+def test_tournament_replays(tmpdir):
+    policies = ['snake', 'tests.test_game:LoopSnake']
+    result = tournament.play(4, 11, policies, size=12, replay_dir=str(tmpdir))
+    lines = open(tournament.replay_path(str(tmpdir), 4)).readlines()
+    for board in replay.replay(lines):
+        pass
+    assert replay.read(lines)[1][-1]['turn'] == result.turns
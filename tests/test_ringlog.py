@@ -0,0 +1,61 @@
+#! /usr/bin/env python
+import json
+import logging
+import random
+
+from battlesnake.ringlog import RingLog
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        logging.Handler.__init__(self)
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+def test_ringlog():
+    logger = logging.getLogger('test_ringlog')
+    logger.setLevel(logging.INFO)
+    handler = ListHandler()
+    logger.addHandler(handler)
+    formatted = []
+
+    def format_record(record):
+        formatted.append(record)
+        return {'n': record}
+
+    ring = RingLog(logger, format_record, capacity=4)
+    for n in range(6):
+        ring.record(n % 2, n)
+    # nothing is formatted until it's flushed
+    assert formatted == []
+    assert list(ring.ring) == [(0, 2), (1, 3), (0, 4), (1, 5)]
+
+    ring.flush(1, wait=True)
+    assert [json.loads(message) for message in handler.messages] == [{'n': 3}, {'n': 5}]
+    assert list(ring.ring) == [(0, 2), (0, 4)]
+    assert ring.flush(1) is None
+
+    ring.flush(wait=True)
+    assert formatted == [3, 5, 2, 4]
+    assert not ring.ring
+
+
+def test_sample():
+    ring = RingLog(None, None, capacity=1000, rate=0.25, rnd=random.Random(1))
+    for n in range(1000):
+        ring.record(None, n)
+    assert 200 < len(ring.ring) < 300
+
+
+def test_lost():
+    from app import main
+    me = {'name': main.SNAKE_NAME}
+    assert main.lost({'snakes': [{'name': 'other'}]})
+    assert main.lost({'snakes': []})
+    assert not main.lost({'snakes': [me, {'name': 'other'}]})
+    # an /end that doesn't list the snakes doesn't dump my boards
+    assert not main.lost({})
+    assert not main.lost({'game': 'g', 'snakes': None})
@@ -0,0 +1,103 @@
+#! /usr/bin/env python
+import time
+
+from app import search, snake
+from battlesnake.session import SESSIONS
+from battlesnake.zobrist import TranspositionTable
+
+# I'm at the mouth of a dead end with food in it, and hungry enough
+# that the greedy snake goes for the food.  There's more food a couple
+# of moves away in the open.
+TRAP = {
+    'board': [[None] * 7] * 7,
+    'turn': 97,
+    'food': [[0, 3], [2, 5]],
+    'snakes': [
+        {'name': 'me', 'last_eaten': 0,
+         'coords': [[0, 4], [0, 5], [0, 6]]},
+        {'name': 'them', 'last_eaten': 97,
+         'coords': [[4, 3], [3, 3], [2, 3], [1, 3], [1, 2], [1, 1], [1, 0],
+                    [2, 0], [3, 0], [4, 0], [5, 0], [6, 0], [6, 1], [6, 2]]},
+        ],
+    }
+
+
+def test_request_state():
+    state, me = search.request_state(TRAP, 'me')
+    assert me.name == 'me'
+    assert me.health == 3
+    assert me.length == 3
+    assert state.board.positions(state.food) == [3*7 + 0, 5*7 + 2]
+    assert [player.name for player in state.snakes] == ['me', 'them']
+    assert search.request_state(TRAP, 'nobody')[1] is None
+
+
+def test_move_budget():
+    # search takes the same time as every other move
+    assert snake.move_budget({}) == snake.MOVE_TIMEOUT - snake.MOVE_MARGIN
+    assert snake.move_budget({'timeout': 500}) == 0.5 - snake.MOVE_MARGIN
+    assert snake.move_budget({'timeout': 10}) == 0.0
+
+
+def test_search_avoids_trap():
+    assert snake.battlesnake_move(TRAP, 'me') == 'up'
+
+    state, _me = search.request_state(TRAP, 'me')
+    best_move, _value, depth = search.Search('me', time.time() + 10).run(state, max_depth=6)
+    assert best_move == 'right'
+    assert depth == 6
+
+
+def test_search_deadline():
+    # out of time before the first ply, so fall back on the greedy move
+    state, _me = search.request_state(TRAP, 'me')
+    best_move, value, depth = search.Search('me', time.time() - 1).run(state)
+    assert (best_move, value, depth) == ('up', None, 0)
+
+
+def test_search_table():
+    table = TranspositionTable(1 << 10)
+    state, _me = search.request_state(TRAP, 'me')
+    first = search.Search('me', time.time() + 10, table)
+    assert first.run(state, max_depth=6)[0] == 'right'
+    assert table.hits > 0
+
+    # the same position next time is mostly answered by the table
+    state, _me = search.request_state(TRAP, 'me')
+    again = search.Search('me', time.time() + 10, table)
+    assert again.run(state, max_depth=6)[0] == 'right'
+    assert again.nodes < first.nodes
+
+
+def test_table_mate_scores():
+    # a win 5 plies from the root, found at ply 3, is 2 plies from the
+    # node, so 3 plies from the root when the node turns up at ply 1
+    stored = search.table_value(search.WIN - 5, 3)
+    assert search.tree_value(stored, 1) == search.WIN - 3
+    assert search.tree_value(search.table_value(search.LOSS + 5, 3), 1) == search.LOSS + 3
+    assert search.tree_value(search.table_value(12.5, 3), 1) == 12.5
+
+    # I'm heading into the dead end, so I lose whatever I do.  Searched
+    # at ply 2 first, the table still gives the loss the right distance
+    # from the root when the position comes up again at ply 0
+    trapped = dict(TRAP, food=[], snakes=[dict(TRAP['snakes'][0], coords=[[0, 2], [0, 3], [0, 4]]),
+                                          TRAP['snakes'][1]])
+    state, _me = search.request_state(trapped, 'me')
+    plain = search.Search('me', time.time() + 10).max_value(state, 4, 0, search.LOSS - 1, search.WIN + 1)
+    assert plain <= -search.MATE
+
+    table = TranspositionTable(1 << 10)
+    state.hash_with(search.ZOBRIST)
+    found = search.Search('me', time.time() + 10, table)
+    assert found.max_value(state, 4, 2, search.LOSS - 1, search.WIN + 1) == plain + 2
+    nodes = found.nodes
+    assert found.max_value(state, 4, 0, search.LOSS - 1, search.WIN + 1) == plain
+    assert found.nodes == nodes + 1
+
+
+def test_game_table():
+    assert search.game_table('a', 'me') is search.game_table('a', 'me')
+    assert search.game_table('a', 'me') is not search.game_table('a', 'you')
+    for game_id in range(SESSIONS.max_games):
+        search.game_table(game_id, 'me')
+    assert ('a', 'me') not in SESSIONS
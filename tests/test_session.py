@@ -0,0 +1,63 @@
+#! /usr/bin/env python
+import copy
+
+from app import snake
+from battlesnake.session import SessionCache, SESSIONS, game_id
+from tests.test_search import TRAP
+
+
+class Released(object):
+    released = False
+
+    def release(self):
+        self.released = True
+
+
+def test_session_cache():
+    now = [0.0]
+    cache = SessionCache(max_games=2, ttl=10, clock=lambda: now[0])
+    a = cache.session('a', 'me')
+    assert cache.session('a', 'me') is a
+    assert cache.session('a', 'you') is not a
+    a.keep(Released(), {})
+    board = a.board
+
+    # least recently used goes first, and gives back its board
+    cache.session('b', 'me')
+    assert ('a', 'me') not in cache and len(cache) == 2
+    assert board.released and a.board is None
+
+    # so do the ones that haven't been used in a while
+    now[0] = 20.0
+    cache.session('c', 'me')
+    assert list(cache.sessions) == [('c', 'me')]
+
+    cache.end('c', 'me')
+    assert len(cache) == 0
+    assert game_id({'game_id': 'g'}) == game_id({'game': 'g'}) == 'g'
+
+
+def test_session_moves():
+    data = copy.deepcopy(TRAP)
+    data['game'] = 'session-moves'
+    SESSIONS.end(data['game'], 'me')
+    first = snake.battlesnake_move(data, 'me')
+    session = SESSIONS.session(data['game'], 'me')
+    assert session.board is not None and session.board.changed is None
+
+    # the same request again gets the same answer, without a new board
+    board = session.board
+    assert snake.battlesnake_move(copy.deepcopy(data), 'me') == first
+    assert session.board is board
+
+    # the next turn knows what changed: I ate the food above me
+    data = copy.deepcopy(data)
+    data['turn'] += 1
+    data['food'] = [[2, 5]]
+    data['snakes'][0]['coords'] = [[0, 3], [0, 4], [0, 5]]
+    snake.battlesnake_move(data, 'me')
+    assert session.board is not board
+    assert session.board.changed == [3*7 + 0, 4*7 + 0, 6*7 + 0]
+
+    SESSIONS.end(data['game'], 'me')
+    assert (data['game'], 'me') not in SESSIONS
@@ -0,0 +1,113 @@
+#! /usr/bin/env python
+import random
+import time
+
+from app import search, snake
+from battlesnake import field
+from battlesnake.bitboard import BitBoard, popcount
+from battlesnake.territory import Territory, TERRITORY_POOL, CONTESTED, NOBODY
+from tests.test_field import random_board_strs
+from tests.test_search import TRAP
+
+# 1-d board: 0 - 1 - 2 - 3 - 4 - 5, with a wall at 5
+LINE = ((1,), (0, 2), (1, 3), (2, 4), (3, 5), (4,))
+LINE_PASSABLE = bytearray([1, 1, 1, 1, 1, 0])
+
+
+def test_territory():
+    territory = Territory(LINE)
+    counts = territory.run([0, 4], LINE_PASSABLE, [3, 3])
+    assert list(territory.owner) == [1, 1, CONTESTED, 2, 2, NOBODY]
+    assert list(territory.dist) == [0, 1, 2, 1, 0, field.UNREACHED]
+    assert (counts[1], counts[2], counts[CONTESTED]) == (2, 2, 1)
+
+    # the longer snake wins a head to head
+    counts = territory.run([0, 4], LINE_PASSABLE, [3, 4])
+    assert list(territory.owner) == [1, 1, 2, 2, 2, NOBODY]
+    assert (counts[1], counts[2], counts[CONTESTED]) == (2, 3, 0)
+
+    # unless both die
+    territory = Territory(LINE, longer_wins=False)
+    territory.run([0, 4], LINE_PASSABLE, [3, 4])
+    assert territory.owner[2] == CONTESTED
+
+    # contested cells block
+    territory.run([1, 3], LINE_PASSABLE)
+    assert list(territory.owner) == [1, 1, CONTESTED, 2, 2, NOBODY]
+    territory.run([0, 2], bytearray([1, 1, 1, 0, 1, 1]))
+    assert list(territory.owner) == [1, CONTESTED, 2, NOBODY, NOBODY, NOBODY]
+
+
+def test_smell_territory():
+    board = snake.Board.load_strs(
+        "A     ",
+        "a  #  ",
+        "a  #Bb",
+        )
+    owners, dist, counts = board.smell_territory()
+    assert counts == {'A': 8, 'B': 5}
+    assert owners[board.index(0, 0)] == 'A' and dist[board.index(0, 0)] == 0
+    assert owners[board.index(5, 0)] == 'B' and dist[board.index(5, 0)] == 3
+    # A and B both get here in 3, and A is longer
+    assert owners[board.index(3, 0)] == 'A' and dist[board.index(3, 0)] == 3
+
+    owners, dist, counts = board.smell_territory(longer_wins=False)
+    assert counts == {'A': 7, 'B': 5}
+    assert owners[board.index(3, 0)] is None
+    board.release()
+
+
+def test_bitboard_territory():
+    # the same territory on a bitboard as on a flat board
+    rnd = random.Random(2)
+    for _ in range(50):
+        xmax, ymax = rnd.randint(4, 12), rnd.randint(4, 12)
+        board = snake.Board.load_strs(*random_board_strs(rnd, xmax, ymax))
+        values = board.values()
+        passable = field.passable_mask(values, lambda val: not snake.CellTypeSelf.is_opaque(val))
+        heads = [idx for idx, val in enumerate(values) if val in "ABCD"]
+        lengths = [rnd.randint(1, 3) for _ in heads]
+
+        bitboard = BitBoard(xmax, ymax)
+        bit_passable = bitboard.mask(idx for idx, ok in enumerate(passable) if ok)
+        bit_heads = [bitboard.bit_index(idx) for idx in heads]
+        for longer_wins in (True, False):
+            territory = Territory(board.adjacency(), longer_wins)
+            counts = territory.run(heads, passable, lengths)
+            owned, contested = bitboard.territory(bit_heads, bit_passable, lengths, longer_wins)
+            for who, mask in enumerate(owned, 1):
+                assert bitboard.positions(mask) == [
+                    idx for idx, owner in enumerate(territory.owner) if owner == who]
+            assert popcount(contested) == counts[CONTESTED]
+
+
+def test_search_territory():
+    state, me = search.request_state(TRAP, 'me')
+    found = search.Search('me', time.time() + 10, territory=True)
+    board = state.board
+    head = 1 << me.body[0]
+    reachable = popcount(board.flood(head, (board.inside & ~state.occupied()) | head)) - 1
+    # they get to some of the cells I can reach first
+    assert found.territory_space(state, me) == 10 < reachable
+    assert found.run(state, max_depth=3)[0] in search.MOVE_NAMES
+
+
+def test_search_territory_ties():
+    # search's game kills both snakes in a head to head, so a cell we
+    # tie for isn't mine, even though I'm longer
+    data = {
+        'width': 5, 'height': 1, 'turn': 0, 'food': [],
+        'snakes': [{'name': 'me', 'coords': [[0, 0]] * 5},
+                   {'name': 'them', 'coords': [[4, 0]] * 3}],
+        }
+    state, me = search.request_state(data, 'me')
+    found = search.Search('me', time.time() + 10, territory=True)
+    assert found.territory_space(state, me) == 1
+
+
+def test_territory_pool():
+    adjacency = snake.Board(3, 3).adjacency()
+    territory = TERRITORY_POOL.acquire(adjacency)
+    TERRITORY_POOL.release(adjacency, territory)
+    assert TERRITORY_POOL.acquire(adjacency) is territory
+    assert TERRITORY_POOL.acquire(adjacency, longer_wins=False) is not territory
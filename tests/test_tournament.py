@@ -0,0 +1,58 @@
+#! /usr/bin/env python
+from app import snake
+from battlesnake import tournament
+from battlesnake.game import Game
+
+
+def test_move_request():
+    game = Game(8, 8)
+    game.add_snake(None)
+    game.start()
+    data = game.move_request('g')
+    assert len(data['board']) == 8 and len(data['board'][0]) == 8
+    assert data['board'][0] is not data['board'][1]
+    assert data['snakes'][0]['coords'] == [[6, 4]]
+    # the app snakes see the turns I really have left
+    board = snake.request_board(data, 'a')
+    assert board.ttl == Game.MAX_HEALTH
+    board.release()
+    assert [6, 6] in data['food']
+
+
+def test_play(monkeypatch):
+    # food is put back every turn
+    added = []
+    add_stuff = Game.add_stuff
+    def counting_add_stuff(game, *args):
+        added.append(game.turn_count)
+        return add_stuff(game, *args)
+    monkeypatch.setattr(Game, 'add_stuff', counting_add_stuff)
+
+    policies = ['snake', 'tests.test_game:LoopSnake']
+    result = tournament.play(0, 1, policies, size=12)
+    assert added[:3] == [0, 1, 2]
+    assert result.policies == policies
+    assert result.winner == 0
+    assert [seat for seat, _policy, _turns, _killed in result.placings] == [1, 0]
+    # the game ends when the loser dies
+    assert result.placings[0][2] == result.placings[1][2] == result.turns
+
+    # the same seed plays the same game
+    assert tournament.play(0, 1, policies, size=12) == result
+
+
+def test_tournament():
+    policies = ['snake', 'snake2']
+    kwargs = dict(size=12, max_turns=50)
+    serial = sorted(tournament.tournament(policies, 4, processes=1, **kwargs))
+    parallel = sorted(tournament.tournament(policies, 4, processes=2, **kwargs))
+    assert serial == parallel
+    assert [result.policies for result in serial] == [policies, policies[::-1]] * 2
+
+    standings = tournament.Standings()
+    for result in serial:
+        standings.add(result)
+    assert standings.games == 4
+    assert standings.played['snake'] == 4
+    rate, low, high = standings.win_rate('snake')
+    assert 0 <= low <= rate <= high <= 1
@@ -0,0 +1,61 @@
+#! /usr/bin/env python
+import random
+
+from battlesnake.game import Game
+from battlesnake.zobrist import Zobrist, TranspositionTable, EXACT, LOWER, UPPER
+from tests.test_bitboard import RandomSnake
+
+
+def test_incremental_key():
+    rnd = random.Random(7)
+    zobrist = Zobrist(seed=1)
+    for _ in range(20):
+        game = Game(10, 10)
+        policies = [RandomSnake(rnd) for _ in range(rnd.randint(1, 3))]
+        for policy in policies:
+            game.add_snake(policy)
+        game.start()
+        state = game.bitboard()
+        state.hash_with(zobrist)
+
+        keys = set([state.key])
+        while game.snakes:
+            players = list(game.snakes)
+            game.turn()
+            copy = state.copy()
+            state.turn([player.snake.last_move for player in players])
+            # updating as we go gives the same key as hashing from scratch
+            assert state.key == zobrist.state_key(state)
+            assert copy.key != state.key
+            keys.add(state.key)
+        assert len(keys) == game.turn_count + 1
+
+
+def test_transposition_table():
+    table = TranspositionTable(4)
+    assert table.lookup(1) is None
+
+    table.store(1, 3, 10.0, EXACT, 'up')
+    assert table.lookup(1) == (3, 10.0, EXACT, 'up')
+
+    # a shallower result for the same bucket goes in the always-replace slot
+    table.store(5, 1, 20.0, LOWER, 'left')
+    assert table.lookup(1) == (3, 10.0, EXACT, 'up')
+    assert table.lookup(5) == (1, 20.0, LOWER, 'left')
+
+    # and is replaced by the next one
+    table.store(9, 2, 30.0, UPPER, 'down')
+    assert table.lookup(5) is None
+    assert table.lookup(9) == (2, 30.0, UPPER, 'down')
+
+    # a deeper result takes over the depth-preferred slot
+    table.store(13, 4, 40.0, EXACT, 'right')
+    assert table.lookup(1) is None
+    assert table.lookup(13) == (4, 40.0, EXACT, 'right')
+
+    # the same state replaces its own entry, even if shallower
+    table.store(13, 1, 50.0, EXACT, 'up')
+    assert table.lookup(13) == (1, 50.0, EXACT, 'up')
+
+    table.clear()
+    assert table.lookup(13) is None